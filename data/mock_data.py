@@ -1,12 +1,51 @@
 """
 Data utilities for the TrainingUp.ai application
 """
+import os
 import logging
+import requests
 import yfinance as yf
 import datetime
 
 logger = logging.getLogger(__name__)
 
+MCP_SERVER_URL = os.environ.get("MCP_SERVER_URL", "http://localhost:8000")
+
+MARKET_SYMBOLS = {"spy": "SPY", "bitcoin": "BTC-USD", "gold": "GC=F"}
+
+def get_market_data_from_mcp():
+    """
+    Get the market snapshot from the MCP Server's batched price endpoint
+    
+    Returns:
+        dict: Latest market data, or None if the MCP Server is unavailable
+    """
+    try:
+        response = requests.get(
+            f"{MCP_SERVER_URL}/market-prices/yahoo_finance",
+            params={"symbols": ",".join(MARKET_SYMBOLS.values()), "period": "1d"},
+            timeout=5
+        )
+        response.raise_for_status()
+        quotes = {item["symbol"]: item["quote"] for item in response.json().get("data", [])}
+        
+        if not all(symbol in quotes for symbol in MARKET_SYMBOLS.values()):
+            return None
+        
+        data = {}
+        for name, symbol in MARKET_SYMBOLS.items():
+            change = quotes[symbol]["period_change_percent"]
+            data[name] = {
+                "price": round(quotes[symbol]["price"], 2),
+                "change": round(change, 2),
+                "change_direction": "up" if change >= 0 else "down"
+            }
+        data["timestamp"] = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        return data
+    except Exception as e:
+        logger.warning(f"MCP Server market prices unavailable, falling back to yfinance: {str(e)}")
+        return None
+
 def get_market_data():
     """
     Get latest market data for SPY, Bitcoin, and Gold
@@ -14,6 +53,11 @@ def get_market_data():
     Returns:
         dict: Latest market data
     """
+    # Prefer the MCP Server so price traffic is shared across all workers
+    data = get_market_data_from_mcp()
+    if data:
+        return data
+    
     try:
         # Fetch actual market data using yfinance
         spy = yf.Ticker("SPY")
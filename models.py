@@ -109,4 +109,25 @@ class AnalystRating(db.Model):
     previous_price_target = db.Column(db.Float, nullable=True)
     rating_date = db.Column(db.Date, nullable=False)
     notes = db.Column(db.Text, nullable=True)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
\ No newline at end of file
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.Index('ix_analyst_rating_ticker_rating_date', 'ticker', 'rating_date'),
+        db.Index('ix_analyst_rating_firm_name', 'firm_name'),
+    )
+
+
+class AnalystConsensus(db.Model):
+    # Maintained incrementally by the MCP server's analyst rating loader
+    ticker = db.Column(db.String(10), primary_key=True)
+    firm_count = db.Column(db.Integer, nullable=False, default=0)
+    buy_count = db.Column(db.Integer, nullable=False, default=0)
+    hold_count = db.Column(db.Integer, nullable=False, default=0)
+    sell_count = db.Column(db.Integer, nullable=False, default=0)
+    target_count = db.Column(db.Integer, nullable=False, default=0)
+    target_sum = db.Column(db.Float, nullable=False, default=0.0)
+    target_sum_sq = db.Column(db.Float, nullable=False, default=0.0)
+    mean_target = db.Column(db.Float, nullable=True)
+    target_dispersion = db.Column(db.Float, nullable=True)  # Standard deviation of price targets
+    latest_rating_date = db.Column(db.Date, nullable=True)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
\ No newline at end of file
@@ -45,6 +45,9 @@ db = mongo_client["finhackers"]
 # Initialize ChromaDB client
 chroma_client = chromadb.HttpClient(url=os.environ.get("VECTORDB_URL", "http://vectordb:8080"))
 
+# MCP server, which serves analyst ratings and consensus
+MCP_SERVER_URL = os.environ.get("MCP_SERVER_URL", "http://mcp-server:8000")
+
 # Security settings
 SECRET_KEY = os.environ.get("SECRET_KEY", "placeholder_secret_key_change_in_production")
 ALGORITHM = "HS256"
@@ -429,11 +432,24 @@ async def get_technical_analysis(ticker: str, current_user: User = Depends(get_c
         logger.error(f"Error getting technical analysis for {ticker}: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+async def fetch_analyst_consensus(ticker):
+    """Fetch the analyst consensus and recent ratings for a ticker from the MCP server."""
+    try:
+        async with httpx.AsyncClient() as client:
+            response = await client.get(f"{MCP_SERVER_URL}/analyst-reports/consensus/{ticker}", timeout=10.0)
+            response.raise_for_status()
+            return response.json()
+    except Exception as e:
+        logger.error(f"Error fetching analyst consensus for {ticker}: {str(e)}")
+        return {"consensus": None, "ratings": []}
+
 # Fundamental Analysis API Routes
 @app.get("/fundamental-analysis/{ticker}")
 async def get_fundamental_analysis(ticker: str, current_user: User = Depends(get_current_active_user)):
     """Get fundamental analysis for a ticker."""
     try:
+        analyst = await fetch_analyst_consensus(ticker)
+
         # For demo purposes, returning mock data
         # In production, this would query MongoDB
         return {
@@ -450,24 +466,15 @@ async def get_fundamental_analysis(ticker: str, current_user: User = Depends(get
             "profit_margin": 15.8,
             "analyst_ratings": [
                 {
-                    "firm": "Goldman Sachs",
-                    "rating": "Buy",
-                    "price_target": 195.00,
-                    "analyst": "Sarah Johnson"
-                },
-                {
-                    "firm": "Morgan Stanley",
-                    "rating": "Hold",
-                    "price_target": 180.00,
-                    "analyst": "Michael Chen"
-                },
-                {
-                    "firm": "JP Morgan",
-                    "rating": "Overweight",
-                    "price_target": 205.00,
-                    "analyst": "David Williams"
+                    "firm": rating["firm_name"],
+                    "rating": rating["rating"],
+                    "price_target": rating["price_target"],
+                    "analyst": rating["analyst_name"],
+                    "rating_date": rating["rating_date"]
                 }
+                for rating in analyst["ratings"]
             ],
+            "analyst_consensus": analyst["consensus"],
             "recent_news": [
                 {
                     "title": f"{ticker} Announces New Product Line",
@@ -0,0 +1,354 @@
+"""
+Bulk offline backfill through the Anthropic Message Batches API.
+
+Reprocessing an archive submits its requests as asynchronous message
+batches instead of interactive calls, so a large job never competes with
+live workflows for the LLM pool or the interactive rate limit. Every step
+is recorded in a local SQLite file: which requests exist, which batch each
+was submitted in, and which have results. Transient API failures (network
+errors, overload and server errors) are retried with exponential backoff;
+anything else interrupts the job, which then resumes from the recorded
+state without resubmitting or losing work. Results are collected when a
+batch ends and written back in bulk.
+
+The API base URL is configurable, so a local stand-in server can replace
+the real endpoint in tests.
+"""
+import os
+import json
+import time
+import sqlite3
+import asyncio
+import logging
+import threading
+import httpx
+
+logger = logging.getLogger(__name__)
+
+BATCH_MAX_REQUESTS = 10000  # Message Batches API limit per batch
+TRANSIENT_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504, 529}
+
+
+def is_transient(error):
+    """Whether a failed API call is worth retrying as is."""
+    if isinstance(error, httpx.HTTPStatusError):
+        return error.response.status_code in TRANSIENT_STATUS_CODES
+    return isinstance(error, httpx.TransportError)
+
+
+class MessageBatchesClient:
+    """Minimal async client for the Message Batches endpoints."""
+
+    def __init__(self, base_url=None, api_key=None, anthropic_version="2023-06-01", timeout=60):
+        self.base_url = (base_url or os.environ.get("ANTHROPIC_BASE_URL", "https://api.anthropic.com")).rstrip("/")
+        self.headers = {
+            "x-api-key": api_key or os.environ.get("ANTHROPIC_API_KEY", ""),
+            "anthropic-version": anthropic_version,
+            "content-type": "application/json",
+        }
+        self.timeout = timeout
+
+    async def create(self, requests):
+        """Submit [{"custom_id": ..., "params": {...}}, ...]; returns the batch object."""
+        async with httpx.AsyncClient(timeout=self.timeout) as client:
+            response = await client.post(f"{self.base_url}/v1/messages/batches",
+                                         headers=self.headers, json={"requests": requests})
+            response.raise_for_status()
+            return response.json()
+
+    async def retrieve(self, batch_id):
+        async with httpx.AsyncClient(timeout=self.timeout) as client:
+            response = await client.get(f"{self.base_url}/v1/messages/batches/{batch_id}", headers=self.headers)
+            response.raise_for_status()
+            return response.json()
+
+    async def results(self, batch):
+        """Yield result lines of an ended batch one at a time."""
+        url = batch.get("results_url") or f"{self.base_url}/v1/messages/batches/{batch['id']}/results"
+        async with httpx.AsyncClient(timeout=self.timeout) as client:
+            async with client.stream("GET", url, headers=self.headers) as response:
+                response.raise_for_status()
+                async for line in response.aiter_lines():
+                    if line.strip():
+                        yield json.loads(line)
+
+
+class BackfillStore:
+    """Persisted state of backfill jobs, their requests and batches."""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = None
+
+    @property
+    def conn(self):
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.executescript(
+                """
+                PRAGMA journal_mode=WAL;
+                CREATE TABLE IF NOT EXISTS jobs (
+                    job_id TEXT PRIMARY KEY,
+                    kind TEXT NOT NULL,
+                    params TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL,
+                    error TEXT
+                );
+                CREATE TABLE IF NOT EXISTS requests (
+                    job_id TEXT NOT NULL,
+                    custom_id TEXT NOT NULL,
+                    payload TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    batch_id TEXT,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    error TEXT,
+                    PRIMARY KEY (job_id, custom_id)
+                );
+                CREATE INDEX IF NOT EXISTS idx_requests_status ON requests (job_id, status);
+                CREATE TABLE IF NOT EXISTS batches (
+                    batch_id TEXT PRIMARY KEY,
+                    job_id TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    request_count INTEGER NOT NULL,
+                    submitted_at REAL NOT NULL,
+                    ended_at REAL
+                );
+                """
+            )
+        return self._conn
+
+    def create_job(self, job_id, kind, params, payloads):
+        """Create a job with one request per payload, keyed by custom_id."""
+        now = time.time()
+        with self._lock:
+            self.conn.execute(
+                "INSERT INTO jobs (job_id, kind, params, status, created_at, updated_at) VALUES (?, ?, ?, 'pending', ?, ?)",
+                (job_id, kind, json.dumps(params), now, now)
+            )
+            self.conn.executemany(
+                "INSERT INTO requests (job_id, custom_id, payload, status) VALUES (?, ?, ?, 'pending')",
+                [(job_id, custom_id, json.dumps(payload, default=str)) for custom_id, payload in payloads]
+            )
+            self.conn.commit()
+
+    def set_job_status(self, job_id, status, error=None):
+        with self._lock:
+            self.conn.execute("UPDATE jobs SET status = ?, error = ?, updated_at = ? WHERE job_id = ?",
+                              (status, error, time.time(), job_id))
+            self.conn.commit()
+
+    def job(self, job_id):
+        with self._lock:
+            row = self.conn.execute("SELECT kind, params, status, created_at, updated_at, error FROM jobs WHERE job_id = ?",
+                                    (job_id,)).fetchone()
+            if row is None:
+                return None
+            counts = dict(self.conn.execute(
+                "SELECT status, COUNT(*) FROM requests WHERE job_id = ? GROUP BY status", (job_id,)
+            ).fetchall())
+        kind, params, status, created_at, updated_at, error = row
+        return {
+            "job_id": job_id,
+            "kind": kind,
+            "params": json.loads(params),
+            "status": status,
+            "created_at": created_at,
+            "updated_at": updated_at,
+            "error": error,
+            "requests": counts,
+        }
+
+    def unfinished_jobs(self):
+        with self._lock:
+            return [row[0] for row in self.conn.execute(
+                "SELECT job_id FROM jobs WHERE status NOT IN ('completed', 'failed') ORDER BY created_at"
+            )]
+
+    def pending_requests(self, job_id, limit):
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT custom_id, payload FROM requests WHERE job_id = ? AND status = 'pending' LIMIT ?",
+                (job_id, limit)
+            ).fetchall()
+        return [(custom_id, json.loads(payload)) for custom_id, payload in rows]
+
+    def payloads(self, job_id, custom_ids):
+        rows = []
+        with self._lock:
+            # Stay well under SQLite's bound-parameter limit
+            for start in range(0, len(custom_ids), 500):
+                chunk = custom_ids[start:start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                rows.extend(self.conn.execute(
+                    f"SELECT custom_id, payload FROM requests WHERE job_id = ? AND custom_id IN ({placeholders})",
+                    [job_id, *chunk]
+                ).fetchall())
+        return {custom_id: json.loads(payload) for custom_id, payload in rows}
+
+    def record_batch(self, job_id, batch_id, custom_ids):
+        with self._lock:
+            self.conn.execute(
+                "INSERT INTO batches (batch_id, job_id, status, request_count, submitted_at) VALUES (?, ?, 'in_progress', ?, ?)",
+                (batch_id, job_id, len(custom_ids), time.time())
+            )
+            self.conn.executemany(
+                "UPDATE requests SET status = 'submitted', batch_id = ?, attempts = attempts + 1 WHERE job_id = ? AND custom_id = ?",
+                [(batch_id, job_id, custom_id) for custom_id in custom_ids]
+            )
+            self.conn.commit()
+
+    def open_batches(self, job_id):
+        with self._lock:
+            return [row[0] for row in self.conn.execute(
+                "SELECT batch_id FROM batches WHERE job_id = ? AND status = 'in_progress'", (job_id,)
+            )]
+
+    def finish_batch(self, job_id, batch_id, succeeded, failed, max_attempts):
+        """Record a batch's outcome; failed requests go back to pending until max_attempts."""
+        with self._lock:
+            self.conn.executemany(
+                "UPDATE requests SET status = 'done', error = NULL WHERE job_id = ? AND custom_id = ?",
+                [(job_id, custom_id) for custom_id in succeeded]
+            )
+            self.conn.executemany(
+                """
+                UPDATE requests SET error = ?,
+                    status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END
+                WHERE job_id = ? AND custom_id = ?
+                """,
+                [(error, max_attempts, job_id, custom_id) for custom_id, error in failed.items()]
+            )
+            # Anything the batch never reported on is retried as well
+            self.conn.execute(
+                """
+                UPDATE requests SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END,
+                    error = 'missing from batch results'
+                WHERE job_id = ? AND batch_id = ? AND status = 'submitted'
+                """,
+                (max_attempts, job_id, batch_id)
+            )
+            self.conn.execute("UPDATE batches SET status = 'ended', ended_at = ? WHERE batch_id = ?",
+                              (time.time(), batch_id))
+            self.conn.commit()
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+class BackfillRunner:
+    """
+    Drive backfill jobs through submit, poll, collect and write-back.
+
+    build_params(payload) returns the Messages API params for a request.
+    parse_result(payload, message) turns a succeeded message into a result,
+    raising if it can't be used. write_back(job_id, [(custom_id, payload,
+    result), ...]) stores one batch's results in bulk and must be
+    idempotent, since a crash between writing and recording replays it.
+    """
+
+    def __init__(self, client, store, build_params, parse_result, write_back,
+                 poll_interval=30, max_attempts=3, batch_size=BATCH_MAX_REQUESTS,
+                 max_retries=5, retry_backoff=5, max_retry_backoff=300):
+        self.client = client
+        self.store = store
+        self.build_params = build_params
+        self.parse_result = parse_result
+        self.write_back = write_back
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.batch_size = batch_size
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.max_retry_backoff = max_retry_backoff
+        self._stats = {"batches_submitted": 0, "requests_submitted": 0, "succeeded": 0, "failed": 0, "retries": 0}
+
+    async def _retrying(self, job_id, call, *args):
+        """Await call(*args), retrying transient API failures with exponential backoff."""
+        for attempt in range(self.max_retries + 1):
+            try:
+                return await call(*args)
+            except Exception as e:
+                if attempt == self.max_retries or not is_transient(e):
+                    raise
+                delay = min(self.retry_backoff * 2 ** attempt, self.max_retry_backoff)
+                self._stats["retries"] += 1
+                logger.warning(f"Backfill {job_id}: {str(e)}; retrying in {delay:.0f}s")
+                await asyncio.sleep(delay)
+
+    async def _submit_pending(self, job_id):
+        while True:
+            pending = await asyncio.to_thread(self.store.pending_requests, job_id, self.batch_size)
+            if not pending:
+                return
+            batch = await self._retrying(job_id, self.client.create, [
+                {"custom_id": custom_id, "params": self.build_params(payload)} for custom_id, payload in pending
+            ])
+            custom_ids = [custom_id for custom_id, _ in pending]
+            await asyncio.to_thread(self.store.record_batch, job_id, batch["id"], custom_ids)
+            self._stats["batches_submitted"] += 1
+            self._stats["requests_submitted"] += len(custom_ids)
+            logger.info(f"Backfill {job_id}: submitted batch {batch['id']} with {len(custom_ids)} requests")
+
+    async def _collect(self, job_id, batch):
+        lines = [line async for line in self.client.results(batch)]
+        payloads = await asyncio.to_thread(self.store.payloads, job_id, [line["custom_id"] for line in lines])
+
+        results = []
+        failed = {}
+        for line in lines:
+            custom_id = line["custom_id"]
+            result = line.get("result", {})
+            if custom_id not in payloads:
+                continue
+            if result.get("type") != "succeeded":
+                failed[custom_id] = result.get("type", "unknown")
+                continue
+            try:
+                results.append((custom_id, payloads[custom_id], self.parse_result(payloads[custom_id], result["message"])))
+            except Exception as e:
+                failed[custom_id] = f"unparseable result: {str(e)}"
+
+        if results:
+            await self.write_back(job_id, results)
+        await asyncio.to_thread(self.store.finish_batch, job_id, batch["id"],
+                                [custom_id for custom_id, _, _ in results], failed, self.max_attempts)
+        self._stats["succeeded"] += len(results)
+        self._stats["failed"] += len(failed)
+        logger.info(f"Backfill {job_id}: batch {batch['id']} ended with {len(results)} succeeded, {len(failed)} failed")
+
+    async def run(self, job_id):
+        """Run (or resume) a job until every request is done or has failed for good."""
+        await asyncio.to_thread(self.store.set_job_status, job_id, "running")
+        try:
+            while True:
+                await self._submit_pending(job_id)
+                open_batches = await asyncio.to_thread(self.store.open_batches, job_id)
+                if not open_batches:
+                    break
+                for batch_id in open_batches:
+                    batch = await self._retrying(job_id, self.client.retrieve, batch_id)
+                    if batch.get("processing_status") == "ended":
+                        # Safe to repeat, since write_back is idempotent
+                        await self._retrying(job_id, self._collect, job_id, batch)
+                if await asyncio.to_thread(self.store.open_batches, job_id):
+                    await asyncio.sleep(self.poll_interval)
+        except Exception as e:
+            # Left resumable: a restart or POST /backfill/{job_id} picks up from the recorded state
+            logger.error(f"Backfill {job_id} interrupted: {str(e)}")
+            await asyncio.to_thread(self.store.set_job_status, job_id, "interrupted", str(e))
+            return await asyncio.to_thread(self.store.job, job_id)
+
+        await asyncio.to_thread(self.store.set_job_status, job_id, "completed")
+        return await asyncio.to_thread(self.store.job, job_id)
+
+    def metrics(self):
+        return dict(self._stats)
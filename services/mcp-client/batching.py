@@ -0,0 +1,78 @@
+"""
+Token-budget batch packing for LLM requests.
+
+Instead of a fixed number of items per request, items are packed in order
+until the estimated input tokens would exceed the input budget, or the
+expected output would exceed the output budget. Short items therefore
+travel many per call and long ones few. Items too large to share a request
+are truncated to fit.
+"""
+from llm_cache import CHARS_PER_TOKEN, estimate_tokens
+
+TRUNCATION_MARKER = " [truncated]"
+
+
+def truncate_to_tokens(text, max_tokens):
+    """Cut text to roughly max_tokens, on a word boundary where possible."""
+    if not text or estimate_tokens(text) <= max_tokens:
+        return text
+    limit = max(0, max_tokens * CHARS_PER_TOKEN - len(TRUNCATION_MARKER))
+    cut = text[:limit]
+    space = cut.rfind(" ")
+    if space > limit // 2:
+        cut = cut[:space]
+    return cut + TRUNCATION_MARKER
+
+
+def pack_by_token_budget(items, item_tokens, input_budget, output_tokens_per_item, output_budget, max_items=None):
+    """
+    Group items into batches that fit the input and output token budgets.
+
+    item_tokens gives the estimated prompt tokens for each item. Order is
+    preserved, both across and within batches, so position j of a batch
+    always maps back to the same item. An item larger than the whole input
+    budget still gets a batch of its own.
+    """
+    per_batch = max(1, output_budget // max(1, output_tokens_per_item))
+    if max_items:
+        per_batch = min(per_batch, max_items)
+
+    batches = []
+    current = []
+    current_tokens = 0
+    for item, tokens in zip(items, item_tokens):
+        if current and (current_tokens + tokens > input_budget or len(current) >= per_batch):
+            batches.append(current)
+            current = []
+            current_tokens = 0
+        current.append(item)
+        current_tokens += tokens
+    if current:
+        batches.append(current)
+    return batches
+
+
+def extract_indexed_items(payload, index_field, count):
+    """
+    Map 1-based indices to result items from a model's JSON response.
+
+    Accepts a bare array or an object wrapping one. Items with a missing,
+    duplicate or out-of-range index are dropped, so the caller can treat
+    any index not returned as failed.
+    """
+    if isinstance(payload, dict):
+        payload = next((value for value in payload.values() if isinstance(value, list)), [])
+    if not isinstance(payload, list):
+        return {}
+
+    items = {}
+    for item in payload:
+        if not isinstance(item, dict):
+            continue
+        try:
+            index = int(item.get(index_field))
+        except (TypeError, ValueError):
+            continue
+        if 1 <= index <= count and index not in items:
+            items[index] = item
+    return items
@@ -0,0 +1,284 @@
+"""
+Batched, cached document embeddings.
+
+Vectors are computed here rather than left to the vector store, which
+embedded documents one at a time. Texts from every workflow go into one
+queue and are flushed to a process pool, sized to the CPU cores, in
+batches of up to EMBEDDING_BATCH_SIZE (or after EMBEDDING_MAX_WAIT,
+whichever comes first). Each worker loads the model once and runs
+single-threaded, so the cores stay busy with whole batches instead of
+contending over one.
+
+Every vector is cached by a hash of its text and the model. The vectors
+live in a memory-mapped float32 file, and a SQLite index maps keys to
+rows. Re-ingesting a text reads its vector back from the page cache
+instead of recomputing it.
+"""
+import os
+import time
+import asyncio
+import hashlib
+import sqlite3
+import logging
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+
+from llm_cache import normalize_text
+
+logger = logging.getLogger(__name__)
+
+# Same model as Chroma's default embedding function, so existing collections
+# and text queries stay compatible
+EMBEDDING_MODEL = os.environ.get("EMBEDDING_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
+EMBEDDING_WORKERS = int(os.environ.get("EMBEDDING_WORKERS", os.cpu_count() or 1))
+EMBEDDING_BATCH_SIZE = int(os.environ.get("EMBEDDING_BATCH_SIZE", 64))
+EMBEDDING_MAX_WAIT = float(os.environ.get("EMBEDDING_MAX_WAIT", 0.05))  # seconds
+
+_worker_model = None
+
+
+def _load_model(model_name):
+    """Process pool initializer: load the model once per worker."""
+    global _worker_model
+    import torch
+    from langchain_community.embeddings import HuggingFaceEmbeddings
+
+    # One core per worker; the pool supplies the parallelism
+    torch.set_num_threads(1)
+    _worker_model = HuggingFaceEmbeddings(model_name=model_name)
+
+
+def _embed_batch(texts):
+    return np.asarray(_worker_model.embed_documents(texts), dtype=np.float32)
+
+
+class EmbeddingStore:
+    """Content-addressed float32 vectors in a memory-mapped file."""
+
+    def __init__(self, directory, initial_capacity=1024):
+        self.directory = directory
+        self.vectors_path = os.path.join(directory, "vectors.f32")
+        self.initial_capacity = initial_capacity
+        self._lock = threading.Lock()
+        self._conn = None
+        self._vectors = None
+        self.dim = None
+        self.rows = 0
+
+    @property
+    def conn(self):
+        if self._conn is None:
+            os.makedirs(self.directory, exist_ok=True)
+            self._conn = sqlite3.connect(os.path.join(self.directory, "index.sqlite3"), check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("CREATE TABLE IF NOT EXISTS vectors (key TEXT PRIMARY KEY, row INTEGER NOT NULL)")
+            self._conn.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+            self._conn.commit()
+            meta = dict(self._conn.execute("SELECT name, value FROM meta").fetchall())
+            self.dim = meta.get("dim")
+            # Rows past the last indexed one were never committed and get reused
+            self.rows = self._conn.execute("SELECT COALESCE(MAX(row) + 1, 0) FROM vectors").fetchone()[0]
+            if self.dim:
+                self._map(max(self.initial_capacity, self.rows))
+        return self._conn
+
+    def _map(self, capacity):
+        """(Re)map the vector file with room for at least capacity rows."""
+        if self._vectors is not None:
+            self._vectors.flush()
+        size = capacity * self.dim * 4
+        if not os.path.exists(self.vectors_path) or os.path.getsize(self.vectors_path) < size:
+            with open(self.vectors_path, "ab") as f:
+                f.truncate(size)
+        rows = os.path.getsize(self.vectors_path) // (self.dim * 4)
+        self._vectors = np.memmap(self.vectors_path, dtype=np.float32, mode="r+", shape=(rows, self.dim))
+
+    @staticmethod
+    def make_key(text, model):
+        return hashlib.sha256(f"{normalize_text(text)}\0{model}".encode("utf-8")).hexdigest()
+
+    def get_many(self, keys):
+        """Return key -> vector for the keys that are present."""
+        unique = list(dict.fromkeys(keys))
+        found = {}
+        with self._lock:
+            for start in range(0, len(unique), 500):
+                chunk = unique[start:start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                found.update(self.conn.execute(
+                    f"SELECT key, row FROM vectors WHERE key IN ({placeholders})", chunk
+                ).fetchall())
+            if not found:
+                return {}
+            return {key: np.array(self._vectors[row]) for key, row in found.items()}
+
+    def put_many(self, keys, vectors):
+        """Store vectors (an (n, dim) float32 array) under their keys."""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if not len(keys):
+            return 0
+        with self._lock:
+            conn = self.conn
+            if self.dim is None:
+                self.dim = int(vectors.shape[1])
+                conn.execute("INSERT OR REPLACE INTO meta (name, value) VALUES ('dim', ?)", (self.dim,))
+                self._map(self.initial_capacity)
+            elif vectors.shape[1] != self.dim:
+                raise ValueError(f"Expected {self.dim}-dimensional vectors, got {vectors.shape[1]}")
+
+            existing = {}
+            for start in range(0, len(keys), 500):
+                chunk = list(keys[start:start + 500])
+                existing.update(conn.execute(
+                    f"SELECT key, row FROM vectors WHERE key IN ({','.join('?' * len(chunk))})", chunk
+                ).fetchall())
+            rows = []
+            new_rows = []
+            for key in keys:
+                row = existing.get(key)
+                if row is None:
+                    row = self.rows
+                    self.rows += 1
+                    existing[key] = row
+                    new_rows.append((key, row))
+                rows.append(row)
+
+            if self.rows > len(self._vectors):
+                self._map(max(self.rows, 2 * len(self._vectors)))
+            self._vectors[rows] = vectors
+            # Vectors reach the file before the index points at them
+            self._vectors.flush()
+            conn.executemany("INSERT OR REPLACE INTO vectors (key, row) VALUES (?, ?)", new_rows)
+            conn.commit()
+        return len(new_rows)
+
+    def close(self):
+        with self._lock:
+            if self._vectors is not None:
+                self._vectors.flush()
+                self._vectors = None
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+class BatchEmbedder:
+    """Queue texts from all callers and embed them in batches on a process pool."""
+
+    def __init__(self, store, model_name=EMBEDDING_MODEL, workers=EMBEDDING_WORKERS,
+                 batch_size=EMBEDDING_BATCH_SIZE, max_wait=EMBEDDING_MAX_WAIT):
+        self.store = store
+        self.model_name = model_name
+        self.workers = workers
+        self.batch_size = batch_size
+        self.max_wait = max_wait
+        self._executor = None
+        self._pending = []  # (key, text, future) waiting for the next flush
+        self._in_flight = {}  # key -> future, so concurrent callers share one computation
+        self._flush_timer = None
+        self._stats = {
+            "requested": 0, "cache_hits": 0, "embedded": 0, "batches": 0, "failed_batches": 0,
+            "embed_seconds": 0.0, "pool_restarts": 0,
+        }
+
+    @property
+    def executor(self):
+        if self._executor is None:
+            # Spawned, not forked: the workers load torch, which doesn't survive a fork
+            # of a process that already has threads running
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers, initializer=_load_model, initargs=(self.model_name,),
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._executor
+
+    async def embed(self, texts):
+        """Return one float32 vector per text, computing only those not cached."""
+        keys = [self.store.make_key(text, self.model_name) for text in texts]
+        vectors = await asyncio.to_thread(self.store.get_many, keys)
+        self._stats["requested"] += len(texts)
+        self._stats["cache_hits"] += sum(1 for key in keys if key in vectors)
+
+        loop = asyncio.get_running_loop()
+        waiting = {}
+        for key, text in zip(keys, texts):
+            if key in vectors or key in waiting:
+                continue
+            future = self._in_flight.get(key)
+            if future is None:
+                future = loop.create_future()
+                self._in_flight[key] = future
+                self._pending.append((key, text, future))
+            waiting[key] = future
+
+        if len(self._pending) >= self.batch_size:
+            self._flush()
+        elif self._pending and self._flush_timer is None:
+            self._flush_timer = loop.call_later(self.max_wait, self._flush)
+
+        for key, future in waiting.items():
+            vectors[key] = await future
+        return [vectors[key] for key in keys]
+
+    def _flush(self):
+        if self._flush_timer is not None:
+            self._flush_timer.cancel()
+            self._flush_timer = None
+        pending, self._pending = self._pending, []
+        for start in range(0, len(pending), self.batch_size):
+            asyncio.ensure_future(self._run_batch(pending[start:start + self.batch_size]))
+
+    async def _run_batch(self, batch):
+        keys = [key for key, _, _ in batch]
+        started_at = time.perf_counter()
+        executor = self.executor
+        try:
+            vectors = await asyncio.get_running_loop().run_in_executor(
+                executor, _embed_batch, [text for _, text, _ in batch]
+            )
+            self._stats["embed_seconds"] += time.perf_counter() - started_at
+            await asyncio.to_thread(self.store.put_many, keys, vectors)
+            for (_, _, future), vector in zip(batch, vectors):
+                if not future.done():
+                    future.set_result(vector)
+            self._stats["embedded"] += len(batch)
+            self._stats["batches"] += 1
+        except Exception as e:
+            logger.error(f"Error embedding batch of {len(batch)} texts: {str(e)}")
+            if isinstance(e, BrokenProcessPool) and self._executor is executor:
+                # A worker died (often the OOM killer); a broken pool rejects every
+                # later submit, so drop it and let the next batch start a fresh one
+                executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+                self._stats["pool_restarts"] += 1
+            self._stats["failed_batches"] += 1
+            for _, _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+        finally:
+            for key in keys:
+                self._in_flight.pop(key, None)
+
+    def metrics(self):
+        requested = self._stats["requested"]
+        return {
+            **self._stats,
+            "model": self.model_name,
+            "workers": self.workers,
+            "queued": len(self._pending),
+            "in_flight": len(self._in_flight),
+            "cache_hit_rate": self._stats["cache_hits"] / requested if requested else 0.0,
+            "avg_batch_size": self._stats["embedded"] / self._stats["batches"] if self._stats["batches"] else 0.0,
+            "avg_batch_seconds": self._stats["embed_seconds"] / self._stats["batches"] if self._stats["batches"] else 0.0,
+            "stored_vectors": self.store.rows,
+        }
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+        self.store.close()
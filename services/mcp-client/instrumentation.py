@@ -0,0 +1,238 @@
+"""
+Per-node timing and progress for the processing workflows.
+
+Each workflow node is wrapped so that a run records a span: wall time, the
+number of items it produced, the LLM tokens spent inside it and any error.
+A streaming fetch records one span per micro-batch it yields, along with
+the total the source announced, if any. Spans go to two places. One is the
+trace of the job being run, which turns them into progress, the share of
+fetched items whose batches have been saved, and keeps them on the job
+record. The other is a process-wide set of per-node latency histograms,
+served from /metrics/workflows. The trace and the current span travel in
+context variables, so nodes need no extra arguments. Tokens are attributed
+to a span even when the node fans its LLM calls out over several tasks.
+"""
+import time
+import bisect
+import itertools
+import logging
+import functools
+import contextvars
+
+logger = logging.getLogger(__name__)
+
+CURRENT_TRACE = contextvars.ContextVar("workflow_trace", default=None)
+CURRENT_SPAN = contextvars.ContextVar("workflow_span", default=None)
+
+LATENCY_BUCKETS = [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300]  # seconds
+ITEM_KEYS = ("posts", "analyzed_articles", "articles", "data")
+TOTAL_KEY = "item_count"  # announced by a streaming source, e.g. from X-Item-Count
+
+
+def count_items(result):
+    """Best-effort count of the items a node produced."""
+    if not isinstance(result, dict):
+        return None
+    for key in ITEM_KEYS:
+        value = result.get(key)
+        if isinstance(value, dict):
+            value = value.get("data")
+        if isinstance(value, list):
+            return len(value)
+    if isinstance(result.get("document_count"), int):
+        return result["document_count"]
+    return None
+
+
+def announced_total(result):
+    """Total item count a streamed micro-batch says its source holds, if any."""
+    if not isinstance(result, dict):
+        return None
+    for value in (result, result.get("data")):
+        if isinstance(value, dict) and isinstance(value.get(TOTAL_KEY), int):
+            return value[TOTAL_KEY]
+    return None
+
+
+def record_tokens(input_tokens, output_tokens):
+    """Attribute LLM tokens to the node currently running, if any."""
+    span = CURRENT_SPAN.get()
+    if span is not None:
+        span["input_tokens"] += input_tokens
+        span["output_tokens"] += output_tokens
+
+
+class WorkflowTrace:
+    """Spans of one workflow run and the progress they add up to."""
+
+    def __init__(self, fetch_node="fetch", save_node="save_to_database", on_update=None):
+        self.fetch_node = fetch_node
+        self.save_node = save_node
+        self.on_update = on_update  # async callable(progress, spans)
+        self.spans = []
+
+    @property
+    def progress(self):
+        """
+        Items whose batches have been saved, as a share of all items to fetch.
+
+        Each fetched batch is saved once, so the first N fetch spans stand for
+        the N saves so far. The total is what each stream announced; without
+        one, another batch is assumed to follow, so progress never reaches
+        1.0 before the job completes.
+        """
+        fetches = [span for span in self.spans if span["node"] == self.fetch_node]
+        saved = sum(1 for span in self.spans if span["node"] == self.save_node)
+        if not fetches:
+            return 0.0
+        totals = {}
+        for span in fetches:
+            if span.get("total_items") is not None:
+                totals[span["stream"]] = span["total_items"]
+        if len(totals) < len({span["stream"] for span in fetches}):
+            return min(saved, len(fetches)) / (len(fetches) + 1)
+        total = sum(totals.values())
+        stored = sum(span["items"] or 0 for span in fetches[:saved])
+        return min(1.0, stored / total) if total else 0.0
+
+    async def add(self, span):
+        self.spans.append(span)
+        if self.on_update is not None:
+            try:
+                await self.on_update(self.progress, self.spans)
+            except Exception as e:
+                logger.warning(f"Could not record workflow progress: {str(e)}")
+
+
+class NodeMetrics:
+    """Latency histograms and totals per (workflow, node)."""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self._nodes = {}
+
+    def observe(self, span):
+        key = f"{span['workflow']}.{span['node']}"
+        stats = self._nodes.get(key)
+        if stats is None:
+            stats = self._nodes[key] = {
+                "count": 0, "errors": 0, "total_seconds": 0.0, "max_seconds": 0.0,
+                "items": 0, "input_tokens": 0, "output_tokens": 0,
+                "histogram": [0] * (len(self.buckets) + 1),
+            }
+        stats["count"] += 1
+        stats["errors"] += 1 if span["error"] else 0
+        stats["total_seconds"] += span["seconds"]
+        stats["max_seconds"] = max(stats["max_seconds"], span["seconds"])
+        stats["items"] += span["items"] or 0
+        stats["input_tokens"] += span["input_tokens"]
+        stats["output_tokens"] += span["output_tokens"]
+        stats["histogram"][bisect.bisect_left(self.buckets, span["seconds"])] += 1
+
+    def _quantile(self, histogram, count, fraction):
+        """Upper bound of the bucket holding the given quantile."""
+        target = fraction * count
+        seen = 0
+        for i, bucket_count in enumerate(histogram):
+            seen += bucket_count
+            if seen >= target:
+                return self.buckets[i] if i < len(self.buckets) else float("inf")
+        return 0.0
+
+    def metrics(self):
+        nodes = {}
+        for key, stats in self._nodes.items():
+            count = stats["count"]
+            nodes[key] = {
+                **{name: value for name, value in stats.items() if name != "histogram"},
+                "avg_seconds": stats["total_seconds"] / count if count else 0.0,
+                "p50_seconds": self._quantile(stats["histogram"], count, 0.5),
+                "p95_seconds": self._quantile(stats["histogram"], count, 0.95),
+                # Cumulative, like Prometheus "le" buckets
+                "histogram": dict(zip(
+                    [f"le_{bound}" for bound in self.buckets] + ["le_inf"],
+                    itertools.accumulate(stats["histogram"])
+                )),
+            }
+        return {"buckets": self.buckets, "nodes": nodes}
+
+
+NODE_METRICS = NodeMetrics()
+_stream_ids = itertools.count()
+
+
+def _new_span(workflow, node):
+    return {
+        "workflow": workflow,
+        "node": node,
+        "started_at": time.time(),
+        "seconds": 0.0,
+        "items": None,
+        "input_tokens": 0,
+        "output_tokens": 0,
+        "error": None,
+    }
+
+
+async def _finish_span(span, started_at, metrics):
+    span["seconds"] = time.perf_counter() - started_at
+    metrics.observe(span)
+    trace = CURRENT_TRACE.get()
+    if trace is not None:
+        await trace.add(span)
+
+
+def traced(workflow, node, metrics=NODE_METRICS):
+    """Decorator recording a span for every run of an async workflow node."""
+    def decorator(fn):
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            span = _new_span(workflow, node)
+            token = CURRENT_SPAN.set(span)
+            started_at = time.perf_counter()
+            try:
+                result = await fn(*args, **kwargs)
+                span["items"] = count_items(result)
+                if isinstance(result, dict) and result.get("status") == "error":
+                    span["error"] = result.get("message", "error")
+                return result
+            except Exception as e:
+                span["error"] = str(e)
+                raise
+            finally:
+                CURRENT_SPAN.reset(token)
+                await _finish_span(span, started_at, metrics)
+        return wrapper
+    return decorator
+
+
+def traced_stream(workflow, node, metrics=NODE_METRICS):
+    """Decorator recording a span for every item an async generator node yields."""
+    def decorator(fn):
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            items = fn(*args, **kwargs)
+            stream = next(_stream_ids)
+            try:
+                while True:
+                    # Each span covers producing one item, not the consumer's time in between
+                    span = {**_new_span(workflow, node), "stream": stream, "total_items": None}
+                    started_at = time.perf_counter()
+                    try:
+                        item = await items.__anext__()
+                    except StopAsyncIteration:
+                        return
+                    except Exception as e:
+                        span["error"] = str(e)
+                        await _finish_span(span, started_at, metrics)
+                        raise
+                    span["items"] = count_items(item)
+                    span["total_items"] = announced_total(item)
+                    if isinstance(item, dict) and item.get("status") == "error":
+                        span["error"] = item.get("message", "error")
+                    await _finish_span(span, started_at, metrics)
+                    yield item
+            finally:
+                await items.aclose()
+        return wrapper
+    return decorator
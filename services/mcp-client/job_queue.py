@@ -0,0 +1,297 @@
+"""
+Durable job queue and bounded worker pool for processing workflows.
+
+Jobs are rows in a local SQLite file rather than entries in a dict, so
+memory stays flat and a restart re-queues whatever was running. A fixed
+number of workers claim jobs in priority order, interactive requests
+ahead of scheduled ones, and some workers can be reserved for the
+interactive lane so a backlog of scheduled work never blocks a user. A
+job with the same dedup key as one already queued or running is not
+created again; the caller gets the existing job's ID. Finished jobs and
+their results are kept for a retention period, then evicted.
+"""
+import os
+import json
+import time
+import uuid
+import asyncio
+import sqlite3
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+PRIORITY_INTERACTIVE = 0
+PRIORITY_SCHEDULED = 10
+PRIORITIES = {"interactive": PRIORITY_INTERACTIVE, "scheduled": PRIORITY_SCHEDULED}
+
+JOB_WORKERS = int(os.environ.get("JOB_WORKERS", 4))
+JOB_INTERACTIVE_WORKERS = int(os.environ.get("JOB_INTERACTIVE_WORKERS", 1))  # reserved for interactive jobs
+JOB_RETENTION = int(os.environ.get("JOB_RETENTION", 24 * 3600))  # seconds
+JOB_MAX_FINISHED = int(os.environ.get("JOB_MAX_FINISHED", 10000))
+
+
+class JobQueue:
+    """SQLite-backed job table with priority claiming and in-flight dedup."""
+
+    def __init__(self, path, retention=JOB_RETENTION, max_finished=JOB_MAX_FINISHED):
+        self.path = path
+        self.retention = retention
+        self.max_finished = max_finished
+        self._lock = threading.Lock()
+        self._conn = None
+
+    @property
+    def conn(self):
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.executescript(
+                """
+                PRAGMA journal_mode=WAL;
+                CREATE TABLE IF NOT EXISTS jobs (
+                    job_id TEXT PRIMARY KEY,
+                    kind TEXT NOT NULL,
+                    dedup_key TEXT,
+                    priority INTEGER NOT NULL,
+                    params TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL,
+                    finished_at REAL,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    details TEXT,
+                    progress REAL NOT NULL DEFAULT 0,
+                    spans TEXT
+                );
+                CREATE INDEX IF NOT EXISTS idx_jobs_claim ON jobs (status, priority, created_at);
+                CREATE INDEX IF NOT EXISTS idx_jobs_finished ON jobs (finished_at);
+                -- At most one queued or running job per dedup key
+                CREATE UNIQUE INDEX IF NOT EXISTS idx_jobs_in_flight ON jobs (dedup_key)
+                    WHERE status IN ('queued', 'running');
+                """
+            )
+            # Tables created before progress tracking lack its columns
+            columns = {row[1] for row in self._conn.execute("PRAGMA table_info(jobs)")}
+            for column, definition in (("progress", "REAL NOT NULL DEFAULT 0"), ("spans", "TEXT")):
+                if column not in columns:
+                    self._conn.execute(f"ALTER TABLE jobs ADD COLUMN {column} {definition}")
+            self._conn.commit()
+        return self._conn
+
+    def submit(self, kind, params, dedup_key=None, priority=PRIORITY_INTERACTIVE):
+        """Queue a job; returns (job_id, created), reusing an in-flight job with the same dedup key."""
+        now = time.time()
+        job_id = f"{kind}_{uuid.uuid4().hex}"
+        with self._lock:
+            if dedup_key is not None:
+                row = self.conn.execute(
+                    "SELECT job_id, priority FROM jobs WHERE dedup_key = ? AND status IN ('queued', 'running')",
+                    (dedup_key,)
+                ).fetchone()
+                if row is not None:
+                    # A duplicate request can still move the queued job into a faster lane
+                    if priority < row[1]:
+                        self.conn.execute("UPDATE jobs SET priority = ? WHERE job_id = ? AND status = 'queued'",
+                                          (priority, row[0]))
+                        self.conn.commit()
+                    return row[0], False
+            self.conn.execute(
+                """
+                INSERT INTO jobs (job_id, kind, dedup_key, priority, params, status, created_at, updated_at)
+                VALUES (?, ?, ?, ?, ?, 'queued', ?, ?)
+                """,
+                (job_id, kind, dedup_key, priority, json.dumps(params, default=str), now, now)
+            )
+            self.conn.commit()
+        return job_id, True
+
+    def claim(self, max_priority=None):
+        """Mark the most urgent queued job as running and return it, or None."""
+        with self._lock:
+            query = "SELECT job_id, kind, params FROM jobs WHERE status = 'queued'"
+            args = []
+            if max_priority is not None:
+                query += " AND priority <= ?"
+                args.append(max_priority)
+            row = self.conn.execute(query + " ORDER BY priority, created_at LIMIT 1", args).fetchone()
+            if row is None:
+                return None
+            self.conn.execute(
+                "UPDATE jobs SET status = 'running', attempts = attempts + 1, progress = 0, spans = NULL, updated_at = ? WHERE job_id = ?",
+                (time.time(), row[0])
+            )
+            self.conn.commit()
+        return {"job_id": row[0], "kind": row[1], "params": json.loads(row[2])}
+
+    def update_progress(self, job_id, progress, spans):
+        with self._lock:
+            self.conn.execute(
+                "UPDATE jobs SET progress = ?, spans = ?, updated_at = ? WHERE job_id = ?",
+                (progress, json.dumps(spans, default=str), time.time(), job_id)
+            )
+            self.conn.commit()
+
+    def finish(self, job_id, status, details):
+        now = time.time()
+        with self._lock:
+            self.conn.execute(
+                "UPDATE jobs SET status = ?, details = ?, updated_at = ?, finished_at = ? WHERE job_id = ?",
+                (status, json.dumps(details, default=str), now, now, job_id)
+            )
+            self.conn.commit()
+
+    def requeue_running(self):
+        """Put jobs left running by a previous process back in the queue."""
+        with self._lock:
+            count = self.conn.execute(
+                "UPDATE jobs SET status = 'queued', updated_at = ? WHERE status = 'running'", (time.time(),)
+            ).rowcount
+            self.conn.commit()
+        return count
+
+    def job(self, job_id):
+        with self._lock:
+            row = self.conn.execute(
+                """
+                SELECT kind, status, priority, created_at, updated_at, attempts, details, progress, spans
+                FROM jobs WHERE job_id = ?
+                """,
+                (job_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        kind, status, priority, created_at, updated_at, attempts, details, progress, spans = row
+        return {
+            "job_id": job_id,
+            "kind": kind,
+            "status": status,
+            "priority": priority,
+            "created_at": created_at,
+            "updated_at": updated_at,
+            "attempts": attempts,
+            "details": json.loads(details) if details else {},
+            "progress": progress,
+            "spans": json.loads(spans) if spans else [],
+        }
+
+    def evict(self):
+        """Delete finished jobs past the retention period or beyond max_finished; returns how many."""
+        with self._lock:
+            removed = self.conn.execute(
+                "DELETE FROM jobs WHERE finished_at IS NOT NULL AND finished_at < ?",
+                (time.time() - self.retention,)
+            ).rowcount
+            removed += self.conn.execute(
+                """
+                DELETE FROM jobs WHERE job_id IN (
+                    SELECT job_id FROM jobs WHERE finished_at IS NOT NULL
+                    ORDER BY finished_at DESC LIMIT -1 OFFSET ?
+                )
+                """,
+                (self.max_finished,)
+            ).rowcount
+            self.conn.commit()
+        return removed
+
+    def counts(self):
+        with self._lock:
+            rows = self.conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        return dict(rows)
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+class JobWorkers:
+    """Fixed pool of async workers draining a JobQueue."""
+
+    def __init__(self, queue, handlers, workers=JOB_WORKERS, interactive_workers=JOB_INTERACTIVE_WORKERS,
+                 poll_interval=5, evict_interval=600):
+        self.queue = queue
+        self.handlers = handlers  # kind -> async callable(params, report_progress) -> details dict
+        self.workers = workers
+        self.interactive_workers = min(interactive_workers, workers)
+        self.poll_interval = poll_interval
+        self.evict_interval = evict_interval
+        self._wakeup = None
+        self._tasks = []
+        self._stats = {"submitted": 0, "deduplicated": 0, "completed": 0, "failed": 0, "evicted": 0, "recovered": 0}
+
+    async def submit(self, kind, params, dedup_key=None, priority=PRIORITY_INTERACTIVE):
+        job_id, created = await asyncio.to_thread(self.queue.submit, kind, params, dedup_key, priority)
+        if created:
+            self._stats["submitted"] += 1
+            if self._wakeup is not None:
+                self._wakeup.set()
+        else:
+            self._stats["deduplicated"] += 1
+        return job_id, created
+
+    async def start(self):
+        self._wakeup = asyncio.Event()
+        self._stats["recovered"] += await asyncio.to_thread(self.queue.requeue_running)
+        for i in range(self.workers):
+            # The first workers only take interactive jobs
+            max_priority = PRIORITY_INTERACTIVE if i < self.interactive_workers else None
+            self._tasks.append(asyncio.create_task(self._work(max_priority)))
+        self._tasks.append(asyncio.create_task(self._evict_periodically()))
+
+    async def _work(self, max_priority):
+        while True:
+            # Cleared before claiming, so a submit that lands after an empty claim still wakes us
+            self._wakeup.clear()
+            job = await asyncio.to_thread(self.queue.claim, max_priority)
+            if job is None:
+                # asyncio.wait rather than wait_for, which can swallow a cancel
+                # that races with the event being set
+                waiter = asyncio.ensure_future(self._wakeup.wait())
+                try:
+                    await asyncio.wait({waiter}, timeout=self.poll_interval)
+                finally:
+                    waiter.cancel()
+                continue
+
+            async def report_progress(progress, spans, job_id=job["job_id"]):
+                await asyncio.to_thread(self.queue.update_progress, job_id, progress, spans)
+
+            try:
+                details = await self.handlers[job["kind"]](job["params"], report_progress)
+                await asyncio.to_thread(self.queue.finish, job["job_id"], "completed", details)
+                self._stats["completed"] += 1
+            except asyncio.CancelledError:
+                # Left as running; requeued on the next start
+                raise
+            except Exception as e:
+                logger.error(f"Error running job {job['job_id']}: {str(e)}")
+                await asyncio.to_thread(self.queue.finish, job["job_id"], "failed",
+                                        {"error": str(e), "failed_at": time.time()})
+                self._stats["failed"] += 1
+
+    async def _evict_periodically(self):
+        while True:
+            try:
+                self._stats["evicted"] += await asyncio.to_thread(self.queue.evict)
+            except Exception as e:
+                logger.error(f"Error evicting finished jobs: {str(e)}")
+            await asyncio.sleep(self.evict_interval)
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self.queue.close()
+
+    def metrics(self):
+        return {
+            **self._stats,
+            "workers": self.workers,
+            "interactive_workers": self.interactive_workers,
+            "jobs": self.queue.counts(),
+        }
@@ -0,0 +1,266 @@
+"""
+Local first-tier sentiment scoring with a finance lexicon.
+
+Posts are tokenized, mapped onto a fixed vocabulary and scored for a whole
+batch at once with NumPy: term weights are gathered in one array, negators
+flip the polarity of the few terms that follow them up to the next clause
+break, and per-post sums fall out of bincount. Each score comes with a
+confidence based on how much lexicon weight matched and how well it agrees.
+Only posts below the escalation threshold, high-impact posts (market-moving
+terms or heavy engagement) and a small audit sample go on to Claude; the
+audit sample keeps the agreement stats honest for posts scored locally.
+"""
+import os
+import re
+import logging
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+SENTIMENT_ESCALATION_THRESHOLD = float(os.environ.get("SENTIMENT_ESCALATION_THRESHOLD", 0.6))
+SENTIMENT_HIGH_IMPACT_ENGAGEMENT = int(os.environ.get("SENTIMENT_HIGH_IMPACT_ENGAGEMENT", 1000))
+SENTIMENT_AUDIT_RATE = float(os.environ.get("SENTIMENT_AUDIT_RATE", 0.02))
+
+NEGATION_WINDOW = 3  # tokens after a negator whose polarity is flipped
+NEGATION_SCALE = -0.75  # "not great" is weaker than "bad"
+SCORE_SCALE = 1.0  # a net weight of 1.0, one strong term, maps to a score of about 0.88
+COVERAGE_SCALE = 0.6  # matched weight at which coverage reaches about 0.63
+NEGATIVE_BELOW = 0.4  # same buckets the social media aggregator reports
+POSITIVE_ABOVE = 0.7
+
+# Weights in [-1, 1], tuned for how markets talk rather than general English:
+# "bullish", "beat" and "upgrade" are strongly positive; "volatile",
+# "liability" and "layoffs" are negative even though they are neutral elsewhere.
+FINANCE_LEXICON = {
+    # positive
+    "bullish": 1.0, "bull": 0.6, "rally": 0.8, "rallies": 0.8, "rallying": 0.8, "surge": 0.9,
+    "surges": 0.9, "surging": 0.9, "soar": 0.9, "soars": 0.9, "soaring": 0.9, "skyrocket": 1.0,
+    "moon": 0.8, "mooning": 0.8, "breakout": 0.7, "beat": 0.8, "beats": 0.8, "outperform": 0.8,
+    "outperforms": 0.8, "outperformed": 0.8, "upgrade": 0.8, "upgraded": 0.8, "upgrades": 0.8,
+    "buy": 0.5, "buying": 0.4, "long": 0.3, "calls": 0.3, "growth": 0.6, "growing": 0.6,
+    "grow": 0.5, "gain": 0.6, "gains": 0.6, "gained": 0.6, "profit": 0.6, "profits": 0.6,
+    "profitable": 0.7, "record": 0.5, "strong": 0.7, "stronger": 0.7, "strength": 0.6,
+    "robust": 0.7, "solid": 0.6, "impressive": 0.8, "excellent": 0.9, "great": 0.7, "good": 0.5,
+    "positive": 0.6, "optimistic": 0.7, "confident": 0.6, "winning": 0.7, "win": 0.6,
+    "wins": 0.6, "leading": 0.5, "leader": 0.5, "innovation": 0.5, "innovative": 0.6,
+    "revolutionary": 0.8, "game-changer": 0.8, "thriving": 0.8, "booming": 0.9, "boom": 0.7,
+    "recovering": 0.5, "recovery": 0.5, "rebound": 0.6, "undervalued": 0.6, "dividend": 0.3,
+    "buyback": 0.5, "expansion": 0.5, "expanding": 0.5, "momentum": 0.5, "upside": 0.7,
+    "higher": 0.4, "up": 0.3, "raised": 0.5, "exceeded": 0.8, "exceeds": 0.8, "smart": 0.5,
+    "ahead": 0.4, "improving": 0.6, "improved": 0.6, "success": 0.7, "successful": 0.7,
+    "efficient": 0.5, "efficiency": 0.5, "stabilized": 0.4, "advantage": 0.5,
+    # negative
+    "bearish": -1.0, "bear": -0.6, "crash": -1.0, "crashed": -1.0, "crashing": -1.0,
+    "plunge": -0.9, "plunges": -0.9, "plunged": -0.9, "plummet": -0.9, "tank": -0.8,
+    "tanked": -0.8, "tanking": -0.8, "dump": -0.7, "dumping": -0.7, "selloff": -0.8,
+    "sell-off": -0.8, "sell": -0.5, "selling": -0.4, "short": -0.3, "puts": -0.3,
+    "miss": -0.8, "missed": -0.8, "misses": -0.8, "downgrade": -0.8, "downgraded": -0.8,
+    "downgrades": -0.8, "underperform": -0.8, "underperformed": -0.8, "loss": -0.7,
+    "losses": -0.7, "losing": -0.6, "lose": -0.6, "decline": -0.6, "declined": -0.6,
+    "declining": -0.6, "drop": -0.6, "dropped": -0.6, "drops": -0.6, "fall": -0.5,
+    "falling": -0.6, "fell": -0.6, "weak": -0.7, "weaker": -0.7, "weakness": -0.7,
+    "slowdown": -0.6, "slowing": -0.5, "recession": -0.8, "layoffs": -0.6, "layoff": -0.6,
+    "lawsuit": -0.6, "fraud": -1.0, "scandal": -0.9, "investigation": -0.6, "probe": -0.5,
+    "antitrust": -0.5, "fine": -0.3, "fined": -0.6, "penalty": -0.6, "debt": -0.4,
+    "liability": -0.5, "risk": -0.4, "risky": -0.5, "concern": -0.5, "concerns": -0.5,
+    "concerning": -0.6, "worried": -0.6, "worry": -0.5, "fear": -0.6, "fears": -0.6,
+    "uncertain": -0.5, "uncertainty": -0.5, "volatile": -0.4, "volatility": -0.4,
+    "overvalued": -0.6, "bubble": -0.7, "challenges": -0.4, "challenge": -0.3, "pressure": -0.4,
+    "headwinds": -0.6, "struggling": -0.7, "struggle": -0.6, "disappointing": -0.8,
+    "disappointed": -0.7, "bad": -0.6, "terrible": -0.9, "awful": -0.9, "negative": -0.6,
+    "lower": -0.4, "down": -0.3, "cut": -0.5, "cuts": -0.4, "warning": -0.6, "bankrupt": -1.0,
+    "bankruptcy": -1.0, "default": -0.8, "delisted": -1.0, "dilution": -0.7, "bagholder": -0.8,
+    "bagholders": -0.8, "wasting": -0.6, "competition": -0.2, "downside": -0.7,
+}
+
+NEGATORS = {
+    "not", "no", "never", "neither", "nor", "without", "hardly", "barely", "cannot", "cant",
+    "can't", "don't", "dont", "doesn't", "doesnt", "didn't", "didnt", "isn't", "isnt",
+    "wasn't", "wasnt", "aren't", "arent", "won't", "wont", "shouldn't", "wouldn't",
+}
+
+# Punctuation and contrast words end a negation's scope
+CLAUSE_BREAKS = {".", ",", ";", "!", "?", "but", "however", "although", "though", "yet"}
+
+# Terms that make a post potentially market-moving, so worth a closer look whatever its score
+HIGH_IMPACT_TERMS = {
+    "earnings", "guidance", "merger", "acquisition", "acquire", "acquires", "buyout", "takeover",
+    "bankruptcy", "bankrupt", "chapter", "sec", "fda", "lawsuit", "fraud", "investigation",
+    "indictment", "delisted", "delisting", "recall", "halted", "halt", "ceo", "resigns",
+    "resignation", "split", "offering", "dilution", "restatement", "subpoena", "default",
+}
+
+TOKEN_PATTERN = re.compile(r"[a-z][a-z'\-]*|[.,;!?]")
+
+
+class LexiconSentimentScorer:
+    """Vectorized lexicon scorer that decides which posts need the LLM."""
+
+    def __init__(self, lexicon=FINANCE_LEXICON, escalation_threshold=SENTIMENT_ESCALATION_THRESHOLD,
+                 high_impact_engagement=SENTIMENT_HIGH_IMPACT_ENGAGEMENT, audit_rate=SENTIMENT_AUDIT_RATE):
+        self.escalation_threshold = escalation_threshold
+        self.high_impact_engagement = high_impact_engagement
+        self.audit_rate = audit_rate
+
+        vocabulary = sorted(set(lexicon) | NEGATORS | CLAUSE_BREAKS | HIGH_IMPACT_TERMS)
+        self.vocabulary = {term: i for i, term in enumerate(vocabulary)}
+        # One extra trailing slot stands for every out-of-vocabulary token
+        size = len(vocabulary) + 1
+        self.weights = np.zeros(size)
+        self.is_negator = np.zeros(size, dtype=bool)
+        self.is_break = np.zeros(size, dtype=bool)
+        self.is_impact = np.zeros(size, dtype=bool)
+        for term, i in self.vocabulary.items():
+            self.weights[i] = lexicon.get(term, 0.0)
+            self.is_negator[i] = term in NEGATORS
+            self.is_break[i] = term in CLAUSE_BREAKS
+            self.is_impact[i] = term in HIGH_IMPACT_TERMS
+
+        self._stats = {
+            "scored": 0,
+            "resolved_locally": 0,
+            "escalated_low_confidence": 0,
+            "escalated_high_impact": 0,
+            "audited": 0,
+        }
+        self._agreement = {
+            tier: {"compared": 0, "agreed": 0, "abs_error": 0.0}
+            for tier in ("escalated", "audited")
+        }
+
+    def _token_ids(self, texts):
+        """Flatten the batch into parallel arrays of token ids and owning post index."""
+        unknown = len(self.vocabulary)
+        ids = []
+        lengths = []
+        for text in texts:
+            tokens = TOKEN_PATTERN.findall((text or "").lower())
+            ids.extend(self.vocabulary.get(token, unknown) for token in tokens)
+            lengths.append(len(tokens))
+        lengths = np.array(lengths, dtype=np.int64)
+        owners = np.repeat(np.arange(len(texts)), lengths)
+        return np.array(ids, dtype=np.int64), owners, lengths
+
+    def score_many(self, texts):
+        """
+        Score a batch of texts in one pass.
+
+        Returns arrays of score (0 extremely negative, 0.5 neutral, 1
+        extremely positive, matching the LLM prompt), confidence in [0, 1],
+        positive and negative term counts and a high-impact flag.
+        """
+        count = len(texts)
+        ids, owners, lengths = self._token_ids(texts)
+        positions = np.arange(len(ids))
+        starts = np.concatenate(([0], np.cumsum(lengths)[:-1])) if count else np.zeros(0, dtype=np.int64)
+
+        # A term is negated when a negator precedes it within the window, in
+        # the same post and with no clause break in between
+        last_negator = np.maximum.accumulate(np.where(self.is_negator[ids], positions, -1)) if len(ids) else positions
+        last_break = np.maximum.accumulate(np.where(self.is_break[ids], positions, -1)) if len(ids) else positions
+        scope_start = np.maximum(last_break + 1, starts[owners])
+        distance = positions - last_negator
+        negated = (last_negator >= scope_start) & (distance >= 1) & (distance <= NEGATION_WINDOW)
+
+        weights = self.weights[ids] * np.where(negated, NEGATION_SCALE, 1.0)
+        positive = np.bincount(owners, weights=np.clip(weights, 0, None), minlength=count)
+        negative = np.bincount(owners, weights=np.clip(-weights, 0, None), minlength=count)
+        positive_terms = np.bincount(owners, weights=weights > 0, minlength=count)
+        negative_terms = np.bincount(owners, weights=weights < 0, minlength=count)
+        impact_terms = np.bincount(owners, weights=self.is_impact[ids], minlength=count)
+
+        net = positive - negative
+        mass = positive + negative
+        score = 0.5 + 0.5 * np.tanh(net / SCORE_SCALE)
+
+        # Confident when strong terms matched and they point the same way
+        agreement = np.divide(np.abs(net), mass, out=np.zeros(count), where=mass > 0)
+        coverage = 1.0 - np.exp(-mass / COVERAGE_SCALE)
+        confidence = agreement * coverage
+
+        return {
+            "score": score,
+            "confidence": confidence,
+            "positive_terms": positive_terms.astype(np.int64),
+            "negative_terms": negative_terms.astype(np.int64),
+            "high_impact": impact_terms > 0,
+        }
+
+    def triage(self, texts, engagement=None, sample_keys=None):
+        """
+        Score texts and decide which must be escalated to the LLM.
+
+        engagement gives each post's score or comment count; sample_keys,
+        hex digests such as cache keys, pick a stable audit sample. Returns
+        the scores and boolean arrays (escalate, audit); audited posts are
+        also escalated.
+        """
+        scores = self.score_many(texts)
+        count = len(texts)
+        low_confidence = scores["confidence"] < self.escalation_threshold
+        high_impact = scores["high_impact"].copy()
+        if engagement is not None:
+            high_impact |= np.asarray(engagement, dtype=float) >= self.high_impact_engagement
+
+        audit = np.zeros(count, dtype=bool)
+        if sample_keys is not None and self.audit_rate > 0:
+            fractions = np.array([int(key[:8], 16) / 0x100000000 for key in sample_keys])
+            audit = ~low_confidence & ~high_impact & (fractions < self.audit_rate)
+
+        escalate = low_confidence | high_impact | audit
+        self._stats["scored"] += count
+        self._stats["resolved_locally"] += int((~escalate).sum())
+        self._stats["escalated_low_confidence"] += int(low_confidence.sum())
+        self._stats["escalated_high_impact"] += int((high_impact & ~low_confidence).sum())
+        self._stats["audited"] += int(audit.sum())
+        return scores, escalate, audit
+
+    @staticmethod
+    def analysis(scores, i):
+        """Build a post analysis, in the LLM's format, from the lexicon scores of post i."""
+        return {
+            "sentiment_score": round(float(scores["score"][i]), 3),
+            "reason": f"Lexicon: {scores['positive_terms'][i]} positive, {scores['negative_terms'][i]} negative terms",
+            "topics": [],
+            "method": "lexicon",
+            "confidence": round(float(scores["confidence"][i]), 3),
+        }
+
+    def record_agreement(self, lexicon_scores, llm_scores, audited):
+        """Compare lexicon scores with the LLM's for escalated posts it analyzed."""
+        lexicon_scores = np.asarray(lexicon_scores, dtype=float)
+        llm_scores = np.asarray(llm_scores, dtype=float)
+        audited = np.asarray(audited, dtype=bool)
+        if not len(lexicon_scores):
+            return
+        agreed = sentiment_bucket(lexicon_scores) == sentiment_bucket(llm_scores)
+        errors = np.abs(lexicon_scores - llm_scores)
+        for tier, mask in (("escalated", ~audited), ("audited", audited)):
+            stats = self._agreement[tier]
+            stats["compared"] += int(mask.sum())
+            stats["agreed"] += int(agreed[mask].sum())
+            stats["abs_error"] += float(errors[mask].sum())
+
+    def metrics(self):
+        agreement = {}
+        for tier, stats in self._agreement.items():
+            compared = stats["compared"]
+            agreement[tier] = {
+                "compared": compared,
+                "agreement_rate": stats["agreed"] / compared if compared else 0.0,
+                "mean_abs_error": stats["abs_error"] / compared if compared else 0.0,
+            }
+        scored = self._stats["scored"]
+        return {
+            **self._stats,
+            "escalation_threshold": self.escalation_threshold,
+            "local_rate": self._stats["resolved_locally"] / scored if scored else 0.0,
+            "agreement": agreement,
+        }
+
+
+def sentiment_bucket(scores):
+    """Map 0-1 scores to -1 (negative), 0 (neutral) or 1 (positive)."""
+    scores = np.asarray(scores, dtype=float)
+    return np.where(scores < NEGATIVE_BELOW, -1, np.where(scores > POSITIVE_ABOVE, 1, 0))
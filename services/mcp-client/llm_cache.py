@@ -0,0 +1,131 @@
+"""
+Content-addressed cache of LLM analysis results.
+
+Results are keyed by a hash of the normalized input text, the prompt
+template version and the model, and stored in a local SQLite file. When a
+workflow re-runs over posts or articles it has already analyzed, those
+items are served from here and only the misses are sent to Claude. Bumping
+a prompt version or switching models naturally invalidates old entries.
+"""
+import os
+import json
+import time
+import hashlib
+import sqlite3
+import logging
+import threading
+import unicodedata
+
+logger = logging.getLogger(__name__)
+
+CHARS_PER_TOKEN = 4  # rough estimate for English text
+
+
+def normalize_text(text):
+    """Collapse formatting differences that don't change what the model sees."""
+    return " ".join(unicodedata.normalize("NFKC", text or "").split())
+
+
+def estimate_tokens(text):
+    return max(1, len(text) // CHARS_PER_TOKEN) if text else 0
+
+
+class LLMResultCache:
+    """Persistent (text, prompt version, model) -> result cache."""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = None
+        self._stats = {"hits": 0, "misses": 0, "writes": 0, "estimated_tokens_saved": 0}
+
+    @property
+    def conn(self):
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS results (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL,
+                    prompt_version TEXT NOT NULL,
+                    model TEXT NOT NULL,
+                    input_tokens INTEGER NOT NULL,
+                    output_tokens INTEGER NOT NULL,
+                    created_at REAL NOT NULL
+                )
+                """
+            )
+            self._conn.commit()
+        return self._conn
+
+    @staticmethod
+    def make_key(text, prompt_version, model):
+        material = "\0".join([normalize_text(text), prompt_version, model])
+        return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+    def get_many(self, keys):
+        """Return key -> cached result for the keys that are present."""
+        unique = list(dict.fromkeys(keys))
+        found = {}
+        with self._lock:
+            # Stay well under SQLite's bound-parameter limit
+            for start in range(0, len(unique), 500):
+                chunk = unique[start:start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self.conn.execute(
+                    f"SELECT key, value, input_tokens, output_tokens FROM results WHERE key IN ({placeholders})",
+                    chunk
+                ).fetchall()
+                for key, value, input_tokens, output_tokens in rows:
+                    found[key] = (json.loads(value), input_tokens + output_tokens)
+
+        results = {}
+        for key in keys:
+            if key in found:
+                value, tokens = found[key]
+                results[key] = value
+                self._stats["hits"] += 1
+                self._stats["estimated_tokens_saved"] += tokens
+            else:
+                self._stats["misses"] += 1
+        return results
+
+    def set_many(self, entries, prompt_version, model):
+        """Store (key, input text, result) entries."""
+        now = time.time()
+        rows = []
+        for key, text, value in entries:
+            encoded = json.dumps(value, default=str)
+            rows.append((key, encoded, prompt_version, model, estimate_tokens(text), estimate_tokens(encoded), now))
+        if not rows:
+            return 0
+        with self._lock:
+            self.conn.executemany(
+                """
+                INSERT OR REPLACE INTO results
+                    (key, value, prompt_version, model, input_tokens, output_tokens, created_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                """,
+                rows
+            )
+            self.conn.commit()
+        self._stats["writes"] += len(rows)
+        return len(rows)
+
+    def metrics(self):
+        lookups = self._stats["hits"] + self._stats["misses"]
+        return {
+            **self._stats,
+            "hit_rate": self._stats["hits"] / lookups if lookups else 0.0,
+        }
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
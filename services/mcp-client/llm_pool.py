@@ -0,0 +1,117 @@
+"""
+Bounded pool for concurrent Anthropic API calls.
+
+Requests go through the async client, so a call waiting on Claude doesn't
+block the event loop, and a semaphore caps how many are in flight at once.
+Callers can fan batches out freely: anything beyond the limit queues here
+instead of overrunning the API's rate limits. Replies that must be JSON
+are requested by prefilling the assistant turn with the opening bracket,
+since the pinned client takes no response_format option.
+"""
+import os
+import json
+import time
+import asyncio
+import logging
+from collections import deque
+
+from instrumentation import record_tokens
+
+logger = logging.getLogger(__name__)
+
+LLM_MAX_CONCURRENCY = int(os.environ.get("LLM_MAX_CONCURRENCY", 8))
+
+# Prefilled as the start of the assistant turn, so the reply is the rest of a
+# JSON array
+JSON_ARRAY_PREFILL = "["
+
+
+def parse_prefilled_array(text, prefill=JSON_ARRAY_PREFILL):
+    """Parse a reply that continues the prefilled opening of a JSON array, ignoring trailing prose."""
+    text = text.strip()
+    if not text.startswith(prefill):
+        text = prefill + text
+    return json.loads(text[:text.rindex("]") + 1])
+
+
+class LLMPool:
+    """Semaphore-bounded wrapper around an async Anthropic client."""
+
+    def __init__(self, client, max_concurrency=LLM_MAX_CONCURRENCY, latency_window=1000):
+        self.client = client
+        self.max_concurrency = max_concurrency
+        self._slots = asyncio.Semaphore(max_concurrency)
+        self._queued = 0
+        self._in_flight = 0
+        self._latencies = deque(maxlen=latency_window)
+        self._stats = {
+            "submitted": 0,
+            "completed": 0,
+            "failed": 0,
+            "max_queue_depth": 0,
+            "total_queue_wait": 0.0,
+            "input_tokens": 0,
+            "output_tokens": 0,
+        }
+
+    async def create_message(self, **kwargs):
+        """Call messages.create with the given arguments once a slot is free."""
+        self._stats["submitted"] += 1
+        self._queued += 1
+        self._stats["max_queue_depth"] = max(self._stats["max_queue_depth"], self._queued + self._in_flight)
+        submitted_at = time.perf_counter()
+
+        try:
+            await self._slots.acquire()
+        finally:
+            self._queued -= 1
+
+        self._in_flight += 1
+        started_at = time.perf_counter()
+        self._stats["total_queue_wait"] += started_at - submitted_at
+        try:
+            response = await self.client.messages.create(**kwargs)
+        except Exception:
+            self._stats["failed"] += 1
+            raise
+        finally:
+            self._in_flight -= 1
+            self._slots.release()
+
+        self._latencies.append(time.perf_counter() - started_at)
+        self._stats["completed"] += 1
+        usage = getattr(response, "usage", None)
+        if usage is not None:
+            input_tokens = getattr(usage, "input_tokens", 0) or 0
+            output_tokens = getattr(usage, "output_tokens", 0) or 0
+            self._stats["input_tokens"] += input_tokens
+            self._stats["output_tokens"] += output_tokens
+            record_tokens(input_tokens, output_tokens)
+        return response
+
+    def metrics(self):
+        """Return concurrency, queue and latency metrics for the pool."""
+        latencies = sorted(self._latencies)
+        completed = self._stats["completed"]
+
+        def percentile(fraction):
+            if not latencies:
+                return 0.0
+            return latencies[min(len(latencies) - 1, int(fraction * len(latencies)))]
+
+        return {
+            "max_concurrency": self.max_concurrency,
+            "in_flight": self._in_flight,
+            "queued": self._queued,
+            "submitted": self._stats["submitted"],
+            "completed": completed,
+            "failed": self._stats["failed"],
+            "max_queue_depth": self._stats["max_queue_depth"],
+            "avg_queue_wait": self._stats["total_queue_wait"] / self._stats["submitted"] if self._stats["submitted"] else 0.0,
+            "latency_avg": sum(latencies) / len(latencies) if latencies else 0.0,
+            "latency_p50": percentile(0.5),
+            "latency_p95": percentile(0.95),
+            "latency_max": latencies[-1] if latencies else 0.0,
+            "input_tokens": self._stats["input_tokens"],
+            "output_tokens": self._stats["output_tokens"],
+        }
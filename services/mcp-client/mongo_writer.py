@@ -0,0 +1,190 @@
+"""
+Buffered, non-blocking MongoDB writes.
+
+pymongo is synchronous, so calling it from a node stalls the event loop
+for the whole round trip. Documents from every workflow go into one
+buffer instead. The buffer is flushed as one unordered bulk_write per
+collection, on a worker thread, when it reaches MONGO_BATCH_SIZE
+documents or MONGO_MAX_WAIT has passed, whichever comes first. Callers
+await their own documents' outcome, so a batch is only acknowledged once
+it is stored. IDs are assigned client-side, so callers get them without a
+round trip. Documents that carry a stable _id are upserted, so a replayed
+write replaces what it wrote before instead of adding a copy. At most
+MONGO_MAX_PENDING documents can be buffered or in flight. Beyond that,
+callers wait for room. Those waits are counted as backpressure, so a slow
+database shows up in /metrics before it shows up as memory.
+"""
+import os
+import time
+import asyncio
+import logging
+
+from bson import ObjectId
+from pymongo import InsertOne, ReplaceOne
+from pymongo.errors import BulkWriteError
+from pymongo.write_concern import WriteConcern
+
+logger = logging.getLogger(__name__)
+
+MONGO_BATCH_SIZE = int(os.environ.get("MONGO_BATCH_SIZE", 500))
+MONGO_MAX_WAIT = float(os.environ.get("MONGO_MAX_WAIT", 0.05))  # seconds
+MONGO_MAX_PENDING = int(os.environ.get("MONGO_MAX_PENDING", 10000))
+MONGO_WRITE_CONCERN = os.environ.get("MONGO_WRITE_CONCERN", "1")  # w: a node count, "majority" or a tag
+MONGO_JOURNAL = os.environ.get("MONGO_JOURNAL", "false").lower() == "true"
+
+
+def parse_write_concern(w=MONGO_WRITE_CONCERN, journal=MONGO_JOURNAL):
+    w = int(w) if str(w).isdigit() else w
+    # Journaling can't be requested for unacknowledged writes
+    return WriteConcern(w=w, j=journal if w != 0 else None)
+
+
+class MongoBulkWriter:
+    """Buffer operations from all callers and flush them as unordered bulk writes on a thread."""
+
+    def __init__(self, db, batch_size=MONGO_BATCH_SIZE, max_wait=MONGO_MAX_WAIT,
+                 max_pending=MONGO_MAX_PENDING, write_concern=None):
+        self.db = db
+        self.batch_size = batch_size
+        self.max_wait = max_wait
+        self.max_pending = max_pending
+        self.write_concern = write_concern or parse_write_concern()
+        self._pending = []  # (collection name, operation, future) waiting for the next flush
+        self._flush_timer = None
+        self._flushes = set()
+        self._room = None
+        self._outstanding = 0  # buffered or in flight
+        self._stats = {
+            "requested": 0, "written": 0, "failed": 0, "batches": 0, "failed_batches": 0,
+            "write_seconds": 0.0, "backpressure_waits": 0, "backpressure_seconds": 0.0,
+        }
+
+    @property
+    def room(self):
+        # Created on first use so it binds to the running loop
+        if self._room is None:
+            self._room = asyncio.Semaphore(self.max_pending)
+        return self._room
+
+    async def save(self, collection_name, document):
+        """Save one document; returns its ID once the batch holding it is stored."""
+        return (await self.save_many(collection_name, [document]))[0]
+
+    async def save_many(self, collection_name, documents):
+        """
+        Save documents; returns their IDs once every batch holding them is stored.
+
+        Documents that come with an _id replace whatever is stored under it,
+        so writing the same document again is harmless. The rest are inserted
+        under a fresh ID.
+        """
+        ids = []
+        operations = []
+        for document in documents:
+            if "_id" in document:
+                operations.append(ReplaceOne({"_id": document["_id"]}, document, upsert=True))
+            else:
+                document["_id"] = ObjectId()
+                operations.append(InsertOne(document))
+            ids.append(str(document["_id"]))
+        await self.write(collection_name, operations)
+        return ids
+
+    async def write(self, collection_name, operations):
+        """Queue bulk write operations and wait until they are all stored."""
+        loop = asyncio.get_running_loop()
+        futures = []
+        for operation in operations:
+            if self.room.locked():
+                # Full: send what's buffered now rather than waiting out the timer, then wait for room
+                self.flush()
+                self._stats["backpressure_waits"] += 1
+                started_at = time.perf_counter()
+                await self.room.acquire()
+                self._stats["backpressure_seconds"] += time.perf_counter() - started_at
+            else:
+                await self.room.acquire()
+            self._outstanding += 1
+            future = loop.create_future()
+            self._pending.append((collection_name, operation, future))
+            futures.append(future)
+            if len(self._pending) >= self.batch_size:
+                self.flush()
+        self._stats["requested"] += len(operations)
+
+        if self._pending and self._flush_timer is None:
+            self._flush_timer = loop.call_later(self.max_wait, self.flush)
+        # Every outcome is awaited, so one failure doesn't leave the others unobserved
+        outcomes = await asyncio.gather(*futures, return_exceptions=True)
+        for outcome in outcomes:
+            if isinstance(outcome, Exception):
+                raise outcome
+
+    def flush(self):
+        if self._flush_timer is not None:
+            self._flush_timer.cancel()
+            self._flush_timer = None
+        pending, self._pending = self._pending, []
+        by_collection = {}
+        for entry in pending:
+            by_collection.setdefault(entry[0], []).append(entry)
+        for collection_name, entries in by_collection.items():
+            for start in range(0, len(entries), self.batch_size):
+                task = asyncio.ensure_future(self._run_batch(collection_name, entries[start:start + self.batch_size]))
+                self._flushes.add(task)
+                task.add_done_callback(self._flushes.discard)
+
+    def _bulk_write(self, collection_name, operations):
+        collection = self.db[collection_name].with_options(write_concern=self.write_concern)
+        return collection.bulk_write(operations, ordered=False)
+
+    async def _run_batch(self, collection_name, batch):
+        errors = {}  # position in the batch -> error
+        started_at = time.perf_counter()
+        try:
+            await asyncio.to_thread(self._bulk_write, collection_name, [operation for _, operation, _ in batch])
+        except BulkWriteError as e:
+            # Unordered: everything but the reported operations was written
+            for error in e.details.get("writeErrors", []):
+                errors[error["index"]] = RuntimeError(error.get("errmsg", "write error"))
+            if e.details.get("writeConcernErrors"):
+                errors = {i: e for i in range(len(batch))}
+        except Exception as e:
+            errors = {i: e for i in range(len(batch))}
+        self._stats["write_seconds"] += time.perf_counter() - started_at
+        self._stats["batches"] += 1
+        if errors:
+            logger.error(f"Failed to write {len(errors)} of {len(batch)} documents to {collection_name}: {next(iter(errors.values()))}")
+            self._stats["failed_batches"] += 1
+
+        for i, (_, _, future) in enumerate(batch):
+            self.room.release()
+            self._outstanding -= 1
+            if future.done():
+                continue
+            if i in errors:
+                future.set_exception(errors[i])
+            else:
+                future.set_result(None)
+        self._stats["failed"] += len(errors)
+        self._stats["written"] += len(batch) - len(errors)
+
+    async def close(self):
+        """Flush whatever is buffered and wait for in-flight batches."""
+        self.flush()
+        if self._flushes:
+            await asyncio.gather(*self._flushes, return_exceptions=True)
+
+    def metrics(self):
+        batches = self._stats["batches"]
+        in_flight = self._outstanding - len(self._pending)
+        return {
+            **self._stats,
+            "buffered": len(self._pending),
+            "in_flight": in_flight,
+            "max_pending": self.max_pending,
+            "utilization": self._outstanding / self.max_pending if self.max_pending else 0.0,
+            "write_concern": self.write_concern.document,
+            "avg_batch_size": (self._stats["written"] + self._stats["failed"]) / batches if batches else 0.0,
+            "avg_batch_seconds": self._stats["write_seconds"] / batches if batches else 0.0,
+        }
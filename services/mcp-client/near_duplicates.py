@@ -0,0 +1,177 @@
+"""
+Near-duplicate grouping for social posts.
+
+Reposts, cross-posts and templated posts differ by a ticker, a link or a
+few words, so exact-text caching misses them. Each post gets a MinHash
+signature over its word shingles, computed for the whole batch at once
+with NumPy, and an LSH index over signature bands finds candidates whose
+estimated Jaccard similarity clears the threshold. Posts in a group share
+one representative; only the representative is analyzed and embedded,
+and its analysis is fanned out to the other members. Groups stay in the
+index for a sliding time window, so a burst spread over several fetches
+collapses too.
+"""
+import os
+import re
+import time
+import zlib
+import logging
+import threading
+from collections import deque
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+NEAR_DUPLICATE_THRESHOLD = float(os.environ.get("NEAR_DUPLICATE_THRESHOLD", 0.8))
+NEAR_DUPLICATE_WINDOW = int(os.environ.get("NEAR_DUPLICATE_WINDOW", 6 * 3600))  # seconds
+NEAR_DUPLICATE_MAX_ENTRIES = int(os.environ.get("NEAR_DUPLICATE_MAX_ENTRIES", 50000))
+
+MERSENNE_PRIME = (1 << 31) - 1  # keeps a * h + b inside uint64
+SHINGLE_SIZE = 2  # words per shingle; short posts need small shingles to tolerate an edit
+WORD_PATTERN = re.compile(r"[a-z0-9@']+")
+URL_PATTERN = re.compile(r"https?://\S+")
+
+
+def shingles(text):
+    """Hash the word shingles of a text; URLs and $/# prefixes are dropped so re-links still match."""
+    words = WORD_PATTERN.findall(URL_PATTERN.sub(" ", (text or "").lower()))
+    if not words:
+        return []
+    if len(words) < SHINGLE_SIZE:
+        return [zlib.crc32(" ".join(words).encode("utf-8"))]
+    return list({
+        zlib.crc32(" ".join(words[i:i + SHINGLE_SIZE]).encode("utf-8"))
+        for i in range(len(words) - SHINGLE_SIZE + 1)
+    })
+
+
+class NearDuplicateIndex:
+    """MinHash/LSH index of recent posts, grouped by near-duplicate representative."""
+
+    def __init__(self, num_perm=128, bands=32, threshold=NEAR_DUPLICATE_THRESHOLD,
+                 window=NEAR_DUPLICATE_WINDOW, max_entries=NEAR_DUPLICATE_MAX_ENTRIES, seed=1):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.threshold = threshold
+        self.window = window
+        self.max_entries = max_entries
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(1, MERSENNE_PRIME, size=num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, MERSENNE_PRIME, size=num_perm, dtype=np.uint64)
+
+        self._lock = threading.Lock()
+        self._entries = {}  # entry id -> (signature, group id)
+        self._order = deque()  # (added at, entry id), oldest first
+        self._buckets = {}  # (band, band bytes) -> entry ids
+        self._analyses = {}  # group id -> analysis of its representative
+        self._group_sizes = {}  # group id -> live entries
+        self._next_id = 0
+        self._stats = {"checked": 0, "grouped": 0, "reused_analyses": 0, "groups": 0, "expired": 0}
+
+    def signatures(self, texts):
+        """Return an (n, num_perm) MinHash matrix and a mask of texts that had any words."""
+        hashed = [shingles(text) for text in texts]
+        lengths = np.array([len(h) for h in hashed], dtype=np.int64)
+        signatures = np.full((len(texts), self.num_perm), MERSENNE_PRIME, dtype=np.uint64)
+        has_words = lengths > 0
+        if has_words.any():
+            values = np.array([value for h in hashed for value in h], dtype=np.uint64) % MERSENNE_PRIME
+            permuted = (values[:, None] * self._a + self._b) % MERSENNE_PRIME
+            starts = np.concatenate(([0], np.cumsum(lengths)[:-1]))[has_words]
+            signatures[has_words] = np.minimum.reduceat(permuted, starts, axis=0)
+        return signatures, has_words
+
+    def _band_keys(self, signature):
+        return [(band, signature[band * self.rows:(band + 1) * self.rows].tobytes()) for band in range(self.bands)]
+
+    def _expire(self, now):
+        while self._order and (now - self._order[0][0] > self.window or len(self._order) > self.max_entries):
+            _, entry_id = self._order.popleft()
+            signature, group = self._entries.pop(entry_id)
+            for key in self._band_keys(signature):
+                members = self._buckets.get(key)
+                if members:
+                    members.discard(entry_id)
+                    if not members:
+                        del self._buckets[key]
+            self._group_sizes[group] -= 1
+            if not self._group_sizes[group]:
+                del self._group_sizes[group]
+                self._analyses.pop(group, None)
+            self._stats["expired"] += 1
+
+    def _match(self, signature):
+        """Return the group of the most similar indexed entry above the threshold, if any."""
+        candidates = set()
+        for key in self._band_keys(signature):
+            candidates.update(self._buckets.get(key, ()))
+        best, best_similarity = None, self.threshold
+        for entry_id in candidates:
+            other, group = self._entries[entry_id]
+            similarity = float(np.mean(other == signature))
+            if similarity >= best_similarity:
+                best, best_similarity = group, similarity
+        return best
+
+    def assign(self, texts, now=None):
+        """
+        Assign each text to a near-duplicate group, indexing it as it goes.
+
+        Returns a group id per text, or None for texts with no words. The
+        first text of a new group is its representative; texts later in the
+        batch, or in later batches within the window, join that group.
+        """
+        now = time.time() if now is None else now
+        signatures, has_words = self.signatures(texts)
+        groups = []
+        with self._lock:
+            self._expire(now)
+            for signature, usable in zip(signatures, has_words):
+                if not usable:
+                    groups.append(None)
+                    continue
+                group = self._match(signature)
+                if group is None:
+                    group = f"g{self._next_id}"
+                    self._stats["groups"] += 1
+                else:
+                    self._stats["grouped"] += 1
+
+                entry_id = self._next_id
+                self._next_id += 1
+                self._entries[entry_id] = (signature, group)
+                self._order.append((now, entry_id))
+                for key in self._band_keys(signature):
+                    self._buckets.setdefault(key, set()).add(entry_id)
+                self._group_sizes[group] = self._group_sizes.get(group, 0) + 1
+                groups.append(group)
+            self._stats["checked"] += len(texts)
+        return groups
+
+    def analysis(self, group):
+        """Return the stored analysis for a group from an earlier batch, if any."""
+        with self._lock:
+            analysis = self._analyses.get(group)
+        if analysis is not None:
+            self._stats["reused_analyses"] += 1
+        return analysis
+
+    def record(self, group, analysis):
+        """Remember a representative's analysis so later members can reuse it."""
+        with self._lock:
+            if group in self._group_sizes:
+                self._analyses[group] = analysis
+
+    def metrics(self):
+        checked = self._stats["checked"]
+        return {
+            **self._stats,
+            "entries": len(self._entries),
+            "threshold": self.threshold,
+            "window": self.window,
+            "duplicate_rate": self._stats["grouped"] / checked if checked else 0.0,
+        }
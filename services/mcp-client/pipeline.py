@@ -0,0 +1,91 @@
+"""
+Streaming execution of linear workflows.
+
+Rather than each node waiting for the previous node's entire list, the
+source yields micro-batches and every stage runs as its own set of
+workers, connected to the next stage by a bounded asyncio queue. The
+first micro-batch can be stored while later ones are still being fetched
+or scored. A full queue makes the stage before it wait, so at most a few
+micro-batches are in memory at once, however large the source.
+"""
+import os
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+PIPELINE_BATCH_SIZE = int(os.environ.get("PIPELINE_BATCH_SIZE", 50))
+PIPELINE_QUEUE_SIZE = int(os.environ.get("PIPELINE_QUEUE_SIZE", 4))
+
+_END = object()
+
+
+class StreamingPipeline:
+    """Run micro-batches through (name, async fn, concurrency) stages over bounded queues."""
+
+    def __init__(self, stages, queue_size=PIPELINE_QUEUE_SIZE):
+        self.stages = stages
+        self.queue_size = queue_size
+
+    async def run(self, source):
+        """Feed every payload from the async iterable source through the stages; returns the final outputs."""
+        queues = [asyncio.Queue(maxsize=self.queue_size) for _ in self.stages]
+        results = []
+
+        async def feed():
+            async for payload in source:
+                await queues[0].put(payload)
+            for _ in range(self.stages[0][2]):
+                await queues[0].put(_END)
+
+        async def work(index, fn):
+            inbox = queues[index]
+            outbox = queues[index + 1] if index + 1 < len(queues) else None
+            while True:
+                payload = await inbox.get()
+                if payload is _END:
+                    return
+                output = await fn(payload)
+                if outbox is not None:
+                    await outbox.put(output)
+                else:
+                    results.append(output)
+
+        async def run_stage(index, fn, concurrency):
+            await asyncio.gather(*(work(index, fn) for _ in range(concurrency)))
+            # Every worker of this stage is done; let the next stage's workers finish too
+            if index + 1 < len(self.stages):
+                for _ in range(self.stages[index + 1][2]):
+                    await queues[index + 1].put(_END)
+
+        tasks = [asyncio.create_task(feed())]
+        tasks += [asyncio.create_task(run_stage(i, fn, concurrency)) for i, (_, fn, concurrency) in enumerate(self.stages)]
+        try:
+            # The first failure cancels the rest rather than leaving stages blocked on full queues
+            done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+            for task in done:
+                if task.exception() is not None:
+                    raise task.exception()
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            if hasattr(source, "aclose"):
+                await source.aclose()
+        return results
+
+
+async def iter_batches(items, batch_size=PIPELINE_BATCH_SIZE):
+    """Yield successive lists of at most batch_size items from a list or async iterable."""
+    if not hasattr(items, "__aiter__"):
+        for start in range(0, len(items), batch_size):
+            yield items[start:start + batch_size]
+        return
+    batch = []
+    async for item in items:
+        batch.append(item)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
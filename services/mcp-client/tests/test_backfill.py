@@ -0,0 +1,154 @@
+import json
+import asyncio
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+import pytest
+
+from backfill import BackfillRunner, BackfillStore, MessageBatchesClient, is_transient
+
+
+class StandInBatches:
+    """In-memory Message Batches API served over HTTP on localhost."""
+
+    def __init__(self):
+        self.batches = {}
+        self.created = []
+        self.failing_retrieves = 0
+        self.errored_once = set()  # custom_ids whose first result is an error
+
+    def handler(self):
+        api = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def reply(self, status, body, content_type="application/json"):
+                data = body.encode("utf-8")
+                self.send_response(status)
+                self.send_header("content-type", content_type)
+                self.send_header("content-length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_POST(self):
+                assert self.headers["x-api-key"] == "test-key"
+                requests = json.loads(self.rfile.read(int(self.headers["content-length"])))["requests"]
+                batch_id = f"msgbatch_{len(api.batches) + 1}"
+                api.batches[batch_id] = [request["custom_id"] for request in requests]
+                api.created.append(batch_id)
+                self.reply(200, json.dumps({"id": batch_id, "processing_status": "in_progress"}))
+
+            def do_GET(self):
+                parts = self.path.strip("/").split("/")
+                batch_id = parts[3]
+                if len(parts) == 4:
+                    if api.failing_retrieves:
+                        api.failing_retrieves -= 1
+                        return self.reply(500, "{}")
+                    return self.reply(200, json.dumps({"id": batch_id, "processing_status": "ended"}))
+                lines = []
+                for custom_id in api.batches[batch_id]:
+                    if custom_id in api.errored_once:
+                        api.errored_once.discard(custom_id)
+                        result = {"type": "errored"}
+                    else:
+                        text = json.dumps({"score": int(custom_id.split("-")[1])})
+                        result = {"type": "succeeded", "message": {"content": [{"type": "text", "text": text}]}}
+                    lines.append(json.dumps({"custom_id": custom_id, "result": result}))
+                self.reply(200, "\n".join(lines) + "\n", "application/x-ndjson")
+
+        return Handler
+
+
+@pytest.fixture
+def api():
+    stand_in = StandInBatches()
+    server = ThreadingHTTPServer(("127.0.0.1", 0), stand_in.handler())
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    stand_in.url = f"http://127.0.0.1:{server.server_address[1]}"
+    yield stand_in
+    server.shutdown()
+    server.server_close()
+
+
+def make_runner(api, path, written):
+    async def write_back(job_id, results):
+        written.extend((custom_id, result) for custom_id, _, result in results)
+
+    return BackfillRunner(
+        MessageBatchesClient(base_url=api.url, api_key="test-key", timeout=5),
+        BackfillStore(path),
+        build_params=lambda payload: {"messages": [{"role": "user", "content": payload["text"]}]},
+        parse_result=lambda payload, message: json.loads(message["content"][0]["text"]),
+        write_back=write_back,
+        poll_interval=0,
+        retry_backoff=0,
+    )
+
+
+def test_transient_failures_are_retried_in_place(api, tmp_path):
+    written = []
+    runner = make_runner(api, str(tmp_path / "backfill.sqlite3"), written)
+    runner.store.create_job("job-0", "social_sentiment", {}, [("req-0", {"text": "a"})])
+
+    api.failing_retrieves = 2
+    job = asyncio.run(runner.run("job-0"))
+    assert job["status"] == "completed"
+    assert job["requests"] == {"done": 1}
+    assert api.created == ["msgbatch_1"]
+    assert runner.metrics()["retries"] == 2
+    runner.store.close()
+
+
+def test_interrupted_job_resumes_without_resubmitting(api, tmp_path):
+    path = str(tmp_path / "backfill.sqlite3")
+    written = []
+    runner = make_runner(api, path, written)
+    runner.max_retries = 1
+    runner.store.create_job("job-1", "social_sentiment", {}, [(f"req-{i}", {"text": f"post {i}"}) for i in range(3)])
+
+    # Polling keeps failing past the retries: the job stops with its submitted batch on record
+    api.failing_retrieves = 2
+    job = asyncio.run(runner.run("job-1"))
+    assert job["status"] == "interrupted"
+    assert job["requests"] == {"submitted": 3}
+    assert api.created == ["msgbatch_1"]
+    runner.store.close()
+
+    # A new process picks it up from the stored state; an errored request is resubmitted on its own
+    api.errored_once.add("req-1")
+    runner = make_runner(api, path, written)
+    job = asyncio.run(runner.run("job-1"))
+    assert job["status"] == "completed"
+    assert job["requests"] == {"done": 3}
+    assert api.created == ["msgbatch_1", "msgbatch_2"]
+    assert api.batches["msgbatch_2"] == ["req-1"]
+    assert sorted(written) == [("req-0", {"score": 0}), ("req-1", {"score": 1}), ("req-2", {"score": 2})]
+    runner.store.close()
+
+
+def test_requests_fail_for_good_after_max_attempts(api, tmp_path):
+    written = []
+    runner = make_runner(api, str(tmp_path / "backfill.sqlite3"), written)
+    runner.max_attempts = 1
+    runner.store.create_job("job-2", "social_sentiment", {}, [("req-0", {"text": "a"}), ("req-1", {"text": "b"})])
+    api.errored_once.add("req-0")
+
+    job = asyncio.run(runner.run("job-2"))
+    assert job["status"] == "completed"
+    assert job["requests"] == {"done": 1, "failed": 1}
+    assert written == [("req-1", {"score": 1})]
+    runner.store.close()
+
+
+@pytest.mark.parametrize("status, transient", [(400, False), (401, False), (429, True), (500, True), (529, True)])
+def test_only_overload_and_server_errors_are_transient(status, transient):
+    request = httpx.Request("GET", "https://api.example/v1/messages/batches/b")
+    error = httpx.HTTPStatusError("failed", request=request, response=httpx.Response(status, request=request))
+    assert is_transient(error) is transient
+    assert is_transient(httpx.ConnectError("refused"))
+    assert not is_transient(ValueError("bad result"))
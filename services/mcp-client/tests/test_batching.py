@@ -0,0 +1,49 @@
+from batching import TRUNCATION_MARKER, extract_indexed_items, pack_by_token_budget, truncate_to_tokens
+from llm_cache import estimate_tokens
+
+
+def test_truncate_to_tokens():
+    text = " ".join(f"word{i}" for i in range(200))
+    truncated = truncate_to_tokens(text, 50)
+    assert truncated.endswith(TRUNCATION_MARKER)
+    assert estimate_tokens(truncated) <= 50
+    # Cut on a word boundary
+    assert truncated[:-len(TRUNCATION_MARKER)].split(" ")[-1] in text.split(" ")
+    assert truncate_to_tokens("short text", 50) == "short text"
+    assert truncate_to_tokens("", 5) == ""
+
+
+def test_packs_until_the_input_budget_is_full():
+    batches = pack_by_token_budget(list("abcdef"), [40, 40, 30, 90, 10, 10], input_budget=100,
+                                   output_tokens_per_item=10, output_budget=1000)
+    assert batches == [["a", "b"], ["c"], ["d", "e"], ["f"]]
+
+
+def test_output_budget_and_max_items_cap_batch_length():
+    items = list(range(10))
+    assert [len(batch) for batch in pack_by_token_budget(items, [1] * 10, 1000, 100, 300)] == [3, 3, 3, 1]
+    assert [len(batch) for batch in pack_by_token_budget(items, [1] * 10, 1000, 1, 1000, max_items=4)] == [4, 4, 2]
+
+
+def test_oversized_item_gets_a_batch_of_its_own_and_order_is_kept():
+    batches = pack_by_token_budget(["a", "huge", "b"], [10, 500, 10], input_budget=100,
+                                   output_tokens_per_item=10, output_budget=1000)
+    assert batches == [["a"], ["huge"], ["b"]]
+    assert [item for batch in batches for item in batch] == ["a", "huge", "b"]
+    assert pack_by_token_budget([], [], 100, 10, 100) == []
+
+
+def test_extract_indexed_items():
+    payload = [
+        {"article_index": 2, "summary": "second"},
+        {"article_index": "1", "summary": "first"},
+        {"article_index": 2, "summary": "duplicate"},
+        {"article_index": 9, "summary": "out of range"},
+        {"summary": "no index"},
+        "not an object",
+    ]
+    items = extract_indexed_items(payload, "article_index", 3)
+    assert {index: item["summary"] for index, item in items.items()} == {1: "first", 2: "second"}
+    # An object wrapping the array works too
+    assert list(extract_indexed_items({"articles": payload}, "article_index", 3)) == [2, 1]
+    assert extract_indexed_items("nonsense", "article_index", 3) == {}
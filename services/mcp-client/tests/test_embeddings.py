@@ -0,0 +1,93 @@
+import os
+import asyncio
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+import pytest
+
+import embeddings
+from embeddings import BatchEmbedder, EmbeddingStore
+
+
+def vectors(start, count, dim=4):
+    return np.arange(start * dim, (start + count) * dim, dtype=np.float32).reshape(count, dim)
+
+
+def test_vectors_survive_growing_the_file(tmp_path):
+    store = EmbeddingStore(str(tmp_path), initial_capacity=2)
+    keys = [f"k{i}" for i in range(5)]
+    assert store.put_many(keys[:2], vectors(0, 2)) == 2
+    assert store.put_many(keys[2:], vectors(2, 3)) == 3
+
+    # Remapped past the initial capacity without losing the first rows
+    assert os.path.getsize(store.vectors_path) >= 5 * 4 * 4
+    found = store.get_many(keys + ["missing"])
+    assert sorted(found) == keys
+    for i, key in enumerate(keys):
+        np.testing.assert_array_equal(found[key], vectors(i, 1)[0])
+    store.close()
+
+
+def test_reopen_reads_back_vectors_and_row_count(tmp_path):
+    store = EmbeddingStore(str(tmp_path), initial_capacity=2)
+    store.put_many(["a", "b", "c"], vectors(0, 3))
+    store.close()
+
+    reopened = EmbeddingStore(str(tmp_path), initial_capacity=2)
+    np.testing.assert_array_equal(reopened.get_many(["b"])["b"], vectors(1, 1)[0])
+    assert (reopened.rows, reopened.dim) == (3, 4)
+    # Known keys keep their rows; only new ones are appended
+    assert reopened.put_many(["a", "d"], vectors(10, 2)) == 1
+    assert reopened.rows == 4
+    np.testing.assert_array_equal(reopened.get_many(["a"])["a"], vectors(10, 1)[0])
+    reopened.close()
+
+
+def test_rejects_vectors_of_another_dimension(tmp_path):
+    store = EmbeddingStore(str(tmp_path))
+    store.put_many(["a"], vectors(0, 1))
+    with pytest.raises(ValueError):
+        store.put_many(["b"], vectors(0, 1, dim=3))
+    assert store.put_many([], np.zeros((0, 4))) == 0
+    store.close()
+
+
+def test_empty_store(tmp_path):
+    store = EmbeddingStore(str(tmp_path))
+    assert store.get_many(["a"]) == {}
+    store.close()
+
+
+def test_make_key_ignores_whitespace_but_not_the_model():
+    assert EmbeddingStore.make_key("hello  world\n", "m") == EmbeddingStore.make_key("hello world", "m")
+    assert EmbeddingStore.make_key("hello world", "m1") != EmbeddingStore.make_key("hello world", "m2")
+
+
+# Module-level so spawned workers can import them
+def _no_model(model_name):
+    pass
+
+
+def _embed_or_die(texts):
+    if "crash" in texts:
+        os._exit(1)
+    return np.ones((len(texts), 4), dtype=np.float32)
+
+
+def test_embedder_replaces_a_broken_pool(tmp_path, monkeypatch):
+    monkeypatch.setattr(embeddings, "_load_model", _no_model)
+    monkeypatch.setattr(embeddings, "_embed_batch", _embed_or_die)
+    embedder = BatchEmbedder(EmbeddingStore(str(tmp_path)), workers=1, max_wait=0.01)
+
+    async def run():
+        with pytest.raises(BrokenProcessPool):
+            await embedder.embed(["crash"])
+        return await embedder.embed(["fine"])
+
+    try:
+        vectors = asyncio.run(run())
+    finally:
+        embedder.close()
+    np.testing.assert_array_equal(vectors[0], np.ones(4, dtype=np.float32))
+    metrics = embedder.metrics()
+    assert (metrics["pool_restarts"], metrics["failed_batches"], metrics["batches"]) == (1, 1, 1)
@@ -0,0 +1,53 @@
+from job_queue import PRIORITY_INTERACTIVE, PRIORITY_SCHEDULED, JobQueue
+
+
+def test_submit_dedups_in_flight_jobs(tmp_path):
+    queue = JobQueue(str(tmp_path / "jobs.sqlite3"))
+    job_id, created = queue.submit("news", {"source": "a"}, dedup_key="news:a")
+    assert created
+    assert queue.submit("news", {"source": "a"}, dedup_key="news:a") == (job_id, False)
+
+    # Still deduped while running, not once finished
+    assert queue.claim()["job_id"] == job_id
+    assert queue.submit("news", {"source": "a"}, dedup_key="news:a") == (job_id, False)
+    queue.finish(job_id, "completed", {"ok": True})
+    new_id, created = queue.submit("news", {"source": "a"}, dedup_key="news:a")
+    assert created and new_id != job_id
+    assert queue.job(job_id)["details"] == {"ok": True}
+
+
+def test_claim_in_priority_then_submission_order(tmp_path):
+    queue = JobQueue(str(tmp_path / "jobs.sqlite3"))
+    first_scheduled, _ = queue.submit("news", {}, priority=PRIORITY_SCHEDULED)
+    second_scheduled, _ = queue.submit("news", {}, priority=PRIORITY_SCHEDULED)
+    interactive, _ = queue.submit("news", {}, priority=PRIORITY_INTERACTIVE)
+
+    # Reserved workers only take interactive jobs
+    assert queue.claim(max_priority=PRIORITY_INTERACTIVE)["job_id"] == interactive
+    assert queue.claim(max_priority=PRIORITY_INTERACTIVE) is None
+    assert queue.claim()["job_id"] == first_scheduled
+    assert queue.claim()["job_id"] == second_scheduled
+    assert queue.claim() is None
+
+
+def test_duplicate_request_promotes_a_queued_job(tmp_path):
+    queue = JobQueue(str(tmp_path / "jobs.sqlite3"))
+    queue.submit("news", {}, priority=PRIORITY_SCHEDULED)
+    job_id, _ = queue.submit("social_media", {}, dedup_key="social:x", priority=PRIORITY_SCHEDULED)
+    assert queue.submit("social_media", {}, dedup_key="social:x", priority=PRIORITY_INTERACTIVE) == (job_id, False)
+    assert queue.job(job_id)["priority"] == PRIORITY_INTERACTIVE
+    assert queue.claim()["job_id"] == job_id
+
+
+def test_requeue_running_after_restart(tmp_path):
+    path = str(tmp_path / "jobs.sqlite3")
+    queue = JobQueue(path)
+    job_id, _ = queue.submit("news", {"source": "a"})
+    queue.claim()
+    queue.close()
+
+    queue = JobQueue(path)
+    assert queue.requeue_running() == 1
+    job = queue.claim()
+    assert job == {"job_id": job_id, "kind": "news", "params": {"source": "a"}}
+    assert queue.job(job_id)["attempts"] == 2
@@ -0,0 +1,55 @@
+import numpy as np
+import pytest
+
+from lexicon_sentiment import NEGATION_SCALE, LexiconSentimentScorer, sentiment_bucket
+
+
+@pytest.fixture(scope="module")
+def scorer():
+    return LexiconSentimentScorer(lexicon={"great": 1.0, "bad": -1.0, "growth": 0.5}, audit_rate=0)
+
+
+def net(scorer, text):
+    scores = scorer.score_many([text])
+    return float(np.arctanh(2 * scores["score"][0] - 1))
+
+
+def test_negator_flips_the_next_terms(scorer):
+    assert net(scorer, "great") == pytest.approx(1.0)
+    assert net(scorer, "not great") == pytest.approx(NEGATION_SCALE)
+    assert net(scorer, "never bad") == pytest.approx(-NEGATION_SCALE)
+
+
+def test_negation_scope_ends_at_the_window(scorer):
+    # Within three tokens of the negator, then out of scope
+    assert net(scorer, "not really that great") == pytest.approx(NEGATION_SCALE)
+    assert net(scorer, "not really that much great") == pytest.approx(1.0)
+
+
+def test_negation_scope_ends_at_a_clause_break(scorer):
+    assert net(scorer, "not bad, great") == pytest.approx(-NEGATION_SCALE + 1.0)
+    assert net(scorer, "not bad but great") == pytest.approx(-NEGATION_SCALE + 1.0)
+    assert net(scorer, "not. great") == pytest.approx(1.0)
+
+
+def test_negation_does_not_leak_into_the_next_post(scorer):
+    scores = scorer.score_many(["this is not", "great", "", "bad growth"])
+    assert scores["score"][1] == pytest.approx(0.5 + 0.5 * np.tanh(1.0))
+    assert scores["score"][2] == 0.5 and scores["confidence"][2] == 0.0
+    assert list(scores["positive_terms"]) == [0, 1, 0, 1]
+    assert list(scores["negative_terms"]) == [0, 0, 0, 1]
+
+
+def test_triage_escalates_low_confidence_and_high_impact():
+    scorer = LexiconSentimentScorer(audit_rate=0)
+    _, escalate, audit = scorer.triage(
+        ["bullish breakout, strong growth and record profits", "meh", "bullish on the merger", "bullish rally"],
+        engagement=[1, 1, 1, 5000],
+    )
+    assert list(escalate) == [False, True, True, True]
+    assert not audit.any()
+    assert scorer.metrics()["resolved_locally"] == 1
+
+
+def test_sentiment_bucket():
+    assert list(sentiment_bucket([0.1, 0.5, 0.9])) == [-1, 0, 1]
@@ -0,0 +1,56 @@
+import types
+import asyncio
+
+import pytest
+
+from llm_pool import JSON_ARRAY_PREFILL, LLMPool, parse_prefilled_array
+
+
+class FakeMessages:
+    def __init__(self, fail_on=None):
+        self.fail_on = fail_on
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def create(self, **kwargs):
+        assert "response_format" not in kwargs
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(0.01)
+            if kwargs["messages"][0]["content"] == self.fail_on:
+                raise RuntimeError("overloaded")
+            return types.SimpleNamespace(usage=types.SimpleNamespace(input_tokens=10, output_tokens=3))
+        finally:
+            self.in_flight -= 1
+
+
+def test_parse_prefilled_array():
+    assert parse_prefilled_array('{"post_index": 1}]') == [{"post_index": 1}]
+    assert parse_prefilled_array(' [{"a": [1, 2]}]\nHope this helps!') == [{"a": [1, 2]}]
+    assert parse_prefilled_array("]") == []
+    with pytest.raises(ValueError):
+        parse_prefilled_array("I can't analyze these posts.")
+
+
+def test_pool_bounds_concurrency_and_counts_usage():
+    messages = FakeMessages(fail_on="bad")
+    pool = LLMPool(types.SimpleNamespace(messages=messages), max_concurrency=2)
+
+    async def call(content):
+        return await pool.create_message(messages=[
+            {"role": "user", "content": content},
+            {"role": "assistant", "content": JSON_ARRAY_PREFILL},
+        ])
+
+    async def run():
+        return await asyncio.gather(*(call(content) for content in ["a", "b", "bad", "c", "d", "e"]),
+                                    return_exceptions=True)
+
+    results = asyncio.run(run())
+    assert messages.max_in_flight == 2
+    assert sum(isinstance(result, RuntimeError) for result in results) == 1
+    metrics = pool.metrics()
+    assert (metrics["submitted"], metrics["completed"], metrics["failed"]) == (6, 5, 1)
+    assert (metrics["input_tokens"], metrics["output_tokens"]) == (50, 15)
+    assert metrics["in_flight"] == 0 and metrics["queued"] == 0
@@ -0,0 +1,135 @@
+import sys
+import types
+import asyncio
+import itertools
+
+import pytest
+
+
+def _install_driver_stand_ins():
+    """Minimal bson/pymongo stand-ins, used only where the driver isn't installed."""
+    try:
+        import bson  # noqa: F401
+        import pymongo  # noqa: F401
+        return
+    except ImportError:
+        pass
+    ids = itertools.count()
+    bson = types.ModuleType("bson")
+    bson.ObjectId = lambda: f"oid{next(ids)}"
+    pymongo = types.ModuleType("pymongo")
+
+    # Same attribute names as the driver's operation classes
+    class InsertOne:
+        def __init__(self, document):
+            self._doc = document
+
+    class ReplaceOne:
+        def __init__(self, filter, replacement, upsert=False):
+            self._filter, self._doc, self._upsert = filter, replacement, upsert
+
+    pymongo.InsertOne, pymongo.ReplaceOne = InsertOne, ReplaceOne
+    errors = types.ModuleType("pymongo.errors")
+
+    class BulkWriteError(Exception):
+        def __init__(self, details):
+            super().__init__("batch op errors occurred")
+            self.details = details
+
+    errors.BulkWriteError = BulkWriteError
+    write_concern = types.ModuleType("pymongo.write_concern")
+
+    class WriteConcern:
+        def __init__(self, w=None, j=None):
+            self.document = {key: value for key, value in (("w", w), ("j", j)) if value is not None}
+
+    write_concern.WriteConcern = WriteConcern
+    pymongo.errors, pymongo.write_concern = errors, write_concern
+    sys.modules.update({"bson": bson, "pymongo": pymongo, "pymongo.errors": errors,
+                        "pymongo.write_concern": write_concern})
+
+
+_install_driver_stand_ins()
+
+from pymongo.errors import BulkWriteError  # noqa: E402
+
+from mongo_writer import MongoBulkWriter  # noqa: E402
+
+
+class FakeCollection:
+    def __init__(self, error=None):
+        self.error = error
+        self.batches = []
+
+    def with_options(self, write_concern=None):
+        return self
+
+    def bulk_write(self, operations, ordered=True):
+        assert not ordered
+        self.batches.append(list(operations))
+        if self.error is not None:
+            raise self.error
+
+
+def save_each(writer, documents):
+    async def run():
+        results = await asyncio.gather(*(writer.save("posts", document) for document in documents),
+                                       return_exceptions=True)
+        await writer.close()
+        return results
+    return asyncio.run(run())
+
+
+def test_write_errors_fail_only_their_operations():
+    collection = FakeCollection(BulkWriteError({"writeErrors": [{"index": 1, "errmsg": "duplicate key"}]}))
+    writer = MongoBulkWriter({"posts": collection}, max_wait=0.01)
+
+    results = save_each(writer, [{"n": 0}, {"n": 1}, {"n": 2}])
+
+    assert len(collection.batches) == 1 and len(collection.batches[0]) == 3
+    assert isinstance(results[1], RuntimeError) and "duplicate key" in str(results[1])
+    assert isinstance(results[0], str) and isinstance(results[2], str)
+    metrics = writer.metrics()
+    assert (metrics["written"], metrics["failed"], metrics["failed_batches"]) == (2, 1, 1)
+    assert metrics["in_flight"] == 0 and metrics["buffered"] == 0
+
+
+def test_write_concern_error_fails_the_whole_batch():
+    error = BulkWriteError({"writeErrors": [], "writeConcernErrors": [{"errmsg": "waiting for replication timed out"}]})
+    writer = MongoBulkWriter({"posts": FakeCollection(error)}, max_wait=0.01)
+
+    results = save_each(writer, [{"n": 0}, {"n": 1}])
+
+    assert all(isinstance(result, BulkWriteError) for result in results)
+    assert writer.metrics()["failed"] == 2
+
+
+def test_documents_with_an_id_are_upserted():
+    collection = FakeCollection()
+    writer = MongoBulkWriter({"posts": collection}, max_wait=0.01)
+
+    results = save_each(writer, [{"_id": "stable", "n": 0}, {"n": 1}])
+
+    replace, insert = collection.batches[0]
+    assert results[0] == "stable"
+    assert type(replace).__name__ == "ReplaceOne" and replace._filter == {"_id": "stable"} and replace._upsert
+    assert type(insert).__name__ == "InsertOne" and insert._doc["_id"] == results[1]
+
+
+def test_batches_are_split_at_batch_size():
+    collection = FakeCollection()
+    writer = MongoBulkWriter({"posts": collection}, batch_size=2, max_wait=0.01)
+
+    save_each(writer, [{"n": n} for n in range(5)])
+
+    assert [len(batch) for batch in collection.batches] == [2, 2, 1]
+
+
+@pytest.mark.parametrize("max_pending", [1, 2])
+def test_backpressure_waits_for_room(max_pending):
+    writer = MongoBulkWriter({"posts": FakeCollection()}, max_pending=max_pending, max_wait=0.01)
+
+    results = save_each(writer, [{"n": n} for n in range(4)])
+
+    assert all(isinstance(result, str) for result in results)
+    assert writer.metrics()["backpressure_waits"] > 0
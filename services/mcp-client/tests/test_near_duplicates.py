@@ -0,0 +1,40 @@
+from near_duplicates import NearDuplicateIndex
+
+POST = "Just heard AAPL might be entering the AI race with their own models, what do you all think about this move"
+
+
+def test_assign_groups_near_duplicates_in_a_batch():
+    index = NearDuplicateIndex()
+    groups = index.assign([
+        POST,
+        POST.replace("AAPL", "$AAPL") + " https://example.com/post",
+        "Completely different question about TSLA deliveries this quarter",
+        "",
+    ], now=0)
+
+    assert groups[0] == groups[1]
+    assert groups[2] not in (None, groups[0])
+    assert groups[3] is None
+    assert index.metrics()["grouped"] == 1
+
+
+def test_later_batches_join_groups_within_the_window():
+    index = NearDuplicateIndex(window=60)
+    group = index.assign([POST], now=0)[0]
+    index.record(group, {"sentiment_score": 0.8})
+
+    assert index.assign([POST + " !!!"], now=30) == [group]
+    assert index.analysis(group) == {"sentiment_score": 0.8}
+
+    # Past the window the group and its analysis are gone
+    later = index.assign([POST], now=200)[0]
+    assert later != group
+    assert index.analysis(group) is None
+    assert index.metrics()["expired"] == 2
+
+
+def test_max_entries_bounds_the_index():
+    index = NearDuplicateIndex(max_entries=2)
+    index.assign([f"post number {i} about something else entirely {i * 7}" for i in range(5)], now=0)
+    index.assign(["one more post"], now=1)
+    assert index.metrics()["entries"] <= 3
@@ -0,0 +1,67 @@
+import asyncio
+
+import pytest
+
+from pipeline import StreamingPipeline, iter_batches
+
+
+async def numbers(count, closed=None):
+    try:
+        for i in range(count):
+            yield i
+    finally:
+        if closed is not None:
+            closed.append(True)
+
+
+def test_runs_every_payload_through_the_stages():
+    async def double(x):
+        return x * 2
+
+    async def increment(x):
+        await asyncio.sleep(0)
+        return x + 1
+
+    pipeline = StreamingPipeline([("double", double, 2), ("increment", increment, 3)], queue_size=1)
+    assert sorted(asyncio.run(pipeline.run(numbers(20)))) == [x * 2 + 1 for x in range(20)]
+
+
+def test_stage_failure_propagates_and_closes_the_source():
+    closed = []
+    seen = []
+
+    async def fail_on_three(x):
+        if x == 3:
+            raise RuntimeError("boom")
+        return x
+
+    async def collect(x):
+        seen.append(x)
+        return x
+
+    pipeline = StreamingPipeline([("check", fail_on_three, 1), ("collect", collect, 1)], queue_size=1)
+    with pytest.raises(RuntimeError, match="boom"):
+        asyncio.run(asyncio.wait_for(pipeline.run(numbers(1000, closed)), timeout=5))
+    assert closed == [True]
+    assert 3 not in seen and len(seen) < 1000
+
+
+def test_source_failure_propagates():
+    async def broken():
+        yield 1
+        raise ValueError("source down")
+
+    async def identity(x):
+        return x
+
+    with pytest.raises(ValueError, match="source down"):
+        asyncio.run(StreamingPipeline([("identity", identity, 2)]).run(broken()))
+
+
+def test_iter_batches():
+    async def collect(items):
+        return [batch async for batch in iter_batches(items, batch_size=3)]
+
+    assert asyncio.run(collect(list(range(7)))) == [[0, 1, 2], [3, 4, 5], [6]]
+    assert asyncio.run(collect(numbers(7))) == [[0, 1, 2], [3, 4, 5], [6]]
+    assert asyncio.run(collect([])) == []
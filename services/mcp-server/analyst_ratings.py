@@ -0,0 +1,396 @@
+"""
+Analyst rating store for the MCP server.
+
+Loads analyst rating feeds dropped on local disk as CSV or JSON into the
+`analyst_rating` table (the same table as models.AnalystRating in the web
+app) using set-based inserts, and keeps a per-ticker consensus row up to
+date incrementally as ratings arrive. The consensus counts each firm's
+latest rating once, so reads are a single primary-key lookup.
+
+Usage:
+    python analyst_ratings.py ratings.csv more_ratings.json
+    python analyst_ratings.py --drop-dir data/analyst_drops
+"""
+import os
+import csv
+import json
+import math
+import shutil
+import logging
+import argparse
+from datetime import date, datetime
+from sqlalchemy import (
+    Column, Date, DateTime, Float, Index, Integer, MetaData, String, Table, Text,
+    and_, create_engine, func, insert, select, update, bindparam,
+)
+
+logger = logging.getLogger(__name__)
+
+metadata = MetaData()
+
+# Mirrors models.AnalystRating in the web app
+analyst_rating = Table(
+    "analyst_rating", metadata,
+    Column("id", Integer, primary_key=True),
+    Column("ticker", String(10), nullable=False),
+    Column("firm_name", String(128), nullable=False),
+    Column("analyst_name", String(128), nullable=True),
+    Column("rating", String(20), nullable=False),
+    Column("previous_rating", String(20), nullable=True),
+    Column("price_target", Float, nullable=True),
+    Column("previous_price_target", Float, nullable=True),
+    Column("rating_date", Date, nullable=False),
+    Column("notes", Text, nullable=True),
+    Column("created_at", DateTime, default=datetime.utcnow),
+    Index("ix_analyst_rating_ticker_rating_date", "ticker", "rating_date"),
+    Index("ix_analyst_rating_firm_name", "firm_name"),
+)
+
+# Mirrors models.AnalystConsensus in the web app
+analyst_consensus = Table(
+    "analyst_consensus", metadata,
+    Column("ticker", String(10), primary_key=True),
+    Column("firm_count", Integer, nullable=False, default=0),
+    Column("buy_count", Integer, nullable=False, default=0),
+    Column("hold_count", Integer, nullable=False, default=0),
+    Column("sell_count", Integer, nullable=False, default=0),
+    Column("target_count", Integer, nullable=False, default=0),
+    Column("target_sum", Float, nullable=False, default=0.0),
+    Column("target_sum_sq", Float, nullable=False, default=0.0),
+    Column("mean_target", Float, nullable=True),
+    Column("target_dispersion", Float, nullable=True),
+    Column("latest_rating_date", Date, nullable=True),
+    Column("updated_at", DateTime, default=datetime.utcnow),
+)
+
+BUY_RATINGS = {"buy", "strong buy", "outperform", "overweight", "accumulate", "market outperform", "sector outperform", "positive"}
+SELL_RATINGS = {"sell", "strong sell", "underperform", "underweight", "reduce", "market underperform", "sector underperform", "negative"}
+
+# MCP Server analyst report source -> firm name as it appears in the feeds
+FIRM_NAMES = {
+    "ubs": "UBS",
+    "citi": "Citi",
+    "morgan_stanley": "Morgan Stanley",
+    "wells_fargo": "Wells Fargo",
+    "goldman_sachs": "Goldman Sachs",
+    "jp_morgan": "JP Morgan",
+    "barclays": "Barclays",
+    "bofa": "BofA Securities",
+}
+
+FIELD_ALIASES = {
+    "symbol": "ticker",
+    "firm": "firm_name",
+    "analyst": "analyst_name",
+    "action_date": "rating_date",
+    "date": "rating_date",
+    "target": "price_target",
+    "previous_target": "previous_price_target",
+    "prior_rating": "previous_rating",
+}
+
+INSERT_CHUNK_SIZE = 1000
+
+
+def rating_bucket(rating):
+    """Map a firm-specific rating to buy, hold or sell."""
+    normalized = (rating or "").strip().lower()
+    if normalized in BUY_RATINGS:
+        return "buy"
+    if normalized in SELL_RATINGS:
+        return "sell"
+    return "hold"
+
+
+def _to_float(value):
+    if value in (None, ""):
+        return None
+    try:
+        return float(str(value).replace("$", "").replace(",", ""))
+    except ValueError:
+        return None
+
+
+def _to_date(value):
+    if isinstance(value, date):
+        return value
+    return datetime.fromisoformat(str(value).strip()[:10]).date()
+
+
+def normalize_row(raw):
+    """Normalize a feed row into analyst_rating columns, or None if unusable."""
+    row = {FIELD_ALIASES.get(key.strip().lower(), key.strip().lower()): value for key, value in raw.items() if key}
+    try:
+        ticker = (row.get("ticker") or "").strip().upper()
+        firm_name = (row.get("firm_name") or "").strip()
+        rating = (row.get("rating") or "").strip()
+        if not (ticker and firm_name and rating) or len(ticker) > 10:
+            return None
+        return {
+            "ticker": ticker,
+            "firm_name": firm_name,
+            "analyst_name": (row.get("analyst_name") or "").strip() or None,
+            "rating": rating[:20],
+            "previous_rating": (row.get("previous_rating") or "").strip()[:20] or None,
+            "price_target": _to_float(row.get("price_target")),
+            "previous_price_target": _to_float(row.get("previous_price_target")),
+            "rating_date": _to_date(row.get("rating_date")),
+            "notes": row.get("notes") or None,
+            "created_at": datetime.utcnow(),
+        }
+    except (TypeError, ValueError):
+        return None
+
+
+def read_feed(path):
+    """Read rating rows from a CSV or JSON drop file."""
+    if path.endswith(".csv"):
+        with open(path, newline="") as f:
+            return list(csv.DictReader(f))
+    with open(path) as f:
+        data = json.load(f)
+    return data.get("ratings", []) if isinstance(data, dict) else data
+
+
+class AnalystRatingStore:
+    """Bulk loader and query interface for analyst ratings and consensus."""
+
+    def __init__(self, database_url):
+        self.engine = create_engine(database_url, pool_pre_ping=True)
+        self.ready = False
+        self._stats = {"loads": 0, "inserted": 0, "duplicates": 0, "skipped": 0, "files": 0, "failed_files": 0}
+
+    def ensure_schema(self):
+        """Create the tables and indexes if missing; safe to call repeatedly."""
+        if self.ready:
+            return
+        metadata.create_all(self.engine, checkfirst=True)
+        # The web app may have created analyst_rating before these indexes existed
+        for index in analyst_rating.indexes:
+            index.create(self.engine, checkfirst=True)
+        self.ready = True
+
+    def load_rows(self, raw_rows):
+        """Insert new ratings and update the consensus; returns load statistics."""
+        rows = {}
+        skipped = 0
+        for raw in raw_rows:
+            row = normalize_row(raw)
+            if row is None:
+                skipped += 1
+                continue
+            rows[(row["ticker"], row["firm_name"], row["rating_date"], row["rating"])] = row
+        if not rows:
+            return {"inserted": 0, "duplicates": 0, "skipped": skipped, "tickers": 0}
+
+        tickers = sorted({row["ticker"] for row in rows.values()})
+        min_date = min(row["rating_date"] for row in rows.values())
+
+        with self.engine.begin() as conn:
+            # Drop rows that were already loaded, using the (ticker, rating_date) index
+            existing = conn.execute(
+                select(analyst_rating.c.ticker, analyst_rating.c.firm_name,
+                       analyst_rating.c.rating_date, analyst_rating.c.rating)
+                .where(analyst_rating.c.ticker.in_(tickers), analyst_rating.c.rating_date >= min_date)
+            )
+            existing_keys = {tuple(row) for row in existing}
+            new_rows = [row for key, row in rows.items() if key not in existing_keys]
+            duplicates = len(rows) - len(new_rows)
+
+            if new_rows:
+                previous = self._latest_by_firm(conn, tickers)
+                for start in range(0, len(new_rows), INSERT_CHUNK_SIZE):
+                    conn.execute(insert(analyst_rating), new_rows[start:start + INSERT_CHUNK_SIZE])
+                self._apply_consensus_deltas(conn, previous, new_rows)
+
+        self._stats["loads"] += 1
+        self._stats["inserted"] += len(new_rows)
+        self._stats["duplicates"] += duplicates
+        self._stats["skipped"] += skipped
+        logger.info(f"Loaded {len(new_rows)} analyst ratings ({duplicates} duplicates, {skipped} skipped)")
+        return {"inserted": len(new_rows), "duplicates": duplicates, "skipped": skipped, "tickers": len(tickers)}
+
+    def load_files(self, paths):
+        raw_rows = []
+        for path in paths:
+            raw_rows.extend(read_feed(path))
+        return self.load_rows(raw_rows)
+
+    def load_drop_directory(self, drop_dir):
+        """
+        Load every CSV/JSON file in a drop directory, each on its own.
+
+        Loaded files move to processed/. A file that can't be parsed moves to
+        failed/ instead, so it can't block later drops. A file whose insert
+        fails (say, the database is down) stays put and is retried next time.
+        """
+        paths = []
+        if os.path.isdir(drop_dir):
+            paths = sorted(
+                os.path.join(drop_dir, name) for name in os.listdir(drop_dir)
+                if name.endswith((".csv", ".json"))
+            )
+        totals = {"inserted": 0, "duplicates": 0, "skipped": 0, "tickers": 0, "files": 0, "failed": 0}
+        for path in paths:
+            try:
+                raw_rows = read_feed(path)
+            except Exception as e:
+                logger.error(f"Error reading analyst ratings from {path}, moving it to failed/: {str(e)}")
+                target_dir = os.path.join(drop_dir, "failed")
+                totals["failed"] += 1
+            else:
+                try:
+                    result = self.load_rows(raw_rows)
+                except Exception as e:
+                    logger.error(f"Error loading analyst ratings from {path}: {str(e)}")
+                    continue
+                target_dir = os.path.join(drop_dir, "processed")
+                for key in ("inserted", "duplicates", "skipped", "tickers"):
+                    totals[key] += result[key]
+                totals["files"] += 1
+            os.makedirs(target_dir, exist_ok=True)
+            shutil.move(path, os.path.join(target_dir, os.path.basename(path)))
+        self._stats["files"] += totals["files"]
+        self._stats["failed_files"] += totals["failed"]
+        return totals
+
+    def _latest_by_firm(self, conn, tickers):
+        """Return (ticker, firm) -> latest stored rating row for the given tickers."""
+        latest_dates = (
+            select(analyst_rating.c.ticker, analyst_rating.c.firm_name,
+                   func.max(analyst_rating.c.rating_date).label("rating_date"))
+            .where(analyst_rating.c.ticker.in_(tickers))
+            .group_by(analyst_rating.c.ticker, analyst_rating.c.firm_name)
+            .subquery()
+        )
+        result = conn.execute(
+            select(analyst_rating.c.id, analyst_rating.c.ticker, analyst_rating.c.firm_name,
+                   analyst_rating.c.rating, analyst_rating.c.price_target, analyst_rating.c.rating_date)
+            .join(latest_dates, and_(
+                analyst_rating.c.ticker == latest_dates.c.ticker,
+                analyst_rating.c.firm_name == latest_dates.c.firm_name,
+                analyst_rating.c.rating_date == latest_dates.c.rating_date,
+            ))
+            .order_by(analyst_rating.c.id)
+        )
+        return {(row.ticker, row.firm_name): row._asdict() for row in result}
+
+    def _apply_consensus_deltas(self, conn, previous, new_rows):
+        """Swap each firm's old latest rating for its new one in the consensus rows."""
+        incoming = {}
+        for row in new_rows:
+            key = (row["ticker"], row["firm_name"])
+            if key not in incoming or row["rating_date"] >= incoming[key]["rating_date"]:
+                incoming[key] = row
+
+        deltas = {}
+        for key, row in incoming.items():
+            old = previous.get(key)
+            if old is not None and old["rating_date"] > row["rating_date"]:
+                continue  # Backfilled history doesn't change the firm's current view
+            delta = deltas.setdefault(key[0], {
+                "firm_count": 0, "buy_count": 0, "hold_count": 0, "sell_count": 0,
+                "target_count": 0, "target_sum": 0.0, "target_sum_sq": 0.0,
+                "latest_rating_date": None,
+            })
+            for contribution, sign in ((old, -1), (row, 1)):
+                if contribution is None:
+                    continue
+                delta["firm_count"] += sign
+                delta[f"{rating_bucket(contribution['rating'])}_count"] += sign
+                if contribution["price_target"] is not None:
+                    delta["target_count"] += sign
+                    delta["target_sum"] += sign * contribution["price_target"]
+                    delta["target_sum_sq"] += sign * contribution["price_target"] ** 2
+            if delta["latest_rating_date"] is None or row["rating_date"] > delta["latest_rating_date"]:
+                delta["latest_rating_date"] = row["rating_date"]
+
+        if not deltas:
+            return
+
+        current = {
+            row.ticker: row._asdict()
+            for row in conn.execute(select(analyst_consensus).where(analyst_consensus.c.ticker.in_(list(deltas))))
+        }
+        inserts, updates = [], []
+        now = datetime.utcnow()
+        for ticker, delta in deltas.items():
+            base = current.get(ticker) or {
+                "ticker": ticker, "firm_count": 0, "buy_count": 0, "hold_count": 0, "sell_count": 0,
+                "target_count": 0, "target_sum": 0.0, "target_sum_sq": 0.0, "latest_rating_date": None,
+            }
+            merged = {"ticker": ticker, "updated_at": now}
+            for field in ("firm_count", "buy_count", "hold_count", "sell_count", "target_count", "target_sum", "target_sum_sq"):
+                merged[field] = base[field] + delta[field]
+            merged["latest_rating_date"] = max(
+                d for d in (base["latest_rating_date"], delta["latest_rating_date"]) if d is not None
+            )
+            if merged["target_count"] > 0:
+                mean = merged["target_sum"] / merged["target_count"]
+                variance = max(0.0, merged["target_sum_sq"] / merged["target_count"] - mean ** 2)
+                merged["mean_target"] = mean
+                merged["target_dispersion"] = math.sqrt(variance)
+            else:
+                merged["mean_target"] = None
+                merged["target_dispersion"] = None
+            (updates if ticker in current else inserts).append(merged)
+
+        if inserts:
+            conn.execute(insert(analyst_consensus), inserts)
+        if updates:
+            conn.execute(
+                update(analyst_consensus)
+                .where(analyst_consensus.c.ticker == bindparam("b_ticker"))
+                .values({field: bindparam(field) for field in updates[0] if field != "ticker"}),
+                [{**row, "b_ticker": row["ticker"]} for row in updates]
+            )
+
+    def metrics(self):
+        return {**self._stats, "backend": self.engine.dialect.name, "ready": self.ready}
+
+    def get_consensus(self, ticker):
+        """Return the consensus row for a ticker (a primary-key lookup), or None."""
+        with self.engine.connect() as conn:
+            row = conn.execute(
+                select(analyst_consensus).where(analyst_consensus.c.ticker == ticker.upper())
+            ).first()
+        if row is None:
+            return None
+        consensus = row._asdict()
+        consensus.pop("target_sum_sq")
+        return consensus
+
+    def get_ratings(self, ticker=None, firm_name=None, limit=50):
+        """Return the most recent ratings for a ticker and/or firm."""
+        query = select(analyst_rating).order_by(analyst_rating.c.rating_date.desc(), analyst_rating.c.id.desc()).limit(limit)
+        if ticker:
+            query = query.where(analyst_rating.c.ticker == ticker.upper())
+        if firm_name:
+            query = query.where(analyst_rating.c.firm_name == firm_name)
+        with self.engine.connect() as conn:
+            return [row._asdict() for row in conn.execute(query)]
+
+
+def default_database_url(data_dir):
+    return os.environ.get("ANALYST_DB_URL") or os.environ.get("DATABASE_URL") or \
+        f"sqlite:///{os.path.join(data_dir, 'analyst_ratings.sqlite3')}"
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    )
+    parser = argparse.ArgumentParser(description="Bulk load analyst rating feeds")
+    parser.add_argument("files", nargs="*", help="CSV or JSON rating files")
+    parser.add_argument("--drop-dir", help="Load and archive every file in this directory")
+    args = parser.parse_args()
+
+    data_dir = os.environ.get("MCP_DATA_DIR", "data")
+    os.makedirs(data_dir, exist_ok=True)
+    store = AnalystRatingStore(default_database_url(data_dir))
+    store.ensure_schema()
+    if args.drop_dir:
+        print(store.load_drop_directory(args.drop_dir))
+    if args.files:
+        print(store.load_files(args.files))
@@ -0,0 +1,101 @@
+"""
+Change detection for scraped sources.
+
+Keeps the ETag/Last-Modified validators returned by each upstream so they
+can be replayed as conditional requests, plus a content hash per source so
+an unchanged page is neither re-parsed nor handed to downstream processors.
+"""
+import json
+import hashlib
+from datetime import datetime
+
+
+def content_hash(payload):
+    """Return a stable SHA-256 hex digest for raw text/bytes or JSON-able data."""
+    if isinstance(payload, str):
+        payload = payload.encode("utf-8")
+    elif not isinstance(payload, (bytes, bytearray)):
+        payload = json.dumps(payload, sort_keys=True, default=str).encode("utf-8")
+    return hashlib.sha256(payload).hexdigest()
+
+
+class SourceTracker:
+    """Per-source validators, content hashes and last parsed results."""
+
+    def __init__(self):
+        self._sources = {}
+        self._stats = {
+            "conditional_requests": 0,
+            "not_modified": 0,
+            "unchanged_content": 0,
+            "changed_content": 0,
+        }
+
+    def _state(self, key):
+        return self._sources.setdefault(key, {
+            "etag": None,
+            "last_modified": None,
+            "hash": None,
+            "result": None,
+            "checked_at": None,
+            "changed_at": None,
+        })
+
+    def conditional_headers(self, key):
+        """Return If-None-Match/If-Modified-Since headers for a source."""
+        state = self._state(key)
+        headers = {}
+        # Without a stored result a 304 would leave us with nothing to serve
+        if state["result"] is None:
+            return headers
+        if state["etag"]:
+            headers["If-None-Match"] = state["etag"]
+        if state["last_modified"]:
+            headers["If-Modified-Since"] = state["last_modified"]
+        if headers:
+            self._stats["conditional_requests"] += 1
+        return headers
+
+    def update_validators(self, key, response_headers):
+        """Store the validators from an upstream response."""
+        state = self._state(key)
+        etag = response_headers.get("ETag")
+        last_modified = response_headers.get("Last-Modified")
+        if etag:
+            state["etag"] = etag
+        if last_modified:
+            state["last_modified"] = last_modified
+
+    def mark_not_modified(self, key):
+        """Record a 304 response from upstream."""
+        self._stats["not_modified"] += 1
+        self._state(key)["checked_at"] = datetime.now().isoformat()
+
+    def observe(self, key, digest):
+        """Record a content hash for a source and return whether it changed."""
+        state = self._state(key)
+        now = datetime.now().isoformat()
+        state["checked_at"] = now
+        if state["hash"] == digest:
+            self._stats["unchanged_content"] += 1
+            return False
+        state["hash"] = digest
+        state["changed_at"] = now
+        self._stats["changed_content"] += 1
+        return True
+
+    def has_result(self, key):
+        return self._state(key)["result"] is not None
+
+    def last_result(self, key):
+        """Return the last parsed result for a source, if any."""
+        return self._state(key)["result"]
+
+    def remember_result(self, key, result):
+        self._state(key)["result"] = result
+
+    def metrics(self):
+        return {
+            **self._stats,
+            "tracked_sources": len(self._sources),
+        }
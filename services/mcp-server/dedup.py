@@ -0,0 +1,177 @@
+"""
+Seen-ID deduplication for social posts and news items.
+
+An exact set of the most recently seen keys answers the common case (the
+same hot posts coming back on every fetch) without false positives. Older
+keys fall through to a pair of rotating Bloom filters, which keep memory
+bounded no matter how long the server runs. The whole structure is saved
+to disk so a restart doesn't replay everything as new.
+"""
+import os
+import json
+import math
+import base64
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter using double hashing over a BLAKE2b digest."""
+
+    def __init__(self, capacity, error_rate=0.001, bits=None, count=0):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.num_bits = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.num_hashes = max(1, round(self.num_bits / capacity * math.log(2)))
+        self.bits = bits if bits is not None else bytearray((self.num_bits + 7) // 8)
+        self.count = count
+
+    def _positions(self, key):
+        digest = hashlib.blake2b(key.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return [(h1 + i * h2) % self.num_bits for i in range(self.num_hashes)]
+
+    def add(self, key):
+        for pos in self._positions(key):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+
+    def __contains__(self, key):
+        return all(self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(key))
+
+    def to_dict(self):
+        return {
+            "capacity": self.capacity,
+            "error_rate": self.error_rate,
+            "count": self.count,
+            "bits": base64.b64encode(bytes(self.bits)).decode("ascii"),
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(
+            data["capacity"],
+            data["error_rate"],
+            bits=bytearray(base64.b64decode(data["bits"])),
+            count=data["count"],
+        )
+
+
+class SeenFilter:
+    """Bounded "have we seen this key before" filter, persisted to disk."""
+
+    def __init__(self, path, capacity=100000, error_rate=0.001, recent_size=20000):
+        self.path = path
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.recent_size = recent_size
+        self._lock = threading.Lock()
+        self._current = BloomFilter(capacity, error_rate)
+        self._previous = BloomFilter(capacity, error_rate)
+        self._recent = OrderedDict()
+        self._dirty = False
+        self._stats = {"checked": 0, "new": 0, "duplicates": 0, "rotations": 0}
+
+    @staticmethod
+    def make_key(source, item_id):
+        return f"{source}:{item_id}"
+
+    def seen(self, key):
+        """Return True if the key has (probably) been marked before."""
+        with self._lock:
+            return self._seen(key)
+
+    def _seen(self, key):
+        if key in self._recent:
+            return True
+        return key in self._current or key in self._previous
+
+    def add(self, key):
+        with self._lock:
+            self._add(key)
+
+    def _add(self, key):
+        if key in self._recent:
+            self._recent.move_to_end(key)
+            return
+        self._recent[key] = None
+        if len(self._recent) > self.recent_size:
+            self._recent.popitem(last=False)
+
+        if key not in self._current:
+            self._current.add(key)
+            if self._current.count >= self.capacity:
+                # Oldest generation drops off, bounding memory and false-positive rate
+                self._previous = self._current
+                self._current = BloomFilter(self.capacity, self.error_rate)
+                self._stats["rotations"] += 1
+        self._dirty = True
+
+    def filter_new(self, keys, mark=True):
+        """Return the keys not seen before, optionally marking them as seen."""
+        new_keys = []
+        with self._lock:
+            for key in keys:
+                self._stats["checked"] += 1
+                if self._seen(key):
+                    self._stats["duplicates"] += 1
+                    continue
+                self._stats["new"] += 1
+                new_keys.append(key)
+                if mark:
+                    self._add(key)
+        return new_keys
+
+    def mark(self, keys):
+        with self._lock:
+            for key in keys:
+                self._add(key)
+
+    def save(self):
+        """Write the filter to disk atomically if it changed."""
+        with self._lock:
+            if not self._dirty:
+                return False
+            state = {
+                "current": self._current.to_dict(),
+                "previous": self._previous.to_dict(),
+                "recent": list(self._recent),
+            }
+            self._dirty = False
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(state, f)
+        os.replace(tmp_path, self.path)
+        return True
+
+    def load(self):
+        """Restore the filter from disk, if a saved copy exists."""
+        if not os.path.exists(self.path):
+            return False
+        with open(self.path) as f:
+            state = json.load(f)
+        with self._lock:
+            self._current = BloomFilter.from_dict(state["current"])
+            self._previous = BloomFilter.from_dict(state["previous"])
+            self._recent = OrderedDict((key, None) for key in state["recent"][-self.recent_size:])
+            self._dirty = False
+        return True
+
+    def metrics(self):
+        with self._lock:
+            return {
+                **self._stats,
+                "recent_ids": len(self._recent),
+                "current_generation": self._current.count,
+                "previous_generation": self._previous.count,
+                "capacity": self.capacity,
+            }
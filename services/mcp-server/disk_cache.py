@@ -0,0 +1,151 @@
+"""
+Disk-backed second cache tier for the MCP server.
+
+Entries are stored in a local SQLite file as zlib-compressed JSON together
+with their TTL metadata, so the in-memory cache can be refilled after a
+restart instead of every source being fetched cold again.
+"""
+import os
+import json
+import time
+import zlib
+import sqlite3
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class DiskCache:
+    """SQLite-backed key/value cache with compression and expiry."""
+
+    def __init__(self, path, ttl, compress_level=6):
+        self.path = path
+        self.ttl = ttl
+        self.compress_level = compress_level
+        self._lock = threading.Lock()
+        self._stats = {
+            "hits": 0,
+            "misses": 0,
+            "writes": 0,
+            "prefilled": 0,
+            "compactions": 0,
+            "evicted": 0,
+        }
+        self._conn = None
+
+    @property
+    def conn(self):
+        """Open the database on first use."""
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._setup(self._conn)
+        return self._conn
+
+    def _setup(self, conn):
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS cache (
+                key TEXT PRIMARY KEY,
+                value BLOB NOT NULL,
+                stored_at REAL NOT NULL,
+                expires_at REAL NOT NULL,
+                raw_size INTEGER NOT NULL
+            )
+            """
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_cache_expires_at ON cache (expires_at)")
+        conn.commit()
+
+    def _encode(self, value):
+        raw = json.dumps(value, default=str).encode("utf-8")
+        return zlib.compress(raw, self.compress_level), len(raw)
+
+    def _decode(self, blob):
+        return json.loads(zlib.decompress(blob).decode("utf-8"))
+
+    def get(self, key):
+        """Return (value, stored_at) for a fresh entry, or None."""
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT value, stored_at FROM cache WHERE key = ? AND expires_at > ?",
+                (key, time.time())
+            ).fetchone()
+
+        if row is None:
+            self._stats["misses"] += 1
+            return None
+        self._stats["hits"] += 1
+        return self._decode(row[0]), row[1]
+
+    def set(self, key, value, stored_at=None, ttl=None):
+        """Store a value, stamped with when it was fetched."""
+        stored_at = stored_at or time.time()
+        expires_at = stored_at + (ttl or self.ttl)
+        blob, raw_size = self._encode(value)
+
+        with self._lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO cache (key, value, stored_at, expires_at, raw_size) VALUES (?, ?, ?, ?, ?)",
+                (key, blob, stored_at, expires_at, raw_size)
+            )
+            self.conn.commit()
+        self._stats["writes"] += 1
+
+    def load_fresh(self):
+        """Return all unexpired entries as (key, value, stored_at) tuples."""
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT key, value, stored_at FROM cache WHERE expires_at > ?",
+                (time.time(),)
+            ).fetchall()
+
+        entries = []
+        for key, blob, stored_at in rows:
+            try:
+                entries.append((key, self._decode(blob), stored_at))
+            except Exception as e:
+                logger.error(f"Error decoding disk cache entry {key}: {str(e)}")
+        self._stats["prefilled"] += len(entries)
+        return entries
+
+    def compact(self, grace=0):
+        """Delete entries that expired more than `grace` seconds ago and reclaim space."""
+        with self._lock:
+            cursor = self.conn.execute(
+                "DELETE FROM cache WHERE expires_at < ?",
+                (time.time() - grace,)
+            )
+            deleted = cursor.rowcount
+            self.conn.commit()
+            if deleted:
+                self.conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+                self.conn.execute("VACUUM")
+
+        self._stats["compactions"] += 1
+        self._stats["evicted"] += deleted
+        return deleted
+
+    def metrics(self):
+        with self._lock:
+            entries, stored_bytes, raw_bytes = self.conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(LENGTH(value)), 0), COALESCE(SUM(raw_size), 0) FROM cache"
+            ).fetchone()
+        return {
+            **self._stats,
+            "entries": entries,
+            "stored_bytes": stored_bytes,
+            "raw_bytes": raw_bytes,
+            "compression_ratio": raw_bytes / stored_bytes if stored_bytes else 0.0,
+        }
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
@@ -0,0 +1,312 @@
+"""
+Durable append-only event log between the MCP server and its consumers.
+
+Newly fetched items are appended as JSON records to segment files. Each
+record is framed with its offset, length and CRC32, and every segment has
+an index file of fixed-width (offset, position) entries, one per record.
+Since offsets within a segment are contiguous, finding a record is a
+single seek into the index. Consumers track their own committed offsets,
+so each reads in batches at its own pace, resumes after a crash and can
+replay from any retained offset.
+
+Appends take an exclusive file lock, so several server workers can share
+one log directory. Data is written before its index entries, and readers
+only trust indexed records, so a torn write is never served and is
+truncated away the next time the log is opened.
+"""
+import os
+import json
+import time
+import zlib
+import fcntl
+import struct
+import sqlite3
+import logging
+import threading
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+RECORD_HEADER = struct.Struct("<QII")  # offset, payload length, crc32
+INDEX_ENTRY = struct.Struct("<QQ")  # offset, position in the segment file
+SEGMENT_SUFFIX = ".log"
+INDEX_SUFFIX = ".idx"
+
+
+class EventLog:
+    """Segmented append-only log with per-consumer offsets."""
+
+    def __init__(self, directory, segment_bytes=64 * 1024 * 1024, fsync=True):
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.fsync = fsync
+        self._lock = threading.Lock()
+        self._offsets_conn = None
+        self._stats = {"appended": 0, "append_batches": 0, "read_batches": 0, "records_read": 0, "truncated_bytes": 0}
+
+    # Paths and locking
+
+    def _segment_path(self, base):
+        return os.path.join(self.directory, f"{base:020d}{SEGMENT_SUFFIX}")
+
+    def _index_path(self, base):
+        return os.path.join(self.directory, f"{base:020d}{INDEX_SUFFIX}")
+
+    def _segments(self):
+        if not os.path.isdir(self.directory):
+            return []
+        return sorted(
+            int(name[:-len(SEGMENT_SUFFIX)]) for name in os.listdir(self.directory)
+            if name.endswith(SEGMENT_SUFFIX)
+        )
+
+    @contextmanager
+    def _file_lock(self):
+        """Exclusive lock shared with every process writing to this directory."""
+        os.makedirs(self.directory, exist_ok=True)
+        with self._lock, open(os.path.join(self.directory, "append.lock"), "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _indexed_count(self, base):
+        path = self._index_path(base)
+        return os.path.getsize(path) // INDEX_ENTRY.size if os.path.exists(path) else 0
+
+    def _tail(self):
+        """Return (base, record count, indexed end position) of the active segment."""
+        segments = self._segments()
+        if not segments:
+            return None, 0, 0
+        base = segments[-1]
+        count = self._indexed_count(base)
+        if count == 0:
+            return base, 0, 0
+        with open(self._index_path(base), "rb") as index_file:
+            index_file.seek((count - 1) * INDEX_ENTRY.size)
+            _, position = INDEX_ENTRY.unpack(index_file.read(INDEX_ENTRY.size))
+        with open(self._segment_path(base), "rb") as segment_file:
+            segment_file.seek(position)
+            _, length, _ = RECORD_HEADER.unpack(segment_file.read(RECORD_HEADER.size))
+        return base, count, position + RECORD_HEADER.size + length
+
+    # Writing
+
+    def recover(self):
+        """Truncate anything past the last fully indexed record of the active segment."""
+        with self._file_lock():
+            segments = self._segments()
+            if not segments:
+                return 0
+            base = segments[-1]
+            index_path = self._index_path(base)
+            segment_path = self._segment_path(base)
+            size = os.path.getsize(segment_path)
+
+            # Drop index entries whose records didn't fully reach the segment
+            count = self._indexed_count(base)
+            end = 0
+            with open(index_path, "ab+") as index_file, open(segment_path, "rb") as segment_file:
+                while count > 0:
+                    index_file.seek((count - 1) * INDEX_ENTRY.size)
+                    _, position = INDEX_ENTRY.unpack(index_file.read(INDEX_ENTRY.size))
+                    segment_file.seek(position)
+                    header = segment_file.read(RECORD_HEADER.size)
+                    if len(header) == RECORD_HEADER.size:
+                        _, length, _ = RECORD_HEADER.unpack(header)
+                        end = position + RECORD_HEADER.size + length
+                        if end <= size:
+                            break
+                    end = 0
+                    count -= 1
+            os.truncate(index_path, count * INDEX_ENTRY.size)
+
+            truncated = 0
+            if size > end:
+                truncated = size - end
+                os.truncate(segment_path, end)
+                logger.warning(f"Truncated {truncated} bytes of unindexed data from event log segment {base}")
+            self._stats["truncated_bytes"] += truncated
+            return truncated
+
+    def append(self, records):
+        """Append records durably; returns (first offset, next offset)."""
+        if not records:
+            end = self.end_offset()
+            return end, end
+
+        with self._file_lock():
+            base, count, end = self._tail()
+            if base is None:
+                base, count, end = 0, 0, 0
+            next_offset = base + count
+            first_offset = next_offset
+            if end >= self.segment_bytes:
+                # Roll over to a new segment starting at the next offset
+                base, count, end = next_offset, 0, 0
+
+            # A failed earlier append may have left bytes past the indexed end (or a
+            # partial index entry); cut them off so new positions line up again
+            segment_path = self._segment_path(base)
+            if os.path.exists(segment_path) and os.path.getsize(segment_path) > end:
+                truncated = os.path.getsize(segment_path) - end
+                os.truncate(segment_path, end)
+                self._stats["truncated_bytes"] += truncated
+                logger.warning(f"Truncated {truncated} bytes left by a failed append to event log segment {base}")
+            index_path = self._index_path(base)
+            if os.path.exists(index_path) and os.path.getsize(index_path) > count * INDEX_ENTRY.size:
+                os.truncate(index_path, count * INDEX_ENTRY.size)
+
+            entries = []
+            with open(segment_path, "ab") as segment_file:
+                for record in records:
+                    payload = json.dumps(record, separators=(",", ":"), default=str).encode("utf-8")
+                    segment_file.write(RECORD_HEADER.pack(next_offset, len(payload), zlib.crc32(payload)))
+                    segment_file.write(payload)
+                    entries.append(INDEX_ENTRY.pack(next_offset, end))
+                    end += RECORD_HEADER.size + len(payload)
+                    next_offset += 1
+                segment_file.flush()
+                if self.fsync:
+                    os.fsync(segment_file.fileno())
+
+            # Index last: a record only becomes visible once its data is on disk
+            with open(index_path, "ab") as index_file:
+                index_file.write(b"".join(entries))
+                index_file.flush()
+                if self.fsync:
+                    os.fsync(index_file.fileno())
+
+        self._stats["appended"] += len(records)
+        self._stats["append_batches"] += 1
+        return first_offset, next_offset
+
+    # Reading
+
+    def start_offset(self):
+        segments = self._segments()
+        return segments[0] if segments else 0
+
+    def end_offset(self):
+        segments = self._segments()
+        if not segments:
+            return 0
+        return segments[-1] + self._indexed_count(segments[-1])
+
+    def read(self, offset, max_records=100, max_bytes=1024 * 1024):
+        """Return up to max_records (offset, record) pairs starting at offset."""
+        segments = self._segments()
+        results = []
+        size = 0
+        offset = max(offset, segments[0]) if segments else offset
+
+        for i, base in enumerate(segments):
+            next_base = segments[i + 1] if i + 1 < len(segments) else None
+            if next_base is not None and offset >= next_base:
+                continue
+            count = self._indexed_count(base)
+            if offset >= base + count:
+                continue
+
+            with open(self._index_path(base), "rb") as index_file:
+                index_file.seek((offset - base) * INDEX_ENTRY.size)
+                _, position = INDEX_ENTRY.unpack(index_file.read(INDEX_ENTRY.size))
+
+            with open(self._segment_path(base), "rb") as segment_file:
+                segment_file.seek(position)
+                while offset < base + count and len(results) < max_records:
+                    record_offset, length, crc = RECORD_HEADER.unpack(segment_file.read(RECORD_HEADER.size))
+                    payload = segment_file.read(length)
+                    if zlib.crc32(payload) != crc or record_offset != offset:
+                        raise ValueError(f"Corrupt event log record at offset {offset} in segment {base}")
+                    results.append((record_offset, json.loads(payload)))
+                    offset += 1
+                    size += length
+                    if size >= max_bytes:
+                        break
+
+            if len(results) >= max_records or size >= max_bytes:
+                break
+
+        self._stats["read_batches"] += 1
+        self._stats["records_read"] += len(results)
+        return results
+
+    def retain(self, max_segments):
+        """Delete the oldest segments beyond max_segments; returns how many were removed."""
+        with self._file_lock():
+            segments = self._segments()
+            removed = segments[:-max_segments] if len(segments) > max_segments else []
+            for base in removed:
+                os.remove(self._segment_path(base))
+                if os.path.exists(self._index_path(base)):
+                    os.remove(self._index_path(base))
+        if removed:
+            logger.info(f"Removed {len(removed)} event log segments below offset {self.start_offset()}")
+        return len(removed)
+
+    # Consumer offsets
+
+    @property
+    def offsets_conn(self):
+        if self._offsets_conn is None:
+            os.makedirs(self.directory, exist_ok=True)
+            self._offsets_conn = sqlite3.connect(os.path.join(self.directory, "offsets.sqlite3"),
+                                                 timeout=5, check_same_thread=False)
+            self._offsets_conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS offsets (
+                    consumer TEXT PRIMARY KEY,
+                    next_offset INTEGER NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+                """
+            )
+            self._offsets_conn.commit()
+        return self._offsets_conn
+
+    def committed(self, consumer):
+        """Return the next offset a consumer should read, or None if it never committed."""
+        with self._lock:
+            row = self.offsets_conn.execute(
+                "SELECT next_offset FROM offsets WHERE consumer = ?", (consumer,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def commit(self, consumer, next_offset):
+        """Record that a consumer has processed everything before next_offset."""
+        with self._lock:
+            self.offsets_conn.execute(
+                """
+                INSERT INTO offsets (consumer, next_offset, updated_at) VALUES (?, ?, ?)
+                ON CONFLICT(consumer) DO UPDATE SET
+                    next_offset = excluded.next_offset,
+                    updated_at = excluded.updated_at
+                """,
+                (consumer, next_offset, time.time())
+            )
+            self.offsets_conn.commit()
+
+    def consumers(self):
+        with self._lock:
+            rows = self.offsets_conn.execute("SELECT consumer, next_offset FROM offsets").fetchall()
+        return dict(rows)
+
+    def metrics(self):
+        end = self.end_offset()
+        consumers = self.consumers() if os.path.isdir(self.directory) else {}
+        return {
+            **self._stats,
+            "segments": len(self._segments()),
+            "start_offset": self.start_offset(),
+            "end_offset": end,
+            "consumer_lag": {consumer: end - offset for consumer, offset in consumers.items()},
+        }
+
+    def close(self):
+        with self._lock:
+            if self._offsets_conn is not None:
+                self._offsets_conn.close()
+                self._offsets_conn = None
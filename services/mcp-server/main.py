@@ -5,11 +5,22 @@ import logging
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Any, Union
 from fastapi import FastAPI, HTTPException, BackgroundTasks
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from pydantic import BaseModel
 import json
-from bs4 import BeautifulSoup
 import pandas as pd
 import httpx
+from parsing import ParsePool, parse_cnbc_html
+from change_detection import SourceTracker, content_hash
+from disk_cache import DiskCache
+from shared_cache import FillLeases, LRUCache, SingleFlight
+from rate_limiter import DomainRateLimiter, RateLimited
+from reddit_stream import CursorStore, DEFAULT_SUBREDDITS, parse_reddit_listing, stream_reddit_posts
+from dedup import SeenFilter
+from market_prices import MarketPriceStore, build_quote, encode_arrow, encode_packed
+from sec_edgar import EdgarIndex, latest_facts
+from event_log import EventLog
+from analyst_ratings import AnalystRatingStore, FIRM_NAMES, default_database_url
 
 # Configure logging
 logging.basicConfig(
@@ -31,6 +42,17 @@ class DataResponse(BaseModel):
     type: str
     data: List[Dict[str, Any]]
     timestamp: str
+    content_hash: Optional[str] = None
+    changed: bool = True
+
+class SeenRequest(BaseModel):
+    source: str
+    ids: List[str]
+    consumer: str = "default"
+
+class OffsetCommit(BaseModel):
+    consumer: str
+    offset: int
 
 class StatusResponse(BaseModel):
     status: str
@@ -52,101 +74,467 @@ SOURCES = {
     "analyst_reports": ["ubs", "citi", "morgan_stanley", "wells_fargo", "goldman_sachs", "jp_morgan", "barclays", "bofa"]
 }
 
-# Cache storage with TTL
-CACHE = {}
+# Local directory for persisted server state
+DATA_DIR = os.environ.get("MCP_DATA_DIR", "data")
+
+# Process-local cache storage with TTL
+CACHE = LRUCache(max_entries=int(os.environ.get("CACHE_MAX_ENTRIES", 1024)))
 CACHE_TTL = 300  # seconds
 
+# Disk-backed second tier, shared by every worker on DATA_DIR, so restarts
+# start warm and a response fetched by one worker serves them all
+DISK_CACHE = DiskCache(os.path.join(DATA_DIR, "cache.sqlite3"), ttl=CACHE_TTL)
+
+# Cross-worker fill leases: one upstream fetch per cache key at a time
+FILL_LEASES = FillLeases(os.path.join(DATA_DIR, "fill_leases.sqlite3"))
+CACHE_FILLS = SingleFlight(
+    FILL_LEASES,
+    lease_ttl=int(os.environ.get("CACHE_FILL_LEASE_TTL", 30)),
+    wait_timeout=float(os.environ.get("CACHE_FILL_WAIT", 20))
+)
+CACHE_COMPACT_INTERVAL = int(os.environ.get("CACHE_COMPACT_INTERVAL", 600))  # seconds
+BACKGROUND_TASKS = []
+
+# Per-domain request pacing shared by all fetchers: domain -> (requests/sec, burst)
+RATE_LIMITER = DomainRateLimiter(
+    default_rate=1.0,
+    default_burst=5,
+    limits={
+        "www.reddit.com": (0.5, 3),
+        "www.cnbc.com": (0.5, 2),
+    }
+)
+RATE_LIMIT_MAX_WAIT = float(os.environ.get("RATE_LIMIT_MAX_WAIT", 15))  # seconds
+
+# Persisted pagination cursors for streaming Reddit ingestion
+REDDIT_CURSORS = CursorStore(os.path.join(DATA_DIR, "reddit_cursors.sqlite3"))
+
+# Seen-ID filter backing the "new since last fetch" mode
+SEEN_FILTER = SeenFilter(os.path.join(DATA_DIR, "seen_ids.json"))
+SEEN_FILTER_SAVE_INTERVAL = int(os.environ.get("SEEN_FILTER_SAVE_INTERVAL", 60))  # seconds
+
+# Per-symbol price cache in front of batched Yahoo Finance downloads
+MARKET_PRICES = MarketPriceStore(ttl=int(os.environ.get("MARKET_PRICES_TTL", 60)))
+MAX_SYMBOLS_PER_REQUEST = 200
+
+# Offline EDGAR index built by `python sec_edgar.py` from the bulk archives
+EDGAR_INDEX = EdgarIndex(os.environ.get("EDGAR_INDEX_DIR", os.path.join(DATA_DIR, "edgar")))
+
+# Analyst ratings loaded from CSV/JSON feeds dropped into ANALYST_DROP_DIR
+ANALYST_RATINGS = AnalystRatingStore(default_database_url(DATA_DIR))
+ANALYST_DROP_DIR = os.environ.get("ANALYST_DROP_DIR", os.path.join(DATA_DIR, "analyst_drops"))
+ANALYST_LOAD_INTERVAL = int(os.environ.get("ANALYST_LOAD_INTERVAL", 300))  # seconds
+
+# Append-only log of newly fetched items, consumed by the MCP client at its own pace
+EVENT_LOG = EventLog(os.environ.get("EVENT_LOG_DIR", os.path.join(DATA_DIR, "event_log")))
+EVENT_LOG_SOURCES = [
+    tuple(entry.strip().split(":", 1)) for entry in
+    os.environ.get("EVENT_LOG_SOURCES", "news:cnbc,social:reddit,social:truth_social").split(",")
+    if ":" in entry
+]
+EVENT_LOG_INTERVAL = int(os.environ.get("EVENT_LOG_INTERVAL", 300))  # seconds
+EVENT_LOG_MAX_SEGMENTS = int(os.environ.get("EVENT_LOG_MAX_SEGMENTS", 16))
+
+# Items per NDJSON write when streaming a cached response
+NDJSON_CHUNK_SIZE = int(os.environ.get("NDJSON_CHUNK_SIZE", 50))
+
+# Process pool for CPU-bound HTML parsing
+PARSE_POOL = ParsePool()
+
+# Upstream validators and content hashes per source
+SOURCE_TRACKER = SourceTracker()
+
 # Helper functions
+DEFAULT_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
+}
+
 async def fetch_url(session, url, headers=None):
+    await RATE_LIMITER.acquire(url, timeout=RATE_LIMIT_MAX_WAIT)
     try:
-        headers = headers or {
-            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
-        }
+        headers = headers or DEFAULT_HEADERS
         async with session.get(url, headers=headers, timeout=10) as response:
+            throttled = RATE_LIMITER.record_response(url, response.status, response.headers)
+            if throttled:
+                raise throttled
             response.raise_for_status()
             return await response.text()
+    except RateLimited:
+        raise
     except Exception as e:
         logger.error(f"Error fetching {url}: {str(e)}")
         return None
 
-# Specific data fetchers
-async def fetch_cnbc_news():
-    url = "https://www.cnbc.com/markets/"
-    async with aiohttp.ClientSession() as session:
-        html = await fetch_url(session, url)
-        if not html:
-            return []
-        
-        soup = BeautifulSoup(html, 'html.parser')
-        articles = []
+async def fetch_url_conditional(session, url, source_key, headers=None):
+    """
+    Fetch a URL with stored validators and report whether its content changed.
+
+    Returns a (status, text) tuple where status is "modified", "unchanged"
+    (HTTP 304 or identical content hash) or "error". Text is None on a 304.
+    Raises RateLimited when the upstream throttles us, so the caller never
+    mistakes a throttled response for real (empty) data.
+    """
+    await RATE_LIMITER.acquire(url, timeout=RATE_LIMIT_MAX_WAIT)
+    try:
+        request_headers = {**(headers or DEFAULT_HEADERS), **SOURCE_TRACKER.conditional_headers(source_key)}
+        async with session.get(url, headers=request_headers, timeout=10) as response:
+            throttled = RATE_LIMITER.record_response(url, response.status, response.headers)
+            if throttled:
+                raise throttled
+            if response.status == 304:
+                SOURCE_TRACKER.mark_not_modified(source_key)
+                return "unchanged", None
+            response.raise_for_status()
+            SOURCE_TRACKER.update_validators(source_key, response.headers)
+            text = await response.text()
+    except RateLimited:
+        raise
+    except Exception as e:
+        logger.error(f"Error fetching {url}: {str(e)}")
+        return "error", None
+
+    if not SOURCE_TRACKER.observe(source_key, content_hash(text)):
+        return "unchanged", text
+    return "modified", text
+
+async def cache_get(cache_key):
+    """Look up a response in memory, falling back to the disk tier."""
+    entry = CACHE.get(cache_key)
+    if entry and (datetime.now() - entry["timestamp"]).total_seconds() < CACHE_TTL:
+        return entry["data"]
+    
+    cached = await asyncio.to_thread(DISK_CACHE.get, cache_key)
+    if cached is None:
+        return None
+    
+    # Promote to memory, keeping the original fetch time so the TTL still holds
+    data, stored_at = cached
+    CACHE[cache_key] = {
+        "data": data,
+        "timestamp": datetime.fromtimestamp(stored_at)
+    }
+    return data
+
+async def cache_set(cache_key, data):
+    """Store a response in both cache tiers."""
+    now = datetime.now()
+    CACHE[cache_key] = {
+        "data": data,
+        "timestamp": now
+    }
+    try:
+        await asyncio.to_thread(DISK_CACHE.set, cache_key, data, now.timestamp())
+    except Exception as e:
+        logger.error(f"Error writing {cache_key} to disk cache: {str(e)}")
+
+def throttled_response(cache_key, error):
+    """Serve the last good response for a throttled source, or a 503 with Retry-After."""
+    entry = CACHE.get(cache_key)
+    if entry:
+        logger.warning(f"{error}; serving stale {cache_key}")
+        return entry["data"]
+    
+    headers = {"Retry-After": str(int(error.retry_after) + 1)} if error.retry_after else None
+    raise HTTPException(status_code=503, detail=str(error), headers=headers)
+
+def item_id(item):
+    """Stable identifier for a post or article."""
+    return str(item.get("id") or item.get("url") or content_hash(item))
+
+def new_items_filter(source, consumer, mark_seen=True):
+    """Return a function that keeps, from each batch of items, those this consumer hasn't seen."""
+    selected = set()  # keys already passed on, so repeats across batches are dropped too
+    
+    def select(batch):
+        items = [{**item, "dedup_id": item_id(item)} for item in batch]
+        keys = [SeenFilter.make_key(f"{consumer}:{source}", item["dedup_id"]) for item in items]
+        new_keys = set(SEEN_FILTER.filter_new(keys, mark=mark_seen))
         
-        for article in soup.select('.Card-standardBreakerCard'):
+        new_items = []
+        for item, key in zip(items, keys):
+            if key in new_keys and key not in selected:
+                new_items.append(item)
+                selected.add(key)  # drop repeats within the same payload
+        return new_items
+    
+    return select
+
+def select_new_items(response, consumer, mark_seen=True):
+    """Reduce a response to the items this consumer hasn't seen before."""
+    new_items = new_items_filter(response["source"], consumer, mark_seen)(response["data"])
+    return {
+        **response,
+        "data": new_items,
+        "content_hash": content_hash(new_items),
+        "changed": bool(new_items)
+    }
+
+async def iter_chunks(items, chunk_size=NDJSON_CHUNK_SIZE):
+    """Split an in-memory list of items into NDJSON chunks."""
+    for start in range(0, len(items), chunk_size):
+        yield items[start:start + chunk_size]
+        # Give other requests a turn between chunks
+        await asyncio.sleep(0)
+
+async def iter_ndjson(batches, select=None):
+    """Serialize each batch of items as NDJSON lines, one write per batch."""
+    try:
+        async for batch in batches:
+            if select is not None:
+                batch = select(batch)
+            if batch:
+                yield "".join(json.dumps(item, default=str) + "\n" for item in batch)
+    except RateLimited as e:
+        # Items already sent can't be taken back, so end the stream with the error
+        yield json.dumps({"error": str(e), "retry_after": e.retry_after}) + "\n"
+
+_STREAM_END = object()
+
+async def open_item_stream(load):
+    """
+    Start a load and follow its items as the fetcher produces them.
+
+    load is called with an on_item callback, which the fill passes each
+    fetched item to. Returns (response, None) when the response comes whole,
+    from cache or another request's fill, and (None, batches) when this
+    request is the one fetching; batches then yields the items fetched so far
+    each time it resumes. The first item is awaited here, so failures before
+    any data still surface as normal HTTP errors.
+    """
+    queue = asyncio.Queue()
+    
+    async def run():
+        try:
+            return await load(queue.put_nowait)
+        finally:
+            queue.put_nowait(_STREAM_END)
+    
+    # A task, so the fill still completes and caches the response if the client goes away
+    task = asyncio.create_task(run())
+    first = await queue.get()
+    if first is _STREAM_END:
+        return await task, None
+    
+    async def batches():
+        batch = [first]
+        while True:
+            while not queue.empty():
+                batch.append(queue.get_nowait())
+            done = batch[-1] is _STREAM_END
+            yield batch[:-1] if done else batch
+            if done:
+                break
+            batch = [await queue.get()]
+        # Surface a failure that came after the first item
+        await task
+    
+    return None, batches()
+
+def ndjson_headers(response):
+    headers = {
+        "X-Source": response["source"],
+        "X-Data-Type": response["type"],
+        "X-Timestamp": response["timestamp"],
+    }
+    if "data" in response:
+        headers["X-Item-Count"] = str(len(response["data"]))
+        headers["X-Changed"] = "true" if response.get("changed", True) else "false"
+    if response.get("content_hash"):
+        headers["X-Content-Hash"] = response["content_hash"]
+    if response.get("ticker"):
+        headers["X-Ticker"] = response["ticker"]
+    return headers
+
+async def stream_response(load, metadata, new_only=False, consumer="default", mark_seen=True):
+    """
+    Stream a source's items as NDJSON, one item per line.
+
+    On a cache miss each item is sent as soon as the fetcher produces it, so
+    time to first byte no longer waits for the whole fetch, the content hash
+    or the cache and event log writes. Item count, content hash and change
+    flag aren't known up front then and are left out of the X-* headers.
+    Served from cache, the full metadata is sent in the headers.
+    """
+    select = new_items_filter(metadata["source"], consumer, mark_seen) if new_only else None
+    response, batches = await open_item_stream(load)
+    if response is not None:
+        if new_only:
+            response = select_new_items(response, consumer, mark_seen)
+            select = None
+        headers = ndjson_headers(response)
+        batches = iter_chunks(response["data"])
+    else:
+        headers = ndjson_headers({**metadata, "timestamp": datetime.now().isoformat()})
+    return StreamingResponse(iter_ndjson(batches, select), media_type="application/x-ndjson", headers=headers)
+
+def build_response(response, validate=True):
+    """
+    Render a data response as JSON.
+
+    validate=False skips response_model validation for trusted internal
+    callers; the payload is already plain JSON data.
+    """
+    if not validate:
+        return JSONResponse(content=response)
+    return response
+
+async def publish_to_event_log(response):
+    """Append the items of a freshly fetched response that the log hasn't seen."""
+    new_items = select_new_items(response, "event_log", mark_seen=False)["data"]
+    if not new_items:
+        return 0
+    records = [
+        {
+            "type": response["type"],
+            "source": response["source"],
+            "ticker": response.get("ticker"),
+            "fetched_at": response["timestamp"],
+            "item": item
+        }
+        for item in new_items
+    ]
+    try:
+        await asyncio.to_thread(EVENT_LOG.append, records)
+    except Exception as e:
+        # Left unmarked, so the next fetch retries the append
+        logger.error(f"Error appending {len(records)} items to event log: {str(e)}")
+        return 0
+    SEEN_FILTER.mark([SeenFilter.make_key(f"event_log:{response['source']}", item["dedup_id"]) for item in new_items])
+    return len(records)
+
+async def ingest_to_event_log_periodically():
+    """Keep the event log fed without waiting for a client request."""
+    while True:
+        if await asyncio.to_thread(FILL_LEASES.try_acquire, "job:event_log_ingest", EVENT_LOG_INTERVAL):
+            for source_type, source in EVENT_LOG_SOURCES:
+                try:
+                    if source_type == "news":
+                        await load_news(source)
+                    elif source_type == "social":
+                        await load_social_media(source)
+                except Exception as e:
+                    logger.error(f"Error ingesting {source_type}/{source} into event log: {str(e)}")
             try:
-                headline = article.select_one('.Card-title')
-                link = article.select_one('a')
-                timestamp = article.select_one('.Card-time')
-                
-                if headline and link:
-                    articles.append({
-                        'headline': headline.text.strip(),
-                        'url': link['href'] if link.has_attr('href') else '',
-                        'timestamp': timestamp.text.strip() if timestamp else '',
-                        'source': 'CNBC'
-                    })
+                await asyncio.to_thread(EVENT_LOG.retain, EVENT_LOG_MAX_SEGMENTS)
             except Exception as e:
-                logger.error(f"Error parsing CNBC article: {str(e)}")
-                
-        return articles[:10]  # Limit to top 10 articles
+                logger.error(f"Error applying event log retention: {str(e)}")
+        await asyncio.sleep(EVENT_LOG_INTERVAL)
+
+async def persist_seen_filter_periodically():
+    """Flush the seen-ID filter to disk in the background."""
+    while True:
+        await asyncio.sleep(SEEN_FILTER_SAVE_INTERVAL)
+        try:
+            await asyncio.to_thread(SEEN_FILTER.save)
+        except Exception as e:
+            logger.error(f"Error saving seen-ID filter: {str(e)}")
+
+def prefill_cache_from_disk():
+    """Load unexpired disk cache entries into the in-memory tier."""
+    for cache_key, data, stored_at in DISK_CACHE.load_fresh():
+        CACHE[cache_key] = {
+            "data": data,
+            "timestamp": datetime.fromtimestamp(stored_at)
+        }
+    logger.info(f"Prefilled {len(CACHE)} cache entries from disk")
+
+def load_analyst_drops():
+    # Workers share the drop directory; whichever holds the lease loads it
+    if not FILL_LEASES.try_acquire("job:analyst_drops", ANALYST_LOAD_INTERVAL):
+        return {"inserted": 0}
+    os.makedirs(DATA_DIR, exist_ok=True)
+    ANALYST_RATINGS.ensure_schema()
+    stats = ANALYST_RATINGS.load_drop_directory(ANALYST_DROP_DIR)
+    if stats["inserted"]:
+        logger.info(f"Loaded {stats['inserted']} analyst ratings from {ANALYST_DROP_DIR}")
+    return stats
+
+async def load_analyst_drops_periodically():
+    while True:
+        try:
+            await asyncio.to_thread(load_analyst_drops)
+        except Exception as e:
+            logger.error(f"Error loading analyst rating drops: {str(e)}")
+        await asyncio.sleep(ANALYST_LOAD_INTERVAL)
+
+async def compact_disk_cache_periodically():
+    """Drop expired disk cache entries in the background."""
+    while True:
+        await asyncio.sleep(CACHE_COMPACT_INTERVAL)
+        try:
+            # The disk tier is shared, so one worker compacts it per interval
+            if not await asyncio.to_thread(FILL_LEASES.try_acquire, "job:compact_cache", CACHE_COMPACT_INTERVAL):
+                continue
+            deleted = await asyncio.to_thread(DISK_CACHE.compact)
+            if deleted:
+                logger.info(f"Compacted disk cache, removed {deleted} expired entries")
+        except Exception as e:
+            logger.error(f"Error compacting disk cache: {str(e)}")
 
-async def fetch_reddit_posts(subreddit="wallstreetbets", limit=10, ticker=None):
+# Specific data fetchers
+async def iter_cnbc_news():
+    url = "https://www.cnbc.com/markets/"
+    source_key = "cnbc_markets"
+    async with aiohttp.ClientSession() as session:
+        status, html = await fetch_url_conditional(session, url, source_key)
+
+    # Skip parsing entirely when the page hasn't changed since the last fetch
+    if status == "unchanged" and SOURCE_TRACKER.has_result(source_key):
+        for article in SOURCE_TRACKER.last_result(source_key):
+            yield article
+        return
+    if not html:
+        return
+
+    # Parse off the event loop so other requests keep being served
+    try:
+        articles = await PARSE_POOL.run(parse_cnbc_html, html, limit=10)
+    except Exception as e:
+        logger.error(f"Error parsing CNBC page: {str(e)}")
+        return
+
+    SOURCE_TRACKER.remember_result(source_key, articles)
+    for article in articles:
+        yield article
+
+async def iter_reddit_posts(subreddit="wallstreetbets", limit=10, ticker=None):
     if ticker:
         # Search for ticker-specific posts
         url = f"https://www.reddit.com/search.json?q={ticker}%20stock&sort=hot&limit={limit}"
     else:
         # General subreddit posts
         url = f"https://www.reddit.com/r/{subreddit}/hot.json?limit={limit}"
-        
-    headers = {
-        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
-    }
-    
+
     async with aiohttp.ClientSession() as session:
-        try:
-            async with session.get(url, headers=headers) as response:
-                if response.status == 200:
-                    data = await response.json()
-                    posts = []
-                    
-                    for post in data['data']['children']:
-                        post_data = post['data']
-                        # Extract subreddit from post data
-                        post_subreddit = post_data.get('subreddit', subreddit)
-                        
-                        # Create the post object
-                        post_object = {
-                            'title': post_data['title'],
-                            'author': post_data['author'],
-                            'score': post_data['score'],
-                            'url': f"https://www.reddit.com{post_data['permalink']}",
-                            'created_utc': datetime.fromtimestamp(post_data['created_utc']).isoformat(),
-                            'num_comments': post_data['num_comments'],
-                            'subreddit': post_subreddit,
-                            'source': 'reddit'
-                        }
-                        
-                        # Add text content if available
-                        if 'selftext' in post_data and post_data['selftext']:
-                            post_object['content'] = post_data['selftext']
-                            
-                        posts.append(post_object)
-                    
-                    return posts
-                else:
-                    logger.error(f"Error fetching Reddit: HTTP {response.status}")
-                    return []
-        except Exception as e:
-            logger.error(f"Error fetching Reddit: {str(e)}")
-            return []
+        status, body = await fetch_url_conditional(session, url, url)
+
+    if status == "unchanged" and SOURCE_TRACKER.has_result(url):
+        for post in SOURCE_TRACKER.last_result(url):
+            yield post
+        return
+    if not body:
+        return
+
+    try:
+        posts = parse_reddit_listing(json.loads(body), subreddit)
+    except Exception as e:
+        logger.error(f"Error parsing Reddit response: {str(e)}")
+        return
+
+    SOURCE_TRACKER.remember_result(url, posts)
+    for post in posts:
+        yield post
+
+async def fetch_reddit_listing(session, url):
+    """Fetch and decode one Reddit listing page."""
+    text = await fetch_url(session, url)
+    if not text:
+        return None
+    try:
+        return json.loads(text)
+    except ValueError as e:
+        logger.error(f"Error decoding Reddit listing {url}: {str(e)}")
+        return None
 
 async def fetch_truth_social_posts(ticker=None, limit=10):
     """
@@ -204,74 +592,251 @@ async def health_check():
         "version": "1.0.0"
     }
 
+@app.on_event("startup")
+async def warm_start():
+    try:
+        await asyncio.to_thread(prefill_cache_from_disk)
+    except Exception as e:
+        logger.error(f"Error prefilling cache from disk: {str(e)}")
+    try:
+        await asyncio.to_thread(SEEN_FILTER.load)
+    except Exception as e:
+        logger.error(f"Error loading seen-ID filter: {str(e)}")
+    try:
+        await asyncio.to_thread(EVENT_LOG.recover)
+    except Exception as e:
+        logger.error(f"Error recovering event log: {str(e)}")
+    if not EDGAR_INDEX.open():
+        logger.info("No SEC EDGAR index found; /earnings/sec_edgar will return no data until one is built")
+    BACKGROUND_TASKS.append(asyncio.create_task(compact_disk_cache_periodically()))
+    BACKGROUND_TASKS.append(asyncio.create_task(persist_seen_filter_periodically()))
+    BACKGROUND_TASKS.append(asyncio.create_task(load_analyst_drops_periodically()))
+    BACKGROUND_TASKS.append(asyncio.create_task(ingest_to_event_log_periodically()))
+
+@app.on_event("shutdown")
+async def shutdown():
+    for task in BACKGROUND_TASKS:
+        task.cancel()
+    PARSE_POOL.shutdown()
+    DISK_CACHE.close()
+    FILL_LEASES.close()
+    EVENT_LOG.close()
+    REDDIT_CURSORS.close()
+    EDGAR_INDEX.close()
+    ANALYST_RATINGS.engine.dispose()
+    SEEN_FILTER.save()
+
+@app.get("/metrics")
+async def get_metrics():
+    return {
+        "parse_pool": PARSE_POOL.metrics(),
+        "change_detection": SOURCE_TRACKER.metrics(),
+        "rate_limits": RATE_LIMITER.metrics(),
+        "seen_filter": SEEN_FILTER.metrics(),
+        "market_prices": MARKET_PRICES.metrics(),
+        "sec_edgar": EDGAR_INDEX.metrics(),
+        "analyst_ratings": ANALYST_RATINGS.metrics(),
+        "event_log": EVENT_LOG.metrics(),
+        "cache": {
+            "memory": CACHE.metrics(),
+            "disk": DISK_CACHE.metrics(),
+            "fills": CACHE_FILLS.metrics()
+        }
+    }
+
 @app.get("/sources")
 async def get_sources():
     return SOURCES
 
-@app.get("/news/{source}", response_model=DataResponse)
-async def get_news(source: str):
-    if source not in SOURCES["news"]:
-        raise HTTPException(status_code=404, detail=f"News source '{source}' not found")
+@app.post("/seen")
+async def mark_seen(request: SeenRequest):
+    """Acknowledge items a consumer has finished processing."""
+    keys = [SeenFilter.make_key(f"{request.consumer}:{request.source}", item) for item in request.ids]
+    SEEN_FILTER.mark(keys)
+    return {"marked": len(keys)}
+
+@app.get("/log")
+async def read_event_log(consumer: str, offset: Optional[int] = None, max_records: int = 100):
+    """
+    Read a batch of records from the event log.
+
+    Without an offset, reading starts at the consumer's committed offset (or
+    the start of the log). Pass an explicit offset to replay. Nothing is
+    committed here; consumers POST /log/offsets once a batch is processed.
+    """
+    committed = await asyncio.to_thread(EVENT_LOG.committed, consumer)
+    if offset is None:
+        offset = committed if committed is not None else EVENT_LOG.start_offset()
+    max_records = min(max(max_records, 1), 1000)
     
-    # Check cache
-    cache_key = f"news_{source}"
-    if cache_key in CACHE and (datetime.now() - CACHE[cache_key]["timestamp"]).total_seconds() < CACHE_TTL:
-        return CACHE[cache_key]["data"]
+    records = await asyncio.to_thread(EVENT_LOG.read, offset, max_records)
+    return {
+        "consumer": consumer,
+        "records": [{"offset": record_offset, **record} for record_offset, record in records],
+        "next_offset": records[-1][0] + 1 if records else max(offset, EVENT_LOG.start_offset()),
+        "end_offset": EVENT_LOG.end_offset(),
+        "committed_offset": committed
+    }
+
+@app.post("/log/offsets")
+async def commit_event_log_offset(request: OffsetCommit):
+    """Commit a consumer's next offset; committing an earlier offset replays from there."""
+    if request.offset < 0:
+        raise HTTPException(status_code=400, detail="Offset must be non-negative")
+    await asyncio.to_thread(EVENT_LOG.commit, request.consumer, request.offset)
+    return {"consumer": request.consumer, "offset": request.offset}
+
+async def fill_response(cache_key, metadata, items, on_item=None):
+    """
+    Build a response from a fetcher's items, then cache it and publish it to the event log.
+
+    on_item is called with each item as the fetcher produces it, so a
+    streaming request can send it on before the fetch completes.
+    """
+    data = []
+    try:
+        async for item in items:
+            data.append(item)
+            if on_item is not None:
+                on_item(item)
+    except RateLimited as e:
+        if data:
+            raise
+        # Throttled fetches are never cached as data
+        return throttled_response(cache_key, e)
     
-    # Fetch data
-    if source == "cnbc":
-        news_data = await fetch_cnbc_news()
-    else:
-        # Not implemented yet
-        news_data = []
+    # Hash the normalized payload so consumers can skip unchanged data
+    digest = content_hash(data)
     
     # Store in cache
     response = {
-        "source": source,
-        "type": "news",
-        "data": news_data,
-        "timestamp": datetime.now().isoformat()
-    }
-    CACHE[cache_key] = {
-        "data": response,
-        "timestamp": datetime.now()
+        **metadata,
+        "data": data,
+        "timestamp": datetime.now().isoformat(),
+        "content_hash": digest,
+        "changed": SOURCE_TRACKER.observe(cache_key, digest)
     }
-    
+    await cache_set(cache_key, response)
+    await publish_to_event_log(response)
     return response
 
-@app.get("/social/{source}", response_model=DataResponse)
-async def get_social_media(source: str, ticker: Optional[str] = None):
-    if source not in SOURCES["social_media"]:
-        raise HTTPException(status_code=404, detail=f"Social media source '{source}' not found")
+async def iter_news(source):
+    """Yield a news source's articles as its fetcher produces them."""
+    if source == "cnbc":
+        async for article in iter_cnbc_news():
+            yield article
+    # Other sources are not implemented yet
+
+async def load_news(source, on_item=None):
+    """Return the news response for a source, from cache or upstream."""
+    cache_key = f"news_{source}"
+    metadata = {"source": source, "type": "news"}
     
-    # Check cache - use ticker in cache key if provided
-    cache_key = f"social_{source}_{ticker}" if ticker else f"social_{source}"
-    if cache_key in CACHE and (datetime.now() - CACHE[cache_key]["timestamp"]).total_seconds() < CACHE_TTL:
-        return CACHE[cache_key]["data"]
+    # Only one request across all workers fetches a missing key
+    return await CACHE_FILLS.run(
+        cache_key,
+        lambda: cache_get(cache_key),
+        lambda: fill_response(cache_key, metadata, iter_news(source), on_item)
+    )
+
+@app.get("/news/{source}", response_model=DataResponse)
+async def get_news(source: str, new_only: bool = False, mark_seen: bool = True, consumer: str = "default",
+                   format: str = "json", validate: bool = True):
+    """
+    Return news articles for a source.
+
+    format=ndjson streams articles one per line as they are fetched; see
+    stream_response.
+    """
+    if source not in SOURCES["news"]:
+        raise HTTPException(status_code=404, detail=f"News source '{source}' not found")
+    
+    if format == "ndjson":
+        return await stream_response(
+            lambda on_item: load_news(source, on_item),
+            {"source": source, "type": "news"},
+            new_only, consumer, mark_seen
+        )
+    response = await load_news(source)
+    if new_only:
+        response = select_new_items(response, consumer, mark_seen)
+    return build_response(response, validate)
+
+@app.get("/social/reddit/stream")
+async def stream_reddit(ticker: Optional[str] = None, subreddits: Optional[str] = None,
+                        max_pages: int = 10, resume: bool = True):
+    """Stream Reddit posts across pages and subreddits as NDJSON."""
+    subreddit_list = [s.strip() for s in subreddits.split(",") if s.strip()] if subreddits else DEFAULT_SUBREDDITS
+    
+    async def generate():
+        async with aiohttp.ClientSession() as session:
+            posts = stream_reddit_posts(
+                lambda url: fetch_reddit_listing(session, url),
+                subreddits=subreddit_list,
+                ticker=ticker,
+                max_pages=max_pages,
+                cursors=REDDIT_CURSORS,
+                resume=resume
+            )
+            try:
+                async for post in posts:
+                    yield json.dumps(post) + "\n"
+            except RateLimited as e:
+                # Stop cleanly; the persisted cursor lets the next call resume here
+                yield json.dumps({"error": str(e), "retry_after": e.retry_after}) + "\n"
     
-    # Fetch data based on source and ticker
+    return StreamingResponse(generate(), media_type="application/x-ndjson")
+
+async def iter_social_media(source, ticker=None):
+    """Yield a social media source's posts as its fetcher produces them."""
     if source == "reddit":
-        social_data = await fetch_reddit_posts(ticker=ticker)
+        async for post in iter_reddit_posts(ticker=ticker):
+            yield post
     elif source == "truth_social":
-        social_data = await fetch_truth_social_posts(ticker=ticker)
-    else:
-        # Not implemented yet
-        social_data = []
+        for post in await fetch_truth_social_posts(ticker=ticker):
+            yield post
+    # Other sources are not implemented yet
+
+async def load_social_media(source, ticker=None, on_item=None):
+    """Return the social media response for a source, from cache or upstream."""
+    # Use ticker in cache key if provided
+    cache_key = f"social_{source}_{ticker}" if ticker else f"social_{source}"
+    metadata = {"source": source, "type": "social_media", "ticker": ticker}
     
-    # Store in cache
-    response = {
-        "source": source,
-        "type": "social_media",
-        "data": social_data,
-        "ticker": ticker,
-        "timestamp": datetime.now().isoformat()
-    }
-    CACHE[cache_key] = {
-        "data": response,
-        "timestamp": datetime.now()
-    }
+    # Only one request across all workers fetches a missing key
+    return await CACHE_FILLS.run(
+        cache_key,
+        lambda: cache_get(cache_key),
+        lambda: fill_response(cache_key, metadata, iter_social_media(source, ticker), on_item)
+    )
+
+@app.get("/social/{source}", response_model=DataResponse)
+async def get_social_media(source: str, ticker: Optional[str] = None, new_only: bool = False,
+                           mark_seen: bool = True, consumer: str = "default",
+                           format: str = "json", validate: bool = True):
+    """
+    Return social media posts for a source.
+
+    With new_only, only posts this consumer hasn't seen are returned. They are
+    marked as seen straight away unless mark_seen is false, in which case the
+    consumer acknowledges them through POST /seen once they are processed.
+    format=ndjson streams posts one per line as they are fetched (see
+    stream_response); validate=false skips response model validation for
+    trusted internal callers.
+    """
+    if source not in SOURCES["social_media"]:
+        raise HTTPException(status_code=404, detail=f"Social media source '{source}' not found")
     
-    return response
+    if format == "ndjson":
+        return await stream_response(
+            lambda on_item: load_social_media(source, ticker, on_item),
+            {"source": source, "type": "social_media", "ticker": ticker},
+            new_only, consumer, mark_seen
+        )
+    response = await load_social_media(source, ticker)
+    if new_only:
+        response = select_new_items(response, consumer, mark_seen)
+    return build_response(response, validate)
 
 @app.get("/politician-trades/{source}", response_model=DataResponse)
 async def get_politician_trades(source: str):
@@ -287,41 +852,118 @@ async def get_politician_trades(source: str):
     }
 
 @app.get("/earnings/{source}", response_model=DataResponse)
-async def get_earnings_calls(source: str):
+async def get_earnings_calls(source: str, ticker: Optional[str] = None, cik: Optional[int] = None,
+                             concepts: Optional[str] = None, latest: bool = False):
+    """
+    Return reported earnings and fundamentals facts for a company.
+
+    Served from the local EDGAR index; concepts filters by comma-separated
+    concept names and latest keeps only the newest value per concept.
+    """
     if source not in SOURCES["earnings_calls"]:
         raise HTTPException(status_code=404, detail=f"Earnings calls source '{source}' not found")
     
-    # Not implemented yet - placeholder for future implementation
+    facts = []
+    if ticker or cik is not None:
+        if not EDGAR_INDEX.is_open:
+            EDGAR_INDEX.open()
+        record = EDGAR_INDEX.lookup(ticker=ticker, cik=cik)
+        if record is None and EDGAR_INDEX.is_open:
+            raise HTTPException(status_code=404, detail=f"No SEC EDGAR data for {ticker or cik}")
+        if record:
+            facts = record["facts"]
+            if concepts:
+                wanted = {c.strip() for c in concepts.split(",") if c.strip()}
+                facts = [fact for fact in facts if fact["concept"] in wanted]
+            if latest:
+                facts = latest_facts(facts)
+            facts = [{**fact, "cik": record["cik"], "entity_name": record["entity_name"]} for fact in facts]
+    
     return {
         "source": source,
         "type": "earnings_calls",
-        "data": [],
+        "data": facts,
         "timestamp": datetime.now().isoformat()
     }
 
 @app.get("/market-prices/{source}", response_model=DataResponse)
-async def get_market_prices(source: str):
+async def get_market_prices(source: str, symbols: Optional[str] = None, period: str = "1mo",
+                            interval: str = "1d", format: str = "json"):
+    """
+    Return quotes and OHLCV bars for a comma-separated list of symbols.
+
+    format=json returns one item per symbol with a quote and columnar bars;
+    format=arrow returns an Arrow IPC stream and format=packed the packed
+    binary layout from market_prices.encode_packed.
+    """
     if source not in SOURCES["market_prices"]:
         raise HTTPException(status_code=404, detail=f"Market prices source '{source}' not found")
     
-    # Not implemented yet - placeholder for future implementation
+    symbol_list = list(dict.fromkeys(s.strip().upper() for s in (symbols or "").split(",") if s.strip()))
+    if len(symbol_list) > MAX_SYMBOLS_PER_REQUEST:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_SYMBOLS_PER_REQUEST} symbols per request")
+    
+    bars_by_symbol = {}
+    if source == "yahoo_finance" and symbol_list:
+        try:
+            bars_by_symbol = await MARKET_PRICES.get_many(symbol_list, period, interval)
+        except Exception as e:
+            logger.error(f"Error fetching market prices: {str(e)}")
+            raise HTTPException(status_code=502, detail="Error fetching market prices from upstream")
+    
+    if format == "arrow":
+        try:
+            payload = encode_arrow(bars_by_symbol)
+        except RuntimeError as e:
+            raise HTTPException(status_code=406, detail=str(e))
+        return Response(content=payload, media_type="application/vnd.apache.arrow.stream")
+    if format == "packed":
+        return Response(content=encode_packed(bars_by_symbol), media_type="application/octet-stream")
+    
     return {
         "source": source,
         "type": "market_prices",
-        "data": [],
+        "data": [
+            {"symbol": symbol, "quote": build_quote(symbol, bars), "bars": bars}
+            for symbol, bars in bars_by_symbol.items()
+        ],
         "timestamp": datetime.now().isoformat()
     }
 
+def _serialize_dates(record):
+    return {key: value.isoformat() if hasattr(value, "isoformat") else value for key, value in record.items()}
+
+def query_analyst_ratings(ticker=None, firm_name=None, limit=50):
+    os.makedirs(DATA_DIR, exist_ok=True)
+    ANALYST_RATINGS.ensure_schema()
+    return [_serialize_dates(row) for row in ANALYST_RATINGS.get_ratings(ticker, firm_name, limit)]
+
+def query_analyst_consensus(ticker, limit=10):
+    os.makedirs(DATA_DIR, exist_ok=True)
+    ANALYST_RATINGS.ensure_schema()
+    consensus = ANALYST_RATINGS.get_consensus(ticker)
+    return {
+        "ticker": ticker.upper(),
+        "consensus": _serialize_dates(consensus) if consensus else None,
+        "ratings": [_serialize_dates(row) for row in ANALYST_RATINGS.get_ratings(ticker, limit=limit)],
+        "timestamp": datetime.now().isoformat()
+    }
+
+@app.get("/analyst-reports/consensus/{ticker}")
+async def get_analyst_consensus(ticker: str, limit: int = 10):
+    """Return the maintained consensus for a ticker along with its most recent ratings."""
+    return await asyncio.to_thread(query_analyst_consensus, ticker, min(max(limit, 0), 200))
+
 @app.get("/analyst-reports/{source}", response_model=DataResponse)
-async def get_analyst_reports(source: str):
+async def get_analyst_reports(source: str, ticker: Optional[str] = None, limit: int = 50):
     if source not in SOURCES["analyst_reports"]:
         raise HTTPException(status_code=404, detail=f"Analyst reports source '{source}' not found")
     
-    # Not implemented yet - placeholder for future implementation
+    ratings = await asyncio.to_thread(query_analyst_ratings, ticker, FIRM_NAMES.get(source), min(max(limit, 0), 500))
     return {
         "source": source,
         "type": "analyst_reports",
-        "data": [],
+        "data": ratings,
         "timestamp": datetime.now().isoformat()
     }
 
@@ -0,0 +1,242 @@
+"""
+Batched market prices for the MCP server.
+
+All requested symbols that aren't already cached are fetched from Yahoo
+Finance in a single batched download, then cached per symbol so later
+requests for any subset are served locally. Results can be encoded as JSON,
+as Arrow IPC (when pyarrow is installed) or as a compact packed binary of
+little-endian float64/int64 columns.
+"""
+import json
+import time
+import struct
+import asyncio
+import logging
+import numpy as np
+import pandas as pd
+import yfinance as yf
+
+try:
+    import pyarrow as pa
+except ImportError:  # pyarrow is optional; the packed format needs only numpy
+    pa = None
+
+logger = logging.getLogger(__name__)
+
+PRICE_FIELDS = ["open", "high", "low", "close", "volume"]
+PACKED_MAGIC = b"FHCOL1"
+
+
+def download_bars(symbols, period="1mo", interval="1d"):
+    """Download OHLCV bars for many symbols in one request; returns symbol -> bars."""
+    frame = yf.download(
+        tickers=" ".join(symbols),
+        period=period,
+        interval=interval,
+        group_by="ticker",
+        auto_adjust=False,
+        threads=True,
+        progress=False,
+    )
+
+    results = {}
+    for symbol in symbols:
+        try:
+            if isinstance(frame.columns, pd.MultiIndex):
+                if symbol not in frame.columns.get_level_values(0):
+                    continue
+                symbol_frame = frame[symbol]
+            else:
+                symbol_frame = frame
+            symbol_frame = symbol_frame.dropna(subset=["Close"])
+            if symbol_frame.empty:
+                continue
+
+            results[symbol] = {
+                "timestamp": [int(ts.timestamp()) for ts in symbol_frame.index],
+                "open": symbol_frame["Open"].astype(float).tolist(),
+                "high": symbol_frame["High"].astype(float).tolist(),
+                "low": symbol_frame["Low"].astype(float).tolist(),
+                "close": symbol_frame["Close"].astype(float).tolist(),
+                "volume": symbol_frame["Volume"].fillna(0).astype(float).tolist(),
+            }
+        except Exception as e:
+            logger.error(f"Error extracting bars for {symbol}: {str(e)}")
+
+    return results
+
+
+def build_quote(symbol, bars):
+    """Summarize a symbol's bars into a quote."""
+    first_open = bars["open"][0]
+    last_close = bars["close"][-1]
+    previous_close = bars["close"][-2] if len(bars["close"]) > 1 else None
+    change = ((last_close - first_open) / first_open) * 100 if first_open else 0.0
+
+    return {
+        "symbol": symbol,
+        "price": round(last_close, 4),
+        "previous_close": round(previous_close, 4) if previous_close is not None else None,
+        "period_open": round(first_open, 4),
+        "period_high": round(max(bars["high"]), 4),
+        "period_low": round(min(bars["low"]), 4),
+        "volume": bars["volume"][-1],
+        "period_change_percent": round(change, 4),
+        "as_of": bars["timestamp"][-1],
+    }
+
+
+class MarketPriceStore:
+    """Per-symbol bar cache in front of batched upstream downloads."""
+
+    def __init__(self, ttl=60, downloader=download_bars):
+        self.ttl = ttl
+        self.downloader = downloader
+        self._cache = {}
+        self._locks = {}  # (period, interval) -> [lock, callers using it]
+        self._last_evicted = time.time()
+        self._stats = {"requests": 0, "symbol_hits": 0, "symbol_misses": 0, "downloads": 0, "downloaded_symbols": 0,
+                       "evicted": 0}
+
+    def _fresh(self, key):
+        entry = self._cache.get(key)
+        return entry is not None and time.time() - entry["fetched_at"] < self.ttl
+
+    def _cached(self, keys):
+        return {
+            symbol: self._cache[key]["bars"]
+            for symbol, key in keys.items()
+            if key in self._cache
+        }
+
+    async def get_many(self, symbols, period="1mo", interval="1d"):
+        """Return symbol -> bars, downloading all cache misses in one batch."""
+        self._stats["requests"] += 1
+        keys = {symbol: (symbol, period, interval) for symbol in symbols}
+        # period and interval come from the query string, so expired series are
+        # swept as requests arrive rather than accumulating
+        if time.time() - self._last_evicted >= self.ttl:
+            self.evict_expired()
+
+        # Fully cached requests never wait behind another caller's download
+        if all(self._fresh(key) for key in keys.values()):
+            self._stats["symbol_hits"] += len(symbols)
+            return self._cached(keys)
+
+        # One download per (period, interval) at a time; concurrent callers
+        # wait for it and then find their symbols in the cache
+        lock_key = (period, interval)
+        entry = self._locks.setdefault(lock_key, [asyncio.Lock(), 0])
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                missing = [symbol for symbol, key in keys.items() if not self._fresh(key)]
+                self._stats["symbol_hits"] += len(symbols) - len(missing)
+                self._stats["symbol_misses"] += len(missing)
+
+                if missing:
+                    self._stats["downloads"] += 1
+                    downloaded = await asyncio.to_thread(self.downloader, missing, period, interval)
+                    self._stats["downloaded_symbols"] += len(downloaded)
+                    now = time.time()
+                    for symbol, bars in downloaded.items():
+                        self._cache[keys[symbol]] = {"bars": bars, "fetched_at": now}
+        finally:
+            # Locks are dropped as soon as nobody holds or waits on them
+            entry[1] -= 1
+            if not entry[1] and self._locks.get(lock_key) is entry:
+                del self._locks[lock_key]
+
+        return self._cached(keys)
+
+    def evict_expired(self):
+        now = time.time()
+        self._last_evicted = now
+        expired = [key for key, entry in self._cache.items() if now - entry["fetched_at"] >= self.ttl]
+        for key in expired:
+            del self._cache[key]
+        self._stats["evicted"] += len(expired)
+        return len(expired)
+
+    def metrics(self):
+        return {**self._stats, "cached_series": len(self._cache), "download_locks": len(self._locks)}
+
+
+def to_columns(bars_by_symbol):
+    """Flatten per-symbol bars into one set of columns."""
+    symbols = []
+    columns = {"timestamp": []}
+    columns.update({field: [] for field in PRICE_FIELDS})
+    for symbol, bars in bars_by_symbol.items():
+        symbols.extend([symbol] * len(bars["timestamp"]))
+        columns["timestamp"].extend(bars["timestamp"])
+        for field in PRICE_FIELDS:
+            columns[field].extend(bars[field])
+    return symbols, columns
+
+
+def encode_arrow(bars_by_symbol):
+    """Encode bars as an Arrow IPC stream."""
+    if pa is None:
+        raise RuntimeError("pyarrow is not installed")
+    symbols, columns = to_columns(bars_by_symbol)
+    table = pa.table({
+        "symbol": pa.array(symbols, type=pa.dictionary(pa.int32(), pa.string())),
+        "timestamp": pa.array(columns["timestamp"], type=pa.int64()),
+        **{field: pa.array(columns[field], type=pa.float64()) for field in PRICE_FIELDS},
+    })
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def encode_packed(bars_by_symbol):
+    """
+    Encode bars as packed little-endian columns.
+
+    Layout: magic, uint32 header length, JSON header, then the timestamp
+    column (int64) followed by each price column (float64), back to back.
+    The header lists the symbols with their row offsets and counts.
+    """
+    header = {"columns": ["timestamp"] + PRICE_FIELDS, "symbols": []}
+    offset = 0
+    for symbol, bars in bars_by_symbol.items():
+        count = len(bars["timestamp"])
+        header["symbols"].append({"symbol": symbol, "offset": offset, "count": count})
+        offset += count
+    header["rows"] = offset
+
+    _, columns = to_columns(bars_by_symbol)
+    header_bytes = json.dumps(header).encode("utf-8")
+    parts = [PACKED_MAGIC, struct.pack("<I", len(header_bytes)), header_bytes,
+             np.asarray(columns["timestamp"], dtype="<i8").tobytes()]
+    for field in PRICE_FIELDS:
+        parts.append(np.asarray(columns[field], dtype="<f8").tobytes())
+    return b"".join(parts)
+
+
+def decode_packed(payload):
+    """Decode the packed format back into symbol -> bars."""
+    if payload[:len(PACKED_MAGIC)] != PACKED_MAGIC:
+        raise ValueError("Not a packed market price payload")
+    position = len(PACKED_MAGIC)
+    (header_length,) = struct.unpack_from("<I", payload, position)
+    position += 4
+    header = json.loads(payload[position:position + header_length])
+    position += header_length
+
+    rows = header["rows"]
+    columns = {"timestamp": np.frombuffer(payload, dtype="<i8", count=rows, offset=position)}
+    position += rows * 8
+    for field in PRICE_FIELDS:
+        columns[field] = np.frombuffer(payload, dtype="<f8", count=rows, offset=position)
+        position += rows * 8
+
+    return {
+        entry["symbol"]: {
+            name: column[entry["offset"]:entry["offset"] + entry["count"]].tolist()
+            for name, column in columns.items()
+        }
+        for entry in header["symbols"]
+    }
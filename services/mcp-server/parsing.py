@@ -0,0 +1,157 @@
+"""
+CPU-bound page parsing for the MCP server.
+
+HTML parsing runs in a bounded process pool so the FastAPI event loop never
+blocks on BeautifulSoup. Worker functions only take and return plain Python
+data (strings, lists and dicts) so nothing expensive has to be pickled back
+to the event loop. If a worker dies, the broken pool is replaced on the next
+call.
+"""
+import os
+import time
+import asyncio
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from bs4 import BeautifulSoup
+
+logger = logging.getLogger(__name__)
+
+PARSE_WORKERS = int(os.environ.get("PARSE_WORKERS", max(1, (os.cpu_count() or 2) - 1)))
+PARSE_MAX_PENDING = int(os.environ.get("PARSE_MAX_PENDING", PARSE_WORKERS * 4))
+
+
+# Worker functions (executed in child processes)
+def parse_cnbc_html(html, limit=10):
+    """Extract article cards from the CNBC markets page."""
+    soup = BeautifulSoup(html, 'html.parser')
+    articles = []
+
+    for article in soup.select('.Card-standardBreakerCard'):
+        try:
+            headline = article.select_one('.Card-title')
+            link = article.select_one('a')
+            timestamp = article.select_one('.Card-time')
+
+            if headline and link:
+                articles.append({
+                    'headline': headline.text.strip(),
+                    'url': link['href'] if link.has_attr('href') else '',
+                    'timestamp': timestamp.text.strip() if timestamp else '',
+                    'source': 'CNBC'
+                })
+        except Exception as e:
+            logger.error(f"Error parsing CNBC article: {str(e)}")
+
+        if len(articles) >= limit:
+            break
+
+    return articles
+
+
+def _timed_call(fn, args, kwargs):
+    """Run fn in the worker and report how long it actually took."""
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+class ParsePool:
+    """Bounded process pool for CPU-bound extraction work."""
+
+    def __init__(self, max_workers=PARSE_WORKERS, max_pending=PARSE_MAX_PENDING):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self._executor = None
+        self._slots = None
+        self._queued = 0
+        self._in_flight = 0
+        self._stats = {
+            "submitted": 0,
+            "completed": 0,
+            "failed": 0,
+            "max_queue_depth": 0,
+            "total_task_time": 0.0,
+            "max_task_time": 0.0,
+            "total_queue_wait": 0.0,
+            "pool_restarts": 0,
+        }
+
+    @property
+    def slots(self):
+        # Created on first use so it binds to the running loop
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_pending)
+        return self._slots
+
+    @property
+    def executor(self):
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+            logger.info(f"Started parse pool with {self.max_workers} workers")
+        return self._executor
+
+    async def run(self, fn, *args, **kwargs):
+        """Run fn(*args, **kwargs) in the pool and return its result."""
+        self._stats["submitted"] += 1
+        self._queued += 1
+        self._stats["max_queue_depth"] = max(self._stats["max_queue_depth"], self._queued + self._in_flight)
+        submitted_at = time.perf_counter()
+
+        # The semaphore bounds how much work can be handed to the pool at once
+        slots = self.slots
+        try:
+            await slots.acquire()
+        finally:
+            self._queued -= 1
+
+        self._in_flight += 1
+        executor = self.executor
+        try:
+            loop = asyncio.get_running_loop()
+            result, task_time = await loop.run_in_executor(
+                executor, _timed_call, fn, args, kwargs
+            )
+        except Exception as e:
+            self._stats["failed"] += 1
+            if isinstance(e, BrokenProcessPool) and self._executor is executor:
+                # A worker died; a broken pool rejects every later submit, so
+                # drop it and let the next call start a fresh one
+                executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+                self._stats["pool_restarts"] += 1
+            raise
+        finally:
+            self._in_flight -= 1
+            slots.release()
+
+        elapsed = time.perf_counter() - submitted_at
+        self._stats["completed"] += 1
+        self._stats["total_task_time"] += task_time
+        self._stats["max_task_time"] = max(self._stats["max_task_time"], task_time)
+        self._stats["total_queue_wait"] += max(0.0, elapsed - task_time)
+        return result
+
+    def metrics(self):
+        """Return queue-depth and task-time metrics for the pool."""
+        completed = self._stats["completed"]
+        return {
+            "workers": self.max_workers,
+            "max_pending": self.max_pending,
+            "queued": self._queued,
+            "in_flight": self._in_flight,
+            "submitted": self._stats["submitted"],
+            "completed": completed,
+            "failed": self._stats["failed"],
+            "max_queue_depth": self._stats["max_queue_depth"],
+            "avg_task_time": self._stats["total_task_time"] / completed if completed else 0.0,
+            "max_task_time": self._stats["max_task_time"],
+            "avg_queue_wait": self._stats["total_queue_wait"] / completed if completed else 0.0,
+            "pool_restarts": self._stats["pool_restarts"],
+        }
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+            self._slots = None
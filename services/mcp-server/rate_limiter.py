@@ -0,0 +1,194 @@
+"""
+Adaptive per-domain rate limiting for upstream fetchers.
+
+Each domain gets a token bucket shared by every fetcher. The refill rate
+backs off multiplicatively on HTTP 429 (honouring Retry-After and Reddit's
+x-ratelimit-* headers) and recovers additively on success, so we hover just
+under whatever rate the upstream actually tolerates.
+"""
+import time
+import asyncio
+import logging
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlparse
+
+logger = logging.getLogger(__name__)
+
+
+class RateLimited(Exception):
+    """Raised when a request is throttled upstream or cannot be sent before its deadline."""
+
+    def __init__(self, domain, retry_after=None):
+        self.domain = domain
+        self.retry_after = retry_after
+        message = f"Rate limited by {domain}"
+        if retry_after:
+            message += f", retry after {retry_after:.1f}s"
+        super().__init__(message)
+
+
+def parse_retry_after(value):
+    """Parse a Retry-After header (delta-seconds or HTTP-date) into seconds."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+        if retry_at.tzinfo is None:
+            retry_at = retry_at.replace(tzinfo=timezone.utc)
+        return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+
+class TokenBucket:
+    """Token bucket whose refill rate adapts to upstream throttling (AIMD)."""
+
+    def __init__(self, rate, capacity, min_rate=None, backoff=0.5, recovery=0.05):
+        self.max_rate = rate
+        self.rate = rate
+        self.capacity = capacity
+        self.min_rate = min_rate or rate / 20
+        self.backoff = backoff
+        self.recovery = recovery
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self.lock = asyncio.Lock()
+        self.waiting = 0
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def time_until_token(self, now):
+        if now < self.blocked_until:
+            return self.blocked_until - now
+        self._refill(now)
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def take(self, now):
+        self._refill(now)
+        self.tokens -= 1
+
+    def on_success(self):
+        self.rate = min(self.max_rate, self.rate + self.max_rate * self.recovery)
+
+    def on_throttled(self, retry_after=None):
+        now = time.monotonic()
+        self._refill(now)
+        self.rate = max(self.min_rate, self.rate * self.backoff)
+        self.tokens = 0.0
+        self.blocked_until = max(self.blocked_until, now + (retry_after if retry_after is not None else 1 / self.rate))
+
+    def pause(self, seconds):
+        """Hold off until the upstream's current window resets."""
+        self.tokens = 0.0
+        self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+
+
+class DomainRateLimiter:
+    """Shared registry of per-domain token buckets."""
+
+    def __init__(self, default_rate=1.0, default_burst=5, limits=None):
+        self.default_rate = default_rate
+        self.default_burst = default_burst
+        self.limits = limits or {}
+        self._buckets = {}
+        self._stats = {}
+
+    def _bucket(self, domain):
+        if domain not in self._buckets:
+            rate, burst = self.limits.get(domain, (self.default_rate, self.default_burst))
+            self._buckets[domain] = TokenBucket(rate, burst)
+            self._stats[domain] = {
+                "requests": 0,
+                "throttled": 0,
+                "deadline_exceeded": 0,
+                "total_wait": 0.0,
+            }
+        return self._buckets[domain]
+
+    async def acquire(self, url, timeout=None):
+        """Wait for a token for the URL's domain, or raise RateLimited past the deadline."""
+        domain = urlparse(url).netloc
+        bucket = self._bucket(domain)
+        stats = self._stats[domain]
+        start = time.monotonic()
+        deadline = start + timeout if timeout is not None else None
+
+        bucket.waiting += 1
+        try:
+            # asyncio.Lock wakes waiters in FIFO order, which gives us a fair queue
+            if deadline is None:
+                await bucket.lock.acquire()
+            else:
+                try:
+                    await asyncio.wait_for(bucket.lock.acquire(), max(0.0, deadline - time.monotonic()))
+                except asyncio.TimeoutError:
+                    stats["deadline_exceeded"] += 1
+                    raise RateLimited(domain, bucket.time_until_token(time.monotonic()))
+
+            try:
+                while True:
+                    now = time.monotonic()
+                    wait = bucket.time_until_token(now)
+                    if wait <= 0:
+                        bucket.take(now)
+                        break
+                    if deadline is not None and now + wait > deadline:
+                        stats["deadline_exceeded"] += 1
+                        raise RateLimited(domain, wait)
+                    await asyncio.sleep(wait)
+            finally:
+                bucket.lock.release()
+        finally:
+            bucket.waiting -= 1
+
+        stats["requests"] += 1
+        stats["total_wait"] += time.monotonic() - start
+
+    def record_response(self, url, status, headers):
+        """Adapt the domain's rate from an upstream response."""
+        domain = urlparse(url).netloc
+        bucket = self._bucket(domain)
+        retry_after = parse_retry_after(headers.get("Retry-After"))
+
+        if status == 429 or (status == 503 and retry_after is not None):
+            self._stats[domain]["throttled"] += 1
+            bucket.on_throttled(retry_after)
+            logger.warning(f"Throttled by {domain}, rate now {bucket.rate:.3f}/s")
+            return RateLimited(domain, bucket.blocked_until - time.monotonic())
+
+        bucket.on_success()
+
+        # Reddit advertises its remaining quota; stop before we hit the wall
+        remaining = headers.get("x-ratelimit-remaining")
+        reset = headers.get("x-ratelimit-reset")
+        if remaining is not None and reset is not None:
+            try:
+                if float(remaining) < 1:
+                    bucket.pause(float(reset))
+            except ValueError:
+                pass
+        return None
+
+    def metrics(self):
+        now = time.monotonic()
+        return {
+            domain: {
+                **self._stats[domain],
+                "rate": bucket.rate,
+                "max_rate": bucket.max_rate,
+                "tokens": bucket.tokens,
+                "waiting": bucket.waiting,
+                "blocked_for": max(0.0, bucket.blocked_until - now),
+            }
+            for domain, bucket in self._buckets.items()
+        }
@@ -0,0 +1,160 @@
+"""
+Paginated Reddit ingestion.
+
+Follows Reddit's `after` cursors across pages and subreddits and yields
+posts one at a time from an async generator. Only one listing page is held
+in memory, and the next page is only requested once the consumer has pulled
+every post from the current one. The cursor for each query is persisted, so
+an interrupted ingestion resumes where it left off.
+"""
+import os
+import time
+import asyncio
+import sqlite3
+import logging
+import threading
+from datetime import datetime
+from urllib.parse import urlencode
+
+logger = logging.getLogger(__name__)
+
+REDDIT_PAGE_SIZE = 100  # Reddit's maximum listing page size
+DEFAULT_SUBREDDITS = ["wallstreetbets", "stocks", "investing", "StockMarket"]
+
+
+def parse_reddit_listing(data, subreddit=None):
+    """Convert a Reddit listing JSON payload into post objects."""
+    posts = []
+
+    for post in data['data']['children']:
+        post_data = post['data']
+        # Extract subreddit from post data
+        post_subreddit = post_data.get('subreddit', subreddit)
+
+        # Create the post object
+        post_object = {
+            'id': post_data.get('name', post_data.get('id', '')),
+            'title': post_data['title'],
+            'author': post_data['author'],
+            'score': post_data['score'],
+            'url': f"https://www.reddit.com{post_data['permalink']}",
+            'created_utc': datetime.fromtimestamp(post_data['created_utc']).isoformat(),
+            'num_comments': post_data['num_comments'],
+            'subreddit': post_subreddit,
+            'source': 'reddit'
+        }
+
+        # Add text content if available
+        if 'selftext' in post_data and post_data['selftext']:
+            post_object['content'] = post_data['selftext']
+
+        posts.append(post_object)
+
+    return posts
+
+
+def build_listing_url(subreddit, ticker=None, limit=REDDIT_PAGE_SIZE, after=None):
+    """Build the listing URL for a subreddit, optionally searching for a ticker."""
+    params = {"limit": limit, "raw_json": 1}
+    if after:
+        params["after"] = after
+
+    if ticker:
+        params.update({"q": ticker, "restrict_sr": 1, "sort": "new"})
+        return f"https://www.reddit.com/r/{subreddit}/search.json?{urlencode(params)}"
+    return f"https://www.reddit.com/r/{subreddit}/new.json?{urlencode(params)}"
+
+
+class CursorStore:
+    """Persisted `after` cursor per ingestion query."""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = None
+
+    @property
+    def conn(self):
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS cursors (
+                    query_key TEXT PRIMARY KEY,
+                    after TEXT,
+                    pages INTEGER NOT NULL DEFAULT 0,
+                    posts INTEGER NOT NULL DEFAULT 0,
+                    updated_at REAL NOT NULL
+                )
+                """
+            )
+            self._conn.commit()
+        return self._conn
+
+    def get(self, query_key):
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT after FROM cursors WHERE query_key = ?", (query_key,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def set(self, query_key, after, posts=0):
+        with self._lock:
+            self.conn.execute(
+                """
+                INSERT INTO cursors (query_key, after, pages, posts, updated_at) VALUES (?, ?, 1, ?, ?)
+                ON CONFLICT(query_key) DO UPDATE SET
+                    after = excluded.after,
+                    pages = pages + 1,
+                    posts = posts + excluded.posts,
+                    updated_at = excluded.updated_at
+                """,
+                (query_key, after, posts, time.time())
+            )
+            self.conn.commit()
+
+    def reset(self, query_key):
+        with self._lock:
+            self.conn.execute("DELETE FROM cursors WHERE query_key = ?", (query_key,))
+            self.conn.commit()
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+async def stream_reddit_posts(fetch_json, subreddits=None, ticker=None, max_pages=10,
+                              page_size=REDDIT_PAGE_SIZE, cursors=None, resume=True):
+    """
+    Yield Reddit posts across pages and subreddits.
+
+    fetch_json is an async callable that returns the decoded listing for a
+    URL (or None on failure). The cursor for a query only advances once every
+    post on a page has been consumed, so a consumer that stops early will
+    see the rest of that page again on resume.
+    """
+    for subreddit in subreddits or DEFAULT_SUBREDDITS:
+        query_key = f"{subreddit}:{ticker or ''}"
+        after = await asyncio.to_thread(cursors.get, query_key) if cursors and resume else None
+
+        for _ in range(max_pages):
+            url = build_listing_url(subreddit, ticker, page_size, after)
+            data = await fetch_json(url)
+            if not data or 'data' not in data:
+                break
+
+            posts = parse_reddit_listing(data, subreddit)
+            for post in posts:
+                yield post
+
+            after = data['data'].get('after')
+            if cursors:
+                await asyncio.to_thread(cursors.set, query_key, after, len(posts))
+            if not after:
+                # Reached the end of the listing; the next run starts from the top
+                break
@@ -0,0 +1,264 @@
+"""
+Offline SEC EDGAR earnings and fundamentals store.
+
+Builds a local index from the EDGAR bulk archives (companyfacts.zip and
+submissions.zip), streaming archive members one at a time without
+extracting them. Each company's selected facts are written as a compact
+JSON record into facts.dat, and index.dat holds fixed-width, sorted
+(key, offset, length) records for every CIK and ticker. Both files are
+memory-mapped at query time, so a lookup is a binary search plus one slice,
+with no network access.
+
+Usage:
+    python sec_edgar.py --companyfacts companyfacts.zip --submissions submissions.zip --out data/edgar
+"""
+import os
+import io
+import json
+import mmap
+import struct
+import shutil
+import zipfile
+import logging
+import argparse
+
+logger = logging.getLogger(__name__)
+
+INDEX_RECORD = struct.Struct("<16sQI")  # key, offset into facts.dat, record length
+INDEX_FILE = "index.dat"
+FACTS_FILE = "facts.dat"
+META_FILE = "meta.json"
+
+# Facts kept by default; pass keep_all_concepts to store every concept
+DEFAULT_CONCEPTS = {
+    "us-gaap": [
+        "Revenues",
+        "RevenueFromContractWithCustomerExcludingAssessedTax",
+        "NetIncomeLoss",
+        "OperatingIncomeLoss",
+        "GrossProfit",
+        "EarningsPerShareBasic",
+        "EarningsPerShareDiluted",
+        "Assets",
+        "Liabilities",
+        "StockholdersEquity",
+        "CashAndCashEquivalentsAtCarryingValue",
+        "LongTermDebt",
+        "NetCashProvidedByUsedInOperatingActivities",
+    ],
+    "dei": [
+        "EntityCommonStockSharesOutstanding",
+    ],
+}
+REPORT_FORMS = {"10-K", "10-Q", "10-K/A", "10-Q/A", "20-F", "40-F"}
+
+
+def cik_key(cik):
+    return f"C:{int(cik):010d}"
+
+
+def ticker_key(ticker):
+    return f"T:{ticker.upper()}"
+
+
+def _encode_key(key):
+    encoded = key.encode("utf-8")
+    if len(encoded) > 16:
+        raise ValueError(f"Index key too long: {key}")
+    return encoded.ljust(16, b"\0")
+
+
+def extract_facts(company, concepts=DEFAULT_CONCEPTS, keep_all_concepts=False):
+    """Reduce a companyfacts document to a compact list of reported values."""
+    facts = []
+    for taxonomy, taxonomy_facts in company.get("facts", {}).items():
+        wanted = None if keep_all_concepts else set(concepts.get(taxonomy, []))
+        for concept, detail in taxonomy_facts.items():
+            if wanted is not None and concept not in wanted:
+                continue
+            for unit, values in detail.get("units", {}).items():
+                for value in values:
+                    if value.get("form") not in REPORT_FORMS:
+                        continue
+                    facts.append({
+                        "concept": concept,
+                        "taxonomy": taxonomy,
+                        "unit": unit,
+                        "value": value.get("val"),
+                        "start": value.get("start"),
+                        "end": value.get("end"),
+                        "fy": value.get("fy"),
+                        "fp": value.get("fp"),
+                        "form": value.get("form"),
+                        "filed": value.get("filed"),
+                    })
+    return facts
+
+
+def iter_archive_json(path):
+    """Yield (member name, parsed JSON) for each JSON member of a zip, one at a time."""
+    with zipfile.ZipFile(path) as archive:
+        for info in archive.infolist():
+            if info.is_dir() or not info.filename.endswith(".json"):
+                continue
+            try:
+                with archive.open(info) as member:
+                    yield info.filename, json.load(io.TextIOWrapper(member, encoding="utf-8"))
+            except Exception as e:
+                logger.error(f"Error reading {info.filename} from {path}: {str(e)}")
+
+
+def build_index(companyfacts_path, out_dir, submissions_path=None, keep_all_concepts=False):
+    """Build facts.dat and index.dat from the EDGAR bulk archives."""
+    tmp_dir = f"{out_dir}.building"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+
+    locations = {}  # CIK key -> (offset, length)
+    offset = 0
+    with open(os.path.join(tmp_dir, FACTS_FILE), "wb") as facts_file:
+        for name, company in iter_archive_json(companyfacts_path):
+            cik = company.get("cik")
+            if cik is None:
+                continue
+            record = json.dumps({
+                "cik": int(cik),
+                "entity_name": company.get("entityName"),
+                "facts": extract_facts(company, keep_all_concepts=keep_all_concepts),
+            }, separators=(",", ":")).encode("utf-8")
+            facts_file.write(record)
+            locations[cik_key(cik)] = (offset, len(record))
+            offset += len(record)
+
+    entries = dict(locations)
+    ticker_count = 0
+    if submissions_path:
+        for name, submission in iter_archive_json(submissions_path):
+            # Paginated "-submissions-NNN" members carry filings only, no tickers
+            if "-submissions-" in name or "cik" not in submission:
+                continue
+            location = locations.get(cik_key(submission["cik"]))
+            if location is None:
+                continue
+            for ticker in submission.get("tickers") or []:
+                key = ticker_key(ticker)
+                if len(key.encode("utf-8")) > 16:
+                    continue
+                entries[key] = location
+                ticker_count += 1
+
+    with open(os.path.join(tmp_dir, INDEX_FILE), "wb") as index_file:
+        for key in sorted(entries, key=lambda k: _encode_key(k)):
+            record_offset, length = entries[key]
+            index_file.write(INDEX_RECORD.pack(_encode_key(key), record_offset, length))
+
+    with open(os.path.join(tmp_dir, META_FILE), "w") as meta_file:
+        json.dump({"companies": len(locations), "tickers": ticker_count, "facts_bytes": offset}, meta_file)
+
+    # Swap the finished index in so readers never see a partial build
+    shutil.rmtree(out_dir, ignore_errors=True)
+    os.replace(tmp_dir, out_dir)
+    logger.info(f"Built EDGAR index with {len(locations)} companies and {ticker_count} tickers")
+    return {"companies": len(locations), "tickers": ticker_count}
+
+
+class EdgarIndex:
+    """Read-only memory-mapped view of a built EDGAR index."""
+
+    def __init__(self, index_dir):
+        self.index_dir = index_dir
+        self._files = []
+        self._index = None
+        self._facts = None
+        self._count = 0
+
+    def open(self):
+        """Map the index files; returns False if no index has been built."""
+        index_path = os.path.join(self.index_dir, INDEX_FILE)
+        facts_path = os.path.join(self.index_dir, FACTS_FILE)
+        if not (os.path.exists(index_path) and os.path.exists(facts_path)):
+            return False
+        if os.path.getsize(index_path) == 0:
+            return False
+
+        self.close()
+        for path in (index_path, facts_path):
+            handle = open(path, "rb")
+            self._files.append(handle)
+        self._index = mmap.mmap(self._files[0].fileno(), 0, access=mmap.ACCESS_READ)
+        self._facts = mmap.mmap(self._files[1].fileno(), 0, access=mmap.ACCESS_READ)
+        self._count = len(self._index) // INDEX_RECORD.size
+        return True
+
+    @property
+    def is_open(self):
+        return self._index is not None
+
+    def _find(self, key):
+        target = _encode_key(key)
+        low, high = 0, self._count
+        while low < high:
+            middle = (low + high) // 2
+            record_key = self._index[middle * INDEX_RECORD.size:middle * INDEX_RECORD.size + 16]
+            if record_key < target:
+                low = middle + 1
+            else:
+                high = middle
+        if low < self._count:
+            record_key, offset, length = INDEX_RECORD.unpack_from(self._index, low * INDEX_RECORD.size)
+            if record_key == target:
+                return offset, length
+        return None
+
+    def lookup(self, ticker=None, cik=None):
+        """Return the stored company record for a ticker or CIK, or None."""
+        if not self.is_open:
+            return None
+        try:
+            key = cik_key(cik) if cik is not None else ticker_key(ticker)
+            location = self._find(key)
+        except ValueError:
+            return None
+        if location is None:
+            return None
+        offset, length = location
+        return json.loads(self._facts[offset:offset + length])
+
+    def metrics(self):
+        return {"open": self.is_open, "keys": self._count}
+
+    def close(self):
+        for mapped in (self._index, self._facts):
+            if mapped is not None:
+                mapped.close()
+        for handle in self._files:
+            handle.close()
+        self._files = []
+        self._index = None
+        self._facts = None
+        self._count = 0
+
+
+def latest_facts(facts):
+    """Keep only the most recently filed value for each concept."""
+    latest = {}
+    for fact in facts:
+        current = latest.get(fact["concept"])
+        if current is None or (fact.get("end") or "", fact.get("filed") or "") > (current.get("end") or "", current.get("filed") or ""):
+            latest[fact["concept"]] = fact
+    return list(latest.values())
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    )
+    parser = argparse.ArgumentParser(description="Build the offline SEC EDGAR index from bulk archives")
+    parser.add_argument("--companyfacts", required=True, help="Path to companyfacts.zip")
+    parser.add_argument("--submissions", help="Path to submissions.zip (for ticker lookups)")
+    parser.add_argument("--out", default=os.path.join(os.environ.get("MCP_DATA_DIR", "data"), "edgar"))
+    parser.add_argument("--all-concepts", action="store_true", help="Keep every concept, not just the default set")
+    args = parser.parse_args()
+
+    build_index(args.companyfacts, args.out, args.submissions, keep_all_concepts=args.all_concepts)
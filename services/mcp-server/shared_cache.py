@@ -0,0 +1,166 @@
+"""
+Cache coordination across MCP server workers.
+
+Each uvicorn worker keeps a small process-local LRU in front of the SQLite
+cache, which all workers on the same data directory share. On a miss, only
+one worker (and within it, one request) fetches from upstream: it takes a
+fill lease for the key in a shared SQLite table, while every other caller
+waits for the result to appear in the shared tier. Adding workers therefore
+adds capacity without adding upstream calls.
+"""
+import os
+import time
+import sqlite3
+import asyncio
+import logging
+import threading
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+
+class LRUCache(OrderedDict):
+    """Bounded dict that evicts the least recently used key."""
+
+    def __init__(self, max_entries=1024):
+        super().__init__()
+        self.max_entries = max_entries
+        self.evictions = 0
+
+    def get(self, key, default=None):
+        if key not in self:
+            return default
+        self.move_to_end(key)
+        return self[key]
+
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        self.move_to_end(key)
+        while len(self) > self.max_entries:
+            self.popitem(last=False)
+            self.evictions += 1
+
+    def metrics(self):
+        return {"entries": len(self), "max_entries": self.max_entries, "evictions": self.evictions}
+
+
+class FillLeases:
+    """Expiring per-key leases shared by every process using the same file."""
+
+    def __init__(self, path):
+        self.path = path
+        self.owner = f"{os.getpid()}:{id(self)}"
+        self._lock = threading.Lock()
+        self._conn = None
+
+    @property
+    def conn(self):
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            # Autocommit mode, so each lease change is its own short transaction
+            self._conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS leases (
+                    key TEXT PRIMARY KEY,
+                    owner TEXT NOT NULL,
+                    expires_at REAL NOT NULL
+                )
+                """
+            )
+        return self._conn
+
+    def try_acquire(self, key, ttl):
+        """Take the lease for key unless another owner holds an unexpired one."""
+        now = time.time()
+        with self._lock:
+            cursor = self.conn.execute(
+                """
+                INSERT INTO leases (key, owner, expires_at) VALUES (?, ?, ?)
+                ON CONFLICT(key) DO UPDATE SET owner = excluded.owner, expires_at = excluded.expires_at
+                WHERE leases.expires_at <= ? OR leases.owner = excluded.owner
+                """,
+                (key, self.owner, now + ttl, now)
+            )
+            return cursor.rowcount == 1
+
+    def release(self, key):
+        with self._lock:
+            self.conn.execute("DELETE FROM leases WHERE key = ? AND owner = ?", (key, self.owner))
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+class SingleFlight:
+    """Run at most one upstream fill per key across all requests and workers."""
+
+    def __init__(self, leases, lease_ttl=30, wait_timeout=20, poll_interval=0.2):
+        self.leases = leases
+        self.lease_ttl = lease_ttl
+        self.wait_timeout = wait_timeout
+        self.poll_interval = poll_interval
+        self._locks = {}  # key -> [lock, callers using it]
+        self._stats = {"fills": 0, "shared_hits": 0, "local_waits": 0, "takeovers": 0}
+
+    async def run(self, key, lookup, loader):
+        """
+        Return lookup() if it finds a value, otherwise loader().
+
+        lookup is an async callable that checks the cache tiers; loader
+        fetches from upstream and is expected to store its result in the
+        shared tier before returning.
+        """
+        value = await lookup()
+        if value is not None:
+            return value
+
+        entry = self._locks.setdefault(key, [asyncio.Lock(), 0])
+        if entry[0].locked():
+            self._stats["local_waits"] += 1
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                return await self._fill(key, lookup, loader)
+        finally:
+            # Locks are dropped as soon as nobody holds or waits on them
+            entry[1] -= 1
+            if not entry[1] and self._locks.get(key) is entry:
+                del self._locks[key]
+
+    async def _fill(self, key, lookup, loader):
+        # Another request in this worker may have filled it while we waited
+        value = await lookup()
+        if value is not None:
+            return value
+
+        deadline = time.monotonic() + self.wait_timeout
+        while not await asyncio.to_thread(self.leases.try_acquire, key, self.lease_ttl):
+            # Another worker is fetching; wait for it to publish the result
+            await asyncio.sleep(self.poll_interval)
+            value = await lookup()
+            if value is not None:
+                self._stats["shared_hits"] += 1
+                return value
+            if time.monotonic() >= deadline:
+                logger.warning(f"Timed out waiting for another worker to fill {key}; fetching directly")
+                self._stats["takeovers"] += 1
+                return await loader()
+
+        self._stats["fills"] += 1
+        try:
+            return await loader()
+        finally:
+            try:
+                await asyncio.to_thread(self.leases.release, key)
+            except Exception as e:
+                logger.error(f"Error releasing fill lease for {key}: {str(e)}")
+
+    def metrics(self):
+        return {**self._stats, "fill_locks": len(self._locks), "pid": os.getpid()}
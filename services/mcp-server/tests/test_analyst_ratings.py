@@ -0,0 +1,101 @@
+import os
+import math
+
+import pytest
+
+from analyst_ratings import AnalystRatingStore
+
+
+def rating(firm, rating, date, target=None, ticker="AAPL"):
+    return {"symbol": ticker, "firm": firm, "rating": rating, "date": date, "target": target}
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = AnalystRatingStore(f"sqlite:///{tmp_path / 'ratings.sqlite3'}")
+    store.ensure_schema()
+    store.load_rows([
+        rating("UBS", "Buy", "2024-01-10", "$200"),
+        rating("Citi", "Neutral", "2024-01-11", "180"),
+        rating("Barclays", "Underweight", "2024-01-12"),
+    ])
+    return store
+
+
+def counts(consensus):
+    return {field: consensus[field] for field in ("firm_count", "buy_count", "hold_count", "sell_count", "target_count")}
+
+
+def test_initial_consensus(store):
+    consensus = store.get_consensus("aapl")
+    assert counts(consensus) == {"firm_count": 3, "buy_count": 1, "hold_count": 1, "sell_count": 1, "target_count": 2}
+    assert consensus["mean_target"] == pytest.approx(190.0)
+    assert consensus["target_dispersion"] == pytest.approx(10.0)
+    assert str(consensus["latest_rating_date"]) == "2024-01-12"
+
+
+def test_a_newer_rating_replaces_the_firms_old_one(store):
+    store.load_rows([rating("UBS", "Neutral", "2024-02-01", "150")])
+    consensus = store.get_consensus("AAPL")
+    assert counts(consensus) == {"firm_count": 3, "buy_count": 0, "hold_count": 2, "sell_count": 1, "target_count": 2}
+    assert consensus["mean_target"] == pytest.approx(165.0)
+    assert str(consensus["latest_rating_date"]) == "2024-02-01"
+
+
+def test_same_date_rerating_replaces_the_firms_rating(store):
+    result = store.load_rows([rating("Barclays", "Overweight", "2024-01-12", "210")])
+    assert result["inserted"] == 1
+    consensus = store.get_consensus("AAPL")
+    assert counts(consensus) == {"firm_count": 3, "buy_count": 2, "hold_count": 1, "sell_count": 0, "target_count": 3}
+    assert consensus["mean_target"] == pytest.approx((200 + 180 + 210) / 3)
+
+
+def test_backfilled_history_leaves_the_consensus_alone(store):
+    before = store.get_consensus("AAPL")
+    assert store.load_rows([rating("Citi", "Sell", "2023-06-01", "90")])["inserted"] == 1
+    after = store.get_consensus("AAPL")
+    assert counts(after) == counts(before) and after["mean_target"] == before["mean_target"]
+
+
+def test_reloading_a_feed_is_a_no_op(store):
+    before = store.get_consensus("AAPL")
+    result = store.load_rows([rating("UBS", "Buy", "2024-01-10", "$200"), {"symbol": "", "firm": "x", "rating": "Buy"}])
+    assert (result["inserted"], result["duplicates"], result["skipped"]) == (0, 1, 1)
+    assert counts(store.get_consensus("AAPL")) == counts(before)
+
+
+def test_incremental_consensus_matches_a_full_recount(store):
+    store.load_rows([
+        rating("UBS", "Sell", "2024-03-01", "120"),
+        rating("Goldman Sachs", "Buy", "2024-03-01", "250"),
+        rating("Goldman Sachs", "Conviction Buy", "2024-03-02", "260"),
+        rating("Citi", "Buy", "2024-01-11", "185"),
+        rating("Citi", "Neutral", "2023-01-01", "100"),
+        rating("UBS", "Buy", "2024-01-01", "300", ticker="MSFT"),
+    ])
+    latest = {}
+    for row in sorted(store.get_ratings("AAPL", limit=100), key=lambda row: (row["rating_date"], row["id"])):
+        latest[row["firm_name"]] = row
+    targets = [row["price_target"] for row in latest.values() if row["price_target"] is not None]
+    mean = sum(targets) / len(targets)
+
+    consensus = store.get_consensus("AAPL")
+    assert consensus["firm_count"] == len(latest) == 4
+    assert consensus["mean_target"] == pytest.approx(mean)
+    assert consensus["target_dispersion"] == pytest.approx(math.sqrt(sum((t - mean) ** 2 for t in targets) / len(targets)))
+    assert store.get_consensus("MSFT")["firm_count"] == 1
+
+
+def test_drop_files_load_one_by_one_and_bad_ones_are_quarantined(store, tmp_path):
+    drop_dir = tmp_path / "drops"
+    drop_dir.mkdir()
+    (drop_dir / "a.csv").write_text("symbol,firm,rating,date,target\nMSFT,UBS,Buy,2024-01-05,400\n")
+    (drop_dir / "b.json").write_text("{not json")
+    (drop_dir / "c.json").write_text('{"ratings": [{"symbol": "MSFT", "firm": "Citi", "rating": "Sell", "date": "2024-01-06"}]}')
+
+    result = store.load_drop_directory(str(drop_dir))
+
+    assert (result["inserted"], result["files"], result["failed"]) == (2, 2, 1)
+    assert sorted(os.listdir(drop_dir / "processed")) == ["a.csv", "c.json"]
+    assert os.listdir(drop_dir / "failed") == ["b.json"]
+    assert store.get_consensus("MSFT")["firm_count"] == 2
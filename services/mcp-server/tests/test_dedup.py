@@ -0,0 +1,76 @@
+import importlib
+
+import pytest
+
+from dedup import BloomFilter, SeenFilter
+
+
+@pytest.fixture
+def server(tmp_path, monkeypatch):
+    monkeypatch.setenv("MCP_DATA_DIR", str(tmp_path))
+    main = importlib.import_module("main")
+    monkeypatch.setattr(main, "SEEN_FILTER", SeenFilter(str(tmp_path / "seen_ids.json")))
+    return main
+
+
+def test_bloom_filter_has_no_false_negatives():
+    bloom = BloomFilter(capacity=1000, error_rate=0.01)
+    keys = [f"reddit:{i}" for i in range(1000)]
+    for key in keys:
+        bloom.add(key)
+    assert all(key in bloom for key in keys)
+    false_positives = sum(f"other:{i}" in bloom for i in range(10000))
+    assert false_positives < 300
+    assert BloomFilter.from_dict(bloom.to_dict()).bits == bloom.bits
+
+
+def test_filter_new_marks_unless_deferred(tmp_path):
+    seen = SeenFilter(str(tmp_path / "seen.json"))
+    assert seen.filter_new(["a", "b"], mark=False) == ["a", "b"]
+    assert seen.filter_new(["a", "b"]) == ["a", "b"]
+    assert seen.filter_new(["a", "b", "c"]) == ["c"]
+    assert seen.metrics()["duplicates"] == 2
+
+
+def test_old_keys_survive_in_the_bloom_generations(tmp_path):
+    seen = SeenFilter(str(tmp_path / "seen.json"), capacity=100, recent_size=10)
+    seen.mark([f"k{i}" for i in range(150)])
+    metrics = seen.metrics()
+    assert metrics["recent_ids"] == 10 and metrics["rotations"] == 1
+    # Evicted from the exact set, still caught by the current or previous generation
+    assert seen.seen("k60") and seen.seen("k120")
+
+
+def test_save_and_load(tmp_path):
+    path = str(tmp_path / "seen.json")
+    seen = SeenFilter(path)
+    seen.mark(["x", "y"])
+    assert seen.save()
+    assert not seen.save()  # unchanged since the last save
+
+    restored = SeenFilter(path)
+    assert restored.load()
+    assert restored.filter_new(["x", "y", "z"]) == ["z"]
+
+
+def test_select_new_items_per_consumer(server):
+    response = {"source": "reddit", "type": "social", "timestamp": "t", "data": [
+        {"id": "p1", "title": "one"}, {"id": "p2", "title": "two"}, {"id": "p1", "title": "one again"},
+    ]}
+    first = server.select_new_items(response, "client")
+    assert [item["dedup_id"] for item in first["data"]] == ["p1", "p2"]
+    assert first["changed"]
+
+    second = server.select_new_items({**response, "data": response["data"] + [{"url": "https://x/3"}]}, "client")
+    assert [item["dedup_id"] for item in second["data"]] == ["https://x/3"]
+    # Another consumer keeps its own view
+    assert len(server.select_new_items(response, "other")["data"]) == 2
+
+
+def test_deferred_marking_serves_items_until_acknowledged(server):
+    response = {"source": "news", "type": "news", "timestamp": "t", "data": [{"url": "https://a"}]}
+    assert len(server.select_new_items(response, "client", mark_seen=False)["data"]) == 1
+    assert len(server.select_new_items(response, "client", mark_seen=False)["data"]) == 1
+    server.SEEN_FILTER.mark([SeenFilter.make_key("client:news", "https://a")])
+    unchanged = server.select_new_items(response, "client", mark_seen=False)
+    assert unchanged["data"] == [] and not unchanged["changed"]
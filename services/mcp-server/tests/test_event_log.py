@@ -0,0 +1,96 @@
+import os
+
+import pytest
+
+from event_log import INDEX_ENTRY, EventLog
+
+
+def records(start, count):
+    return [{"id": i, "text": f"item {i}"} for i in range(start, start + count)]
+
+
+def test_append_and_read_across_segments(tmp_path):
+    log = EventLog(str(tmp_path), segment_bytes=200, fsync=False)
+    assert log.append(records(0, 5)) == (0, 5)
+    assert log.append(records(5, 5)) == (5, 10)
+    assert log.metrics()["segments"] == 2
+
+    read = log.read(0, max_records=100)
+    assert [offset for offset, _ in read] == list(range(10))
+    assert [record["id"] for _, record in read] == list(range(10))
+    assert [offset for offset, _ in log.read(7, max_records=2)] == [7, 8]
+    assert log.read(10) == []
+    assert log.end_offset() == 10
+
+
+def test_append_nothing_returns_end(tmp_path):
+    log = EventLog(str(tmp_path), fsync=False)
+    log.append(records(0, 3))
+    assert log.append([]) == (3, 3)
+
+
+def test_recover_drops_torn_write(tmp_path):
+    log = EventLog(str(tmp_path), fsync=False)
+    log.append(records(0, 3))
+    segment = os.path.join(str(tmp_path), f"{0:020d}.log")
+    index = os.path.join(str(tmp_path), f"{0:020d}.idx")
+    size = os.path.getsize(segment)
+    with open(segment, "ab") as f:
+        f.write(b"partial record")
+    with open(index, "ab") as f:
+        f.write(b"\x01" * (INDEX_ENTRY.size // 2))
+
+    assert log.recover() == len(b"partial record")
+    assert os.path.getsize(segment) == size
+    assert os.path.getsize(index) == 3 * INDEX_ENTRY.size
+    assert [record["id"] for _, record in log.read(0)] == [0, 1, 2]
+
+
+def test_recover_drops_index_entries_past_the_data(tmp_path):
+    log = EventLog(str(tmp_path), fsync=False)
+    log.append(records(0, 3))
+    segment = os.path.join(str(tmp_path), f"{0:020d}.log")
+    os.truncate(segment, os.path.getsize(segment) - 5)
+
+    log.recover()
+    assert log.end_offset() == 2
+    assert [record["id"] for _, record in log.read(0)] == [0, 1]
+
+
+def test_append_cuts_stray_bytes_without_recover(tmp_path):
+    log = EventLog(str(tmp_path), fsync=False)
+    log.append(records(0, 2))
+    with open(os.path.join(str(tmp_path), f"{0:020d}.log"), "ab") as f:
+        f.write(b"left by a failed append")
+
+    assert log.append(records(2, 2)) == (2, 4)
+    assert [record["id"] for _, record in log.read(0)] == [0, 1, 2, 3]
+    assert log.metrics()["truncated_bytes"] == len(b"left by a failed append")
+
+
+def test_read_rejects_corrupt_record(tmp_path):
+    log = EventLog(str(tmp_path), fsync=False)
+    log.append(records(0, 1))
+    segment = os.path.join(str(tmp_path), f"{0:020d}.log")
+    with open(segment, "r+b") as f:
+        f.seek(os.path.getsize(segment) - 2)
+        f.write(b"!!")
+
+    with pytest.raises(ValueError):
+        log.read(0)
+
+
+def test_consumer_offsets_and_retention(tmp_path):
+    log = EventLog(str(tmp_path), segment_bytes=100, fsync=False)
+    for start in range(0, 12, 3):
+        log.append(records(start, 3))
+    assert log.committed("client") is None
+    log.commit("client", 5)
+    assert log.committed("client") == 5
+    assert log.metrics()["consumer_lag"] == {"client": 7}
+
+    assert log.retain(2) == 2
+    assert log.start_offset() == 6
+    # Reading from a deleted offset starts at the oldest retained record
+    assert log.read(0, max_records=1)[0][0] == 6
+    log.close()
@@ -0,0 +1,111 @@
+import json
+import asyncio
+import importlib
+
+import pytest
+from fastapi import HTTPException
+
+from change_detection import SourceTracker
+from dedup import SeenFilter
+from disk_cache import DiskCache
+from event_log import EventLog
+from rate_limiter import RateLimited
+from shared_cache import FillLeases, LRUCache, SingleFlight
+
+
+@pytest.fixture
+def server(tmp_path, monkeypatch):
+    monkeypatch.setenv("MCP_DATA_DIR", str(tmp_path))
+    main = importlib.import_module("main")
+    leases = FillLeases(str(tmp_path / "leases.sqlite3"))
+    monkeypatch.setattr(main, "CACHE", LRUCache())
+    monkeypatch.setattr(main, "DISK_CACHE", DiskCache(str(tmp_path / "cache.sqlite3"), ttl=300))
+    monkeypatch.setattr(main, "CACHE_FILLS", SingleFlight(leases))
+    monkeypatch.setattr(main, "EVENT_LOG", EventLog(str(tmp_path / "event_log"), fsync=False))
+    monkeypatch.setattr(main, "SEEN_FILTER", SeenFilter(str(tmp_path / "seen_ids.json")))
+    monkeypatch.setattr(main, "SOURCE_TRACKER", SourceTracker())
+    yield main
+    main.DISK_CACHE.close()
+    main.EVENT_LOG.close()
+    leases.close()
+
+
+def stream(main, **options):
+    return main.stream_response(
+        lambda on_item: main.load_social_media("reddit", None, on_item),
+        {"source": "reddit", "type": "social_media", "ticker": None},
+        **options
+    )
+
+
+async def read_lines(response):
+    return [json.loads(line) async for chunk in response.body_iterator for line in chunk.splitlines()]
+
+
+def test_items_are_sent_before_the_fetch_completes(server, monkeypatch):
+    async def run():
+        release = asyncio.Event()
+
+        async def fetch(source, ticker=None):
+            yield {"id": "p1"}
+            await release.wait()
+            yield {"id": "p2"}
+
+        monkeypatch.setattr(server, "iter_social_media", fetch)
+        response = await stream(server)
+        assert "X-Item-Count" not in response.headers
+
+        first = await response.body_iterator.__anext__()
+        assert json.loads(first) == {"id": "p1"}
+        assert await server.cache_get("social_reddit") is None
+        release.set()
+        assert await read_lines(response) == [{"id": "p2"}]
+
+        cached = await stream(server)
+        assert cached.headers["X-Item-Count"] == "2"
+        assert [item["id"] for item in await read_lines(cached)] == ["p1", "p2"]
+        return server.EVENT_LOG.end_offset()
+
+    assert asyncio.run(run()) == 2
+
+
+def test_new_only_filters_streamed_items(server, monkeypatch):
+    async def fetch(source, ticker=None):
+        for post_id in ("p1", "p2", "p1", "p3"):
+            yield {"id": post_id}
+
+    monkeypatch.setattr(server, "iter_social_media", fetch)
+    server.SEEN_FILTER.mark([SeenFilter.make_key("client:reddit", "p2")])
+
+    async def run():
+        return await read_lines(await stream(server, new_only=True, consumer="client"))
+
+    assert [item["dedup_id"] for item in asyncio.run(run())] == ["p1", "p3"]
+
+
+def test_throttled_before_any_item_is_an_http_error(server, monkeypatch):
+    async def fetch(source, ticker=None):
+        raise RateLimited("www.reddit.com", retry_after=3)
+        yield
+
+    monkeypatch.setattr(server, "iter_social_media", fetch)
+
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(stream(server))
+    assert error.value.status_code == 503 and error.value.headers["Retry-After"] == "4"
+
+
+def test_throttled_mid_stream_ends_with_an_error_line(server, monkeypatch):
+    async def fetch(source, ticker=None):
+        yield {"id": "p1"}
+        await asyncio.sleep(0)
+        raise RateLimited("www.reddit.com")
+
+    monkeypatch.setattr(server, "iter_social_media", fetch)
+
+    async def run():
+        return await read_lines(await stream(server))
+
+    lines = asyncio.run(run())
+    assert lines[0] == {"id": "p1"} and "Rate limited" in lines[1]["error"]
+    assert server.CACHE.get("social_reddit") is None
@@ -0,0 +1,44 @@
+import os
+import asyncio
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+
+from parsing import ParsePool, parse_cnbc_html
+
+CNBC_PAGE = """
+<div class="Card-standardBreakerCard"><a href="https://cnbc.com/a"><span class="Card-title"> First </span></a>
+  <time class="Card-time">1 hour ago</time></div>
+<div class="Card-standardBreakerCard"><a href="https://cnbc.com/b"><span class="Card-title">Second</span></a></div>
+<div class="Card-standardBreakerCard"><a><span class="Card-title">No link target</span></a></div>
+"""
+
+
+# Module-level so pool workers can run it
+def _exit_worker():
+    os._exit(1)
+
+
+def test_parse_cnbc_html_extracts_cards_up_to_the_limit():
+    articles = parse_cnbc_html(CNBC_PAGE)
+    assert [(a["headline"], a["url"], a["timestamp"]) for a in articles] == [
+        ("First", "https://cnbc.com/a", "1 hour ago"), ("Second", "https://cnbc.com/b", ""), ("No link target", "", "")
+    ]
+    assert len(parse_cnbc_html(CNBC_PAGE, limit=1)) == 1
+
+
+def test_pool_is_replaced_after_a_worker_dies():
+    pool = ParsePool(max_workers=1, max_pending=2)
+
+    async def run():
+        with pytest.raises(BrokenProcessPool):
+            await pool.run(_exit_worker)
+        return await pool.run(parse_cnbc_html, CNBC_PAGE, limit=1)
+
+    try:
+        articles = asyncio.run(run())
+    finally:
+        pool.shutdown()
+    assert articles[0]["headline"] == "First"
+    metrics = pool.metrics()
+    assert (metrics["pool_restarts"], metrics["failed"], metrics["completed"]) == (1, 1, 1)
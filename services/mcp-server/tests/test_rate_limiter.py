@@ -0,0 +1,87 @@
+import time
+import asyncio
+from email.utils import format_datetime
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from rate_limiter import DomainRateLimiter, RateLimited, TokenBucket, parse_retry_after
+
+URL = "https://www.reddit.com/r/stocks/new.json"
+
+
+def test_throttling_backs_off_multiplicatively_down_to_the_floor():
+    bucket = TokenBucket(rate=8.0, capacity=5, min_rate=1.0)
+    bucket.on_throttled()
+    assert bucket.rate == 4.0
+    assert bucket.tokens == 0.0
+    for _ in range(5):
+        bucket.on_throttled()
+    assert bucket.rate == 1.0
+
+
+def test_success_recovers_additively_up_to_the_max():
+    bucket = TokenBucket(rate=10.0, capacity=5, recovery=0.1)
+    bucket.on_throttled()
+    assert bucket.rate == 5.0
+    bucket.on_success()
+    assert bucket.rate == pytest.approx(6.0)
+    for _ in range(10):
+        bucket.on_success()
+    assert bucket.rate == 10.0
+
+
+def test_retry_after_blocks_the_bucket():
+    bucket = TokenBucket(rate=10.0, capacity=5)
+    bucket.on_throttled(retry_after=30)
+    now = time.monotonic()
+    assert bucket.time_until_token(now) == pytest.approx(30, abs=0.5)
+    # Once the block lifts, tokens come back at the reduced rate
+    assert bucket.time_until_token(now + 30) == pytest.approx(0.0, abs=0.01)
+
+
+def test_time_until_token_follows_the_refill_rate():
+    bucket = TokenBucket(rate=2.0, capacity=1)
+    now = time.monotonic()
+    bucket.take(now)
+    assert bucket.time_until_token(now) == pytest.approx(0.5)
+
+
+def test_parse_retry_after():
+    assert parse_retry_after("12") == 12.0
+    assert parse_retry_after("-3") == 0.0
+    assert parse_retry_after(None) is None
+    assert parse_retry_after("soon") is None
+    retry_at = datetime.now(timezone.utc) + timedelta(seconds=60)
+    assert parse_retry_after(format_datetime(retry_at, usegmt=True)) == pytest.approx(60, abs=2)
+
+
+def test_limiter_adapts_from_responses():
+    limiter = DomainRateLimiter(default_rate=4.0, default_burst=2)
+    error = limiter.record_response(URL, 429, {"Retry-After": "5"})
+    assert isinstance(error, RateLimited)
+    stats = limiter.metrics()["www.reddit.com"]
+    assert stats["throttled"] == 1 and stats["rate"] == 2.0
+    assert stats["blocked_for"] == pytest.approx(5, abs=0.5)
+
+    assert limiter.record_response(URL, 200, {}) is None
+    assert limiter.metrics()["www.reddit.com"]["rate"] == pytest.approx(2.2)
+
+
+def test_limiter_pauses_when_the_quota_runs_out():
+    limiter = DomainRateLimiter()
+    limiter.record_response(URL, 200, {"x-ratelimit-remaining": "0", "x-ratelimit-reset": "20"})
+    assert limiter.metrics()["www.reddit.com"]["blocked_for"] == pytest.approx(20, abs=0.5)
+
+
+def test_acquire_raises_past_its_deadline():
+    limiter = DomainRateLimiter(default_rate=1.0, default_burst=1)
+
+    async def run():
+        await limiter.acquire(URL, timeout=0.1)
+        with pytest.raises(RateLimited):
+            await limiter.acquire(URL, timeout=0.1)
+
+    asyncio.run(run())
+    stats = limiter.metrics()["www.reddit.com"]
+    assert stats["requests"] == 1 and stats["deadline_exceeded"] == 1
@@ -0,0 +1,74 @@
+import json
+import zipfile
+
+import pytest
+
+from sec_edgar import EdgarIndex, build_index, latest_facts
+
+COMPANIES = 300
+
+
+def company(cik):
+    return {
+        "cik": cik,
+        "entityName": f"Company {cik}",
+        "facts": {"us-gaap": {
+            "NetIncomeLoss": {"units": {"USD": [
+                {"val": cik, "end": "2023-12-31", "fy": 2023, "fp": "FY", "form": "10-K", "filed": "2024-02-01"},
+                {"val": cik * 2, "end": "2024-03-31", "fy": 2024, "fp": "Q1", "form": "10-Q", "filed": "2024-05-01"},
+                {"val": 0, "end": "2024-03-31", "form": "8-K", "filed": "2024-04-01"},
+            ]}},
+            "SomethingElse": {"units": {"USD": [{"val": 1, "form": "10-K"}]}},
+        }},
+    }
+
+
+@pytest.fixture(scope="module")
+def index(tmp_path_factory):
+    root = tmp_path_factory.mktemp("edgar")
+    with zipfile.ZipFile(root / "companyfacts.zip", "w") as archive:
+        for cik in range(1, COMPANIES + 1):
+            archive.writestr(f"CIK{cik:010d}.json", json.dumps(company(cik)))
+        archive.writestr("broken.json", "{not json")
+    with zipfile.ZipFile(root / "submissions.zip", "w") as archive:
+        for cik in range(1, COMPANIES + 1):
+            archive.writestr(f"CIK{cik:010d}.json", json.dumps({"cik": str(cik), "tickers": [f"T{cik}"]}))
+        archive.writestr("CIK0000000001-submissions-001.json", json.dumps({"cik": "1", "tickers": ["PAGE"]}))
+        archive.writestr("long_ticker.json", json.dumps({"cik": "2", "tickers": ["WAYTOOLONGTICKERSYMBOL"]}))
+
+    summary = build_index(str(root / "companyfacts.zip"), str(root / "index"), str(root / "submissions.zip"))
+    assert summary == {"companies": COMPANIES, "tickers": COMPANIES}
+    edgar = EdgarIndex(str(root / "index"))
+    assert edgar.open()
+    yield edgar
+    edgar.close()
+
+
+def test_every_key_is_found_by_binary_search(index):
+    assert index.metrics()["keys"] == 2 * COMPANIES
+    for cik in range(1, COMPANIES + 1):
+        assert index.lookup(cik=cik)["cik"] == cik
+        assert index.lookup(ticker=f"t{cik}")["entity_name"] == f"Company {cik}"
+
+
+def test_missing_keys(index):
+    assert index.lookup(cik=0) is None
+    assert index.lookup(cik=COMPANIES + 1) is None
+    assert index.lookup(ticker="PAGE") is None  # paginated members carry no tickers
+    assert index.lookup(ticker="A" * 40) is None
+    # Keys sort before the first and after the last record
+    assert index.lookup(ticker="") is None
+    assert index.lookup(ticker="ZZZZ") is None
+
+
+def test_only_selected_report_facts_are_kept(index):
+    facts = index.lookup(cik=7)["facts"]
+    assert {fact["concept"] for fact in facts} == {"NetIncomeLoss"}
+    assert {fact["form"] for fact in facts} == {"10-K", "10-Q"}
+    assert [fact["value"] for fact in latest_facts(facts)] == [14]
+
+
+def test_unbuilt_index_does_not_open(tmp_path):
+    edgar = EdgarIndex(str(tmp_path))
+    assert not edgar.open()
+    assert edgar.lookup(ticker="AAPL") is None
@@ -0,0 +1,54 @@
+import asyncio
+
+import pytest
+
+from shared_cache import FillLeases, SingleFlight
+
+
+@pytest.fixture
+def flights(tmp_path):
+    leases = FillLeases(str(tmp_path / "leases.sqlite3"))
+    yield SingleFlight(leases)
+    leases.close()
+
+
+def test_concurrent_callers_share_one_fill_and_the_lock_is_dropped(flights):
+    store = {}
+    calls = []
+
+    async def lookup():
+        return store.get("k")
+
+    async def loader():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        store["k"] = "value"
+        return "value"
+
+    async def run():
+        return await asyncio.gather(*(flights.run("k", lookup, loader) for _ in range(5)))
+
+    assert asyncio.run(run()) == ["value"] * 5
+    assert len(calls) == 1
+    metrics = flights.metrics()
+    assert metrics["fills"] == 1 and metrics["local_waits"] == 4 and metrics["fill_locks"] == 0
+
+
+def test_locks_do_not_accumulate_across_keys_or_failures(flights):
+    async def missing():
+        return None
+
+    async def loader():
+        return "value"
+
+    async def failing():
+        raise RuntimeError("upstream down")
+
+    async def run():
+        for i in range(100):
+            await flights.run(f"key{i}", missing, loader)
+        with pytest.raises(RuntimeError):
+            await flights.run("bad", missing, failing)
+
+    asyncio.run(run())
+    assert flights.metrics()["fill_locks"] == 0